@@ -6,5 +6,11 @@ import random
 
 
 class RandomPlayer():
+    def __init__(self, seed=None):
+        self.random = random.Random(seed)
+
+    def seed(self, seed):
+        self.random.seed(seed)
+
     def best_move(self, board):
-        return random.choice(board.get_moves())
+        return self.random.choice(board.get_moves())
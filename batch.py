@@ -0,0 +1,362 @@
+"""
+Feature extraction over whole arrays of positions with NumPy.
+
+Positions are given as structure of arrays: forward, backward and
+pieces are uint64 arrays of shape (N, 2), indexed by colour like the
+lists of CheckerBoard, and active is an array of shape (N,) holding the
+side to move. Every feature is computed for all positions at once with
+bit operations and popcounts, and matches the scalar function of the
+same name in utils; over matches CheckerBoard.is_over().
+
+Positions are also packed to and unpacked from the 16-byte layout of
+notation.pack_board() here, a whole array at a time.
+
+NumPy is needed by this module only, and by what uses it: batched
+evaluation with ArthurPlayer.evaluate_batch() and batched_search.py.
+"""
+
+try:
+    import numpy as np
+except ImportError:
+    raise ImportError("batch.py needs NumPy, which is optional elsewhere: pip install numpy")
+
+import checkers
+from checkers import BLACK, WHITE, UNUSED_BITS, CheckerBoard
+from notation import PACKED_SIZE, unpack_board
+from utils import deny
+
+FEATURE_NAMES = ("adv", "back", "cent", "kcent", "mob", "mov", "cntr", "piece_score_diff")
+
+VALID_SQUARES = np.uint64(UNUSED_BITS ^ (2**36 - 1))
+CENTER = [np.uint64(0xCC3280), np.uint64(0xA619800)]
+MOVE_SYSTEM = [np.uint64(squares) for squares in checkers.MOVE_SYSTEM]
+POSITION_REGIONS = [np.uint64(region) for region in checkers.POSITION_REGIONS]
+
+
+def _popcount_swar(x):
+    x = x - ((x >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    x = (x & np.uint64(0x3333333333333333)) + ((x >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    x = (x + (x >> np.uint64(4))) & np.uint64(0x0f0f0f0f0f0f0f0f)
+    return ((x * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+
+def _popcount(x):
+    return np.bitwise_count(x).astype(np.int64)
+
+
+if not hasattr(np, "bitwise_count"):
+    _popcount = _popcount_swar
+
+
+def _shift(x, offset):
+    """
+    Shifts x towards higher bits by offset, or lower bits if negative.
+    """
+    if offset > 0:
+        return x << np.uint64(offset)
+    return x >> np.uint64(-offset)
+
+
+def _select(x, colour):
+    """
+    Returns x[:, colour[i]] for every row i.
+    """
+    return np.where(colour == BLACK, x[:, BLACK], x[:, WHITE])
+
+
+def boards_to_arrays(boards):
+    """
+    Returns (forward, backward, pieces, active, jumper) arrays for a
+    sequence of CheckerBoards. jumper holds the piece that has to
+    continue a multi-jump, or 0.
+    """
+    forward = np.array([board.forward for board in boards], dtype=np.uint64).reshape(-1, 2)
+    backward = np.array([board.backward for board in boards], dtype=np.uint64).reshape(-1, 2)
+    pieces = np.array([board.pieces for board in boards], dtype=np.uint64).reshape(-1, 2)
+    active = np.array([board.active for board in boards], dtype=np.uint8)
+    jumper = np.array([
+        -board.mandatory_jumps[0] & board.pieces[board.active] if board.jump else 0
+        for board in boards
+    ], dtype=np.uint64)
+    return forward, backward, pieces, active, jumper
+
+
+def _compress(x):
+    """
+    Returns notation.compress() of every bitboard of x.
+    """
+    return (
+        (x & np.uint64(0xff)) | ((x >> np.uint64(1)) & np.uint64(0xff00))
+        | ((x >> np.uint64(2)) & np.uint64(0xff0000))
+        | ((x >> np.uint64(3)) & np.uint64(0xff000000))
+    )
+
+
+def _expand(x):
+    """
+    Returns notation.expand() of every square set of x.
+    """
+    return (
+        (x & np.uint64(0xff)) | ((x & np.uint64(0xff00)) << np.uint64(1))
+        | ((x & np.uint64(0xff0000)) << np.uint64(2))
+        | ((x & np.uint64(0xff000000)) << np.uint64(3))
+    )
+
+
+def pack_arrays(forward, backward, pieces, active, jumper=None):
+    """
+    Returns an (N, 4) little-endian uint32 array holding the packing of
+    notation.pack_board() of every position; its bytes are those of
+    the packed positions one after the other. The arguments are those
+    returned by boards_to_arrays().
+    """
+    forward = np.asarray(forward, dtype=np.uint64)
+    backward = np.asarray(backward, dtype=np.uint64)
+    pieces = np.asarray(pieces, dtype=np.uint64)
+    kings = (forward[:, BLACK] & backward[:, BLACK]) | (forward[:, WHITE] & backward[:, WHITE])
+    flags = np.asarray(active, dtype=np.uint64)
+    if jumper is not None:
+        jumper = _compress(np.asarray(jumper, dtype=np.uint64))
+        # The square number of the jumper is one more than the number of
+        # squares below it.
+        square = _popcount(jumper - np.uint64(1)).astype(np.uint64) + np.uint64(1)
+        flags = flags | np.where(jumper != 0, square << np.uint64(1), np.uint64(0))
+
+    packed = np.empty((len(flags), 4), dtype="<u4")
+    packed[:, 0] = _compress(pieces[:, BLACK])
+    packed[:, 1] = _compress(pieces[:, WHITE])
+    packed[:, 2] = _compress(kings)
+    packed[:, 3] = flags
+    return packed
+
+
+def unpack_arrays(packed):
+    """
+    Returns the (forward, backward, pieces, active, jumper) arrays of
+    boards_to_arrays() for packed positions, given as the array of
+    pack_arrays() or as bytes.
+    """
+    if not isinstance(packed, np.ndarray):
+        packed = np.frombuffer(packed, dtype="<u4")
+    packed = packed.reshape(-1, 4).astype(np.uint64)
+    black, white, kings = (_expand(packed[:, i]) for i in range(3))
+    square = packed[:, 3] >> np.uint64(1)
+
+    forward = np.stack([black, white & kings], axis=1)
+    backward = np.stack([black & kings, white], axis=1)
+    pieces = np.stack([black, white], axis=1)
+    active = (packed[:, 3] & np.uint64(1)).astype(np.uint8)
+    jumper = np.where(
+        square != 0, _expand(np.uint64(1) << (np.maximum(square, 1) - np.uint64(1))), np.uint64(0),
+    )
+    return forward, backward, pieces, active, jumper
+
+
+def pack_boards(boards):
+    """
+    Returns pack_arrays() for a sequence of CheckerBoards.
+    """
+    return pack_arrays(*boards_to_arrays(boards))
+
+
+def unpack_boards(packed):
+    """
+    Returns the list of CheckerBoards of packed positions, given as the
+    array of pack_arrays() or as bytes.
+    """
+    data = packed.tobytes() if isinstance(packed, np.ndarray) else bytes(packed)
+    return [unpack_board(data, offset) for offset in range(0, len(data), PACKED_SIZE)]
+
+
+_REVERSED_BYTES = np.frombuffer(checkers._REVERSED_BYTES, dtype=np.uint8)
+
+
+def _rotate(x):
+    """
+    Returns checkers.rotate() of every bitboard of x: its 64 bits are
+    reversed a byte at a time, then the 35 board bits shifted down.
+    """
+    octets = np.ascontiguousarray(x, dtype="<u8").view(np.uint8).reshape(-1, 8)
+    reversed_bits = np.ascontiguousarray(_REVERSED_BYTES[octets][:, ::-1])
+    return reversed_bits.view("<u8").reshape(np.shape(x)).astype(np.uint64) >> np.uint64(29)
+
+
+def mirror_arrays(forward, backward, pieces, active, jumper=None):
+    """
+    Returns the arrays of boards_to_arrays() for the mirrors of the
+    positions (see CheckerBoard.mirror()): rotated, with the colours
+    and the side to move swapped.
+    """
+    forward = np.asarray(forward, dtype=np.uint64)
+    backward = np.asarray(backward, dtype=np.uint64)
+    pieces = np.asarray(pieces, dtype=np.uint64)
+    # Men of one colour move forward, so their mirrors move backward.
+    mirrored = (
+        _rotate(backward[:, ::-1]), _rotate(forward[:, ::-1]), _rotate(pieces[:, ::-1]),
+        (1 - np.asarray(active)).astype(np.uint8),
+    )
+    if jumper is None:
+        return mirrored + (None,)
+    return mirrored + (_rotate(np.asarray(jumper, dtype=np.uint64)),)
+
+
+def _steps(forward, backward):
+    """
+    Returns the (step, pieces) pairs of utils._piece_steps() for arrays.
+    """
+    return ((4, forward), (5, forward), (-4, backward), (-5, backward))
+
+
+def _at(bits, offset):
+    """
+    Returns the squares d for which square d + offset is in bits.
+    """
+    return _shift(bits, -offset)
+
+
+def feature_arrays(forward, backward, pieces, active, jumper=None, player=None):
+    """
+    Returns a dict mapping each feature name to an int64 array of its
+    values. Beyond FEATURE_NAMES, it holds deny, thret, position_score
+    (taken from the point of view of player, like piece_score_diff)
+    and over, a bool array set where the side to move has no move.
+
+    jumper optionally holds, per position, the piece that has to
+    continue a multi-jump (0 for none); it only matters to cntr, over
+    and deny. player defaults to the side to move.
+    """
+    forward = np.asarray(forward, dtype=np.uint64)
+    backward = np.asarray(backward, dtype=np.uint64)
+    pieces = np.asarray(pieces, dtype=np.uint64)
+    active = np.asarray(active)
+    passive = 1 - active
+    if player is None:
+        player = active
+
+    empty = VALID_SQUARES ^ (pieces[:, BLACK] | pieces[:, WHITE])
+    own_pieces, own_forward, own_backward = (
+        _select(pieces, active), _select(forward, active), _select(backward, active),
+    )
+    passive_pieces = _select(pieces, passive)
+    passive_white = passive == WHITE
+    black_to_move = active == BLACK
+
+    features = {}
+
+    # adv
+    rows_3_and_4 = np.where(passive_white, np.uint64(0x3FC0000), np.uint64(0x1FE00))
+    rows_5_and_6 = np.where(passive_white, np.uint64(0x1FE00), np.uint64(0x3FC0000))
+    features["adv"] = (
+        _popcount(rows_5_and_6 & passive_pieces) - _popcount(rows_3_and_4 & passive_pieces)
+    )
+
+    # back
+    active_kings = np.where(black_to_move, backward[:, BLACK], forward[:, WHITE])
+    bridge = np.where(black_to_move, np.uint64(0x480000000), np.uint64(0x5))
+    features["back"] = (
+        (active_kings == 0) & (_popcount(bridge & passive_pieces) == 2)
+    ).astype(np.int64)
+
+    # cent, kcent
+    passive_center = np.where(passive_white, CENTER[WHITE], CENTER[BLACK])
+    passive_kings = np.where(passive_white, forward[:, WHITE], backward[:, BLACK])
+    features["cent"] = _popcount(passive_pieces & passive_center)
+    features["kcent"] = _popcount(passive_kings & passive_center)
+
+    # mob
+    moves = (
+        _shift((empty >> np.uint64(4)) & own_forward, 4)
+        | _shift((empty >> np.uint64(5)) & own_forward, 5)
+        | _shift((empty << np.uint64(4)) & own_backward, -4)
+        | _shift((empty << np.uint64(5)) & own_backward, -5)
+    )
+    features["mob"] = _popcount(moves)
+
+    # mov and piece_score_diff
+    black_score = 2 * _popcount(forward[:, BLACK]) + 3 * _popcount(backward[:, BLACK])
+    white_score = 2 * _popcount(backward[:, WHITE]) + 3 * _popcount(forward[:, WHITE])
+    move_system = np.where(black_to_move, MOVE_SYSTEM[BLACK], MOVE_SYSTEM[WHITE])
+    all_pieces = pieces[:, BLACK] | pieces[:, WHITE]
+    features["mov"] = (
+        (white_score < 24) & (black_score == white_score)
+        & (_popcount(move_system & all_pieces) % 2 == 1)
+    ).astype(np.int64)
+    features["piece_score_diff"] = np.where(
+        player == BLACK, black_score - white_score, white_score - black_score,
+    )
+
+    # position_score scores the last region only, like the scalar one
+    player_pieces = _select(pieces, np.asarray(player))
+    features["position_score"] = (
+        len(POSITION_REGIONS) * _popcount(player_pieces & POSITION_REGIONS[-1])
+    )
+
+    # cntr: destinations of jumps if there are any, of normal moves if not
+    jump_forward, jump_backward = own_forward, own_backward
+    if jumper is not None:
+        jumper = np.asarray(jumper, dtype=np.uint64)
+        mask = np.where(jumper != 0, jumper, ~np.uint64(0))
+        jump_forward, jump_backward = jump_forward & mask, jump_backward & mask
+    jumps = (
+        _shift((empty >> np.uint64(8)) & (passive_pieces >> np.uint64(4)) & jump_forward, 8)
+        | _shift((empty >> np.uint64(10)) & (passive_pieces >> np.uint64(5)) & jump_forward, 10)
+        | _shift((empty << np.uint64(8)) & (passive_pieces << np.uint64(4)) & jump_backward, -8)
+        | _shift((empty << np.uint64(10)) & (passive_pieces << np.uint64(5)) & jump_backward, -10)
+    )
+    destinations = np.where(jumps != 0, jumps, moves)
+    active_center = np.where(black_to_move, CENTER[WHITE], CENTER[BLACK])
+    features["cntr"] = (
+        _popcount(own_pieces & active_center) + _popcount(destinations & active_center)
+    )
+    features["over"] = destinations == 0
+
+    # deny, shift for shift as in utils
+    active_steps = _steps(own_forward, own_backward)
+    passive_steps = _steps(_select(forward, passive), _select(backward, passive))
+    denials = np.zeros_like(empty)
+    for move_step, movers in active_steps:
+        destinations = _at(movers, -move_step) & empty
+
+        for jump_step, jumpers in passive_steps:
+            taken = destinations & _at(jumpers, -jump_step)
+            if jump_step != -move_step:
+                taken &= _at(empty, jump_step)
+
+            jumps_on = np.zeros_like(empty)
+            for step, other in passive_steps:
+                jumps_on |= (
+                    _at(other, -jump_step) & _at(own_pieces, jump_step + step)
+                    & _at(empty, jump_step + 2 * step)
+                )
+            taken_back = np.zeros_like(empty)
+            for step, other in active_steps:
+                taken_back |= _at(other, jump_step - step) & _at(empty, jump_step + step)
+
+            denials |= taken & (jumps_on | ~taken_back)
+    features["deny"] = _popcount(denials)
+    # Never credited, as in utils.thret()
+    features["thret"] = np.zeros(len(active), dtype=np.int64)
+
+    # deny in the middle of a multi-jump is scored move by move, by
+    # utils.deny() on the board of each such position.
+    if jumper is not None:
+        kings = (forward[:, BLACK] & backward[:, BLACK]) | (forward[:, WHITE] & backward[:, WHITE])
+        board = CheckerBoard()
+        for row in np.flatnonzero(jumper):
+            board.set_position(
+                int(pieces[row, BLACK]), int(pieces[row, WHITE]), int(kings[row]),
+                int(active[row]), int(jumper[row]),
+            )
+            features["deny"][row] = deny(board)
+
+    return features
+
+
+def extract_features(forward, backward, pieces, active, jumper=None, player=None):
+    """
+    Returns an (N, len(FEATURE_NAMES)) int64 matrix of features, in
+    the order of FEATURE_NAMES. The arguments are those of
+    feature_arrays().
+    """
+    features = feature_arrays(forward, backward, pieces, active, jumper, player)
+    return np.stack([features[name] for name in FEATURE_NAMES], axis=1)
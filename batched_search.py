@@ -0,0 +1,119 @@
+"""
+This module searches many positions side by side with one Player,
+scoring the leaves of all the searches in batches with
+evaluate_batch().
+
+Run it as a script to compare leaf throughput with searching the same
+positions one at a time.
+"""
+
+import argparse
+import time
+
+from parallel import position_suite
+
+
+class BatchedSearch():
+    """
+    Runs a nega_max_batched() search for every root move of every
+    given position at once. Each search runs until it yields the leaves
+    it needs scored. Once all of them wait, the leaves are scored in a
+    single evaluate_batch() call and the searches are resumed.
+
+    The root moves are searched with a full window, as in
+    Player.search_root(), so without a transposition table the moves
+    chosen are the ones best_move() would choose.
+    """
+
+    def __init__(self, player):
+        self.player = player
+        self.batches = 0
+        self.leaves = 0
+
+    def best_move(self, board):
+        return self.best_moves([board])[0]
+
+    def best_moves(self, boards, depth=None):
+        """
+        Returns the best move of each board, searched to depth, which
+        defaults to the depth of the player. A board with a single legal
+        move isn't searched.
+        """
+        player = self.player
+        if depth is None:
+            depth = player.depth
+        player.reset_counters()
+        player.killers = {}
+        if player.table is not None:
+            player.table.new_search()
+        self.batches = 0
+        self.leaves = 0
+
+        moves = [board.get_moves() for board in boards]
+        scores = [[None] * len(board_moves) for board_moves in moves]
+        resume = [
+            (player.search_move_batched(board.copy(), board.copy(), move, depth), i, j, None)
+            for i, board in enumerate(boards) if len(moves[i]) > 1
+            for j, move in enumerate(moves[i])
+        ]
+
+        while resume:
+            waiting = []
+            for search, i, j, leaf_scores in resume:
+                try:
+                    leaves = search.send(leaf_scores)
+                except StopIteration as stop:
+                    scores[i][j] = stop.value
+                    continue
+                waiting.append((search, i, j, leaves))
+            if not waiting:
+                break
+
+            batch = [leaf for _, _, _, leaves in waiting for leaf in leaves]
+            batch_scores = player.evaluate_batch(batch)
+            self.batches += 1
+            self.leaves += len(batch)
+
+            resume, start = [], 0
+            for search, i, j, leaves in waiting:
+                resume.append((search, i, j, batch_scores[start:start + len(leaves)]))
+                start += len(leaves)
+
+        best_moves = []
+        for board_moves, board_scores in zip(moves, scores):
+            if len(board_moves) == 1:
+                best_moves.append(board_moves[0])
+            else:
+                best = max(range(len(board_moves)), key=board_scores.__getitem__)
+                best_moves.append(board_moves[best])
+        return best_moves
+
+
+def main():
+    from agents.arthur import ArthurPlayer
+
+    parser = argparse.ArgumentParser(description="Batched leaf evaluation benchmark.")
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--positions", type=int, default=16)
+    args = parser.parse_args()
+
+    positions = [board for board in position_suite(args.positions) if len(board.get_moves()) > 1]
+
+    player = ArthurPlayer(depth=args.depth)
+    start = time.time()
+    serial_moves = [player.best_move(board) for board in positions]
+    serial_time = time.time() - start
+    print("serial   %8.2fs" % serial_time)
+
+    search = BatchedSearch(ArthurPlayer(depth=args.depth))
+    start = time.time()
+    batched_moves = search.best_moves(positions)
+    batched_time = time.time() - start
+    print("batched  %8.2fs  speedup %5.2f  leaves %d  batches %d  same moves %s" % (
+        batched_time, serial_time / batched_time, search.leaves, search.batches,
+        batched_moves == serial_moves,
+    ))
+
+
+if __name__ == '__main__':
+    main()
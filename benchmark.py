@@ -0,0 +1,155 @@
+"""
+This module holds the standard set of positions the search benchmarks
+run on, and measures on them:
+
+- the effect of move ordering: the nodes, cutoffs and time a
+  fixed-depth search takes with and without Player.move_ordering. Node
+  and cutoff counts depend on nothing but the positions, the depth and
+  the search, so they are the same from run to run.
+- the speedup of searching root moves on a RootSplitter pool: the
+  serial wall time of a fixed-depth search over the parallel one, and
+  whether both find the same move and score.
+
+Usage: python benchmark.py ordering [--depth N] [--search METHOD]
+       python benchmark.py root-split [--depth N] [--workers N]
+"""
+
+import argparse
+import time
+
+from notation import from_fen
+
+# Eight middle game positions and four endgames with kings, reached by
+# random games from the start.
+POSITIONS = [
+    "B:W16,18,21,24,25,27,28,29:B2,3,4,5,10,13,20",
+    "B:W12,18,21,23,24,26,29,30,31,32:B1,2,3,4,5,7,8,9,10",
+    "B:W17,20,21,25,27,28:B1,4,5,8,10,11,18",
+    "W:W17,18,19,26,28,30,31,32:B1,3,4,6,10,11,12",
+    "W:WK3,20,21,22,23,24,25,29,31,32:B1,2,4,5,6,11,14,15",
+    "W:W17,19,24,25,27,29,30,31:B1,2,3,5,7,12,16",
+    "B:W18,21,22,23,24,25,28,29,30,31,32:B1,3,4,5,7,8,9,10,12,16",
+    "W:W13,19,21,23,25,28,29,30,31:B1,3,4,6,7,8,10,14",
+    "W:WK14:B20,K22,K26,K28",
+    "B:WK7,8,12,21,28,32:B5,6,14,19,K25",
+    "B:W7,13,21,K22,29:B16,20,K27",
+    "W:W10,K12,25,26,28,29,30:B14",
+]
+
+
+def positions():
+    """
+    Returns the boards of POSITIONS.
+    """
+    return [from_fen(fen) for fen in POSITIONS]
+
+
+def search_positions(player, boards):
+    """
+    Searches every board with player. Returns the moves chosen and the
+    totals of the nodes, beta cutoffs, first-move cutoffs and seconds
+    of the searches.
+    """
+    moves = []
+    totals = {"nodes": 0, "cutoffs": 0, "first_move_cutoffs": 0, "elapsed": 0}
+    for board in boards:
+        move, stats = player.search(board)
+        moves.append(move)
+        for name in totals:
+            totals[name] += getattr(stats, name)
+    return moves, totals
+
+
+def ordering_benchmark(depth=4, search_with="nega_max", boards=None):
+    """
+    Returns the moves and totals of search_positions() for an
+    ArthurPlayer searching to depth without and with move ordering, as
+    a dict keyed by the move_ordering setting.
+    """
+    from agents.arthur import ArthurPlayer
+
+    boards = boards if boards is not None else positions()
+    return {
+        ordering: search_positions(
+            ArthurPlayer(depth=depth, search_with=search_with, move_ordering=ordering), boards,
+        )
+        for ordering in (False, True)
+    }
+
+
+def root_split_benchmark(depth=5, workers=4, boards=None):
+    """
+    Searches the root moves of every board to depth with an
+    ArthurPlayer, serially and on a RootSplitter pool of workers.
+    Returns the serial and parallel wall times, and the positions for
+    which the best move or its score differ.
+    """
+    from agents.arthur import ArthurPlayer
+
+    boards = boards if boards is not None else positions()
+    serial, parallel = ArthurPlayer(depth=depth), ArthurPlayer(depth=depth, workers=workers)
+    # Starts the pool, so that its start-up isn't timed.
+    parallel.search_root(boards[0], boards[0].get_moves(), 1)
+
+    serial_time = parallel_time = 0
+    differences = []
+    try:
+        for number, board in enumerate(boards):
+            moves = board.get_moves()
+            start = time.time()
+            serial_move, serial_scores = serial.search_root(board, moves, depth)
+            serial_time += time.time() - start
+            start = time.time()
+            parallel_move, parallel_scores = parallel.search_root(board, moves, depth)
+            parallel_time += time.time() - start
+
+            if (serial_move, max(serial_scores)) != (
+                    parallel_move, parallel_scores[moves.index(parallel_move)]):
+                differences.append(number)
+    finally:
+        parallel.close()
+    return serial_time, parallel_time, differences
+
+
+def print_ordering(results):
+    """
+    Prints the results of ordering_benchmark().
+    """
+    for ordering, (_, totals) in results.items():
+        cutoffs = totals["cutoffs"]
+        print("ordering %-5s  nodes %9d  cutoffs %8d  first-move cutoffs %5.1f%%  %7.2fs" % (
+            ordering, totals["nodes"], cutoffs,
+            100 * totals["first_move_cutoffs"] / cutoffs if cutoffs else 0, totals["elapsed"],
+        ))
+    unordered, ordered = results[False][1]["nodes"], results[True][1]["nodes"]
+    print("nodes searched with ordering: %.1f%% of unordered" % (100 * ordered / unordered))
+    if results[False][0] != results[True][0]:
+        print("moves differ: %d of %d positions" % (
+            sum(a != b for a, b in zip(results[False][0], results[True][0])), len(POSITIONS),
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search benchmarks on the standard positions.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ordering = commands.add_parser("ordering", help="nodes searched with and without move ordering")
+    ordering.add_argument("--depth", type=int, default=4)
+    ordering.add_argument("--search", default="nega_max", choices=["alpha_beta", "nega_max"])
+    root_split = commands.add_parser("root-split", help="speedup of the parallel root search")
+    root_split.add_argument("--depth", type=int, default=5)
+    root_split.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    if args.command == "ordering":
+        print_ordering(ordering_benchmark(args.depth, args.search))
+    else:
+        serial_time, parallel_time, differences = root_split_benchmark(args.depth, args.workers)
+        print("serial %8.2fs  %d workers %8.2fs  speedup %5.2f" % (
+            serial_time, args.workers, parallel_time, serial_time / parallel_time,
+        ))
+        if differences:
+            print("best move or score differ in positions %s" % differences)
+
+
+if __name__ == '__main__':
+    main()
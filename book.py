@@ -0,0 +1,260 @@
+"""
+This module builds and probes opening books: the moves played from the
+positions of the first plies of a collection of games, weighted by how
+often and how well they were played.
+
+A book file is a sorted array of fixed-width entries (position hash,
+move, weight), one per move of every position, and is memory-mapped
+and binary searched when probed. Hashes are the Zobrist hashes of
+CheckerBoard, which are the same in every process.
+
+A position with white to move is stored as its black to move mirror
+(see checkers.canonical()), with its moves mirrored, so the two share
+their entries.
+
+Usage: python book.py BOOK [--pdn FILE ...] [--records FILE ...]
+[--self-play GAMES] [--plies N]
+builds BOOK from PDN files, game record files of records.py and games
+of ArthurPlayer against itself, and prints the book moves of the
+starting position.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+from random import Random
+
+from checkers import WHITE, CheckerBoard, canonical_hash, mirror_move
+from notation import from_fen, move_texts, read_pdn
+from records import read_records
+
+# Position hash, move and weight
+ENTRY_FORMAT = struct.Struct("<QqI")
+ENTRY_SIZE = ENTRY_FORMAT.size
+MAX_WEIGHT = 2**32 - 1
+
+# Plies of each game entered in a book by default
+BOOK_PLIES = 12
+
+# Weight a move gets from a game won, unresolved or lost by the player
+# who made it.
+WIN_WEIGHT, DRAW_WEIGHT, LOSS_WEIGHT = 2, 1, 0
+
+# PDN results, as winners
+PDN_WINNERS = {"1-0": 0, "2-0": 0, "0-1": 1, "0-2": 1}
+
+
+class BookBuilder():
+    """
+    Collects the moves of the first plies of games and writes them as a
+    book. A move's weight is the sum, over the games it was played in,
+    of WIN_WEIGHT, DRAW_WEIGHT or LOSS_WEIGHT for the player who made
+    it; moves of weight 0 are left out.
+    """
+
+    def __init__(self, plies=BOOK_PLIES):
+        self.plies = plies
+        self.weights = {}
+        self.games = 0
+
+    def add_game(self, moves, winner=None, board=None):
+        """
+        Adds the first plies moves of a game played from board, the
+        starting position by default. winner is BLACK, WHITE, or None or
+        -1 for a game without one.
+        """
+        board = board.copy() if board is not None else CheckerBoard()
+        weights = self.weights
+        for move in moves[:self.plies]:
+            if winner is None or winner == -1:
+                weight = DRAW_WEIGHT
+            else:
+                weight = WIN_WEIGHT if winner == board.active else LOSS_WEIGHT
+            key = (canonical_hash(board), mirror_move(move) if board.active == WHITE else move)
+            weights[key] = weights.get(key, 0) + weight
+            board.make_move(move)
+        self.games += 1
+
+    def write(self, path):
+        """
+        Writes the book to path, and returns its number of entries.
+        """
+        entries = sorted(
+            (key, move, min(weight, MAX_WEIGHT))
+            for (key, move), weight in self.weights.items() if weight
+        )
+        with open(path + ".tmp", 'wb') as book:
+            for entry in entries:
+                book.write(ENTRY_FORMAT.pack(*entry))
+        os.replace(path + ".tmp", path)
+        return len(entries)
+
+
+class OpeningBook():
+    """
+    Probes a book written by BookBuilder. A position is found by binary
+    search over the memory-mapped file.
+
+    An OpeningBook can be pickled and copied: copies map the file
+    again.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as book:
+            if os.fstat(book.fileno()).st_size:
+                self.entries = mmap.mmap(book.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                self.entries = b""
+        self.size = len(self.entries) // ENTRY_SIZE
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def __len__(self):
+        return self.size
+
+    def close(self):
+        if isinstance(self.entries, mmap.mmap):
+            self.entries.close()
+
+    def moves(self, board):
+        """
+        Returns the list of (move, weight) pairs of board, legal moves
+        only, in case of a hash collision.
+        """
+        key, entries = canonical_hash(board), self.entries
+        mirrored = board.active == WHITE
+        low, high = 0, self.size
+        while low < high:
+            middle = (low + high) // 2
+            if struct.unpack_from("<Q", entries, middle * ENTRY_SIZE)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+
+        moves = []
+        legal_moves = None
+        for index in range(low, self.size):
+            entry_key, move, weight = ENTRY_FORMAT.unpack_from(entries, index * ENTRY_SIZE)
+            if entry_key != key:
+                break
+            if legal_moves is None:
+                legal_moves = board.get_moves()
+            if mirrored:
+                move = mirror_move(move)
+            if move in legal_moves:
+                moves.append((move, weight))
+        return moves
+
+    def choose(self, board, rnd=None):
+        """
+        Returns a book move of board picked at random with probability
+        proportional to its weight, or None if board is not in the
+        book. rnd is the random.Random to draw from.
+        """
+        moves = self.moves(board)
+        if not moves:
+            return None
+        rnd = rnd if rnd is not None else Random()
+        point = rnd.random() * sum(weight for _, weight in moves)
+        for move, weight in moves:
+            point -= weight
+            if point < 0:
+                return move
+        return moves[-1][0]
+
+
+class _RandomOpening():
+    """
+    Plays its first plies moves of a game at random, then the moves of
+    player. Seeded by the tournament like any agent.
+    """
+
+    def __init__(self, player, plies):
+        self.player = player
+        self.plies = plies
+        self.played = 0
+        self.random = Random()
+
+    def seed(self, seed):
+        self.random.seed(seed)
+
+    def best_move(self, board):
+        self.played += 1
+        if self.played <= self.plies:
+            return self.random.choice(board.get_moves())
+        return self.player.best_move(board)
+
+
+def self_play(builder, player, games, random_plies=2, workers=1, seed=0):
+    """
+    Adds to builder games of player against itself, played on workers
+    processes. The first random_plies moves of each game are random,
+    so that games differ.
+    """
+    from tournament import Tournament
+
+    # Each colour counts its own moves, black moving first.
+    black = _RandomOpening(player, (random_plies + 1) // 2)
+    white = _RandomOpening(player, random_plies // 2)
+    tournament = Tournament(black, white, games, workers=workers, seed=seed, swap_colours=False)
+    for result in tournament.run():
+        builder.add_game(result.moves, result.winner)
+
+
+def add_pdn(builder, path):
+    """
+    Adds the games of a PDN file to builder.
+    """
+    with open(path) as pdn:
+        text = pdn.read()
+    for tags, moves in read_pdn(text):
+        board = from_fen(tags["FEN"]) if "FEN" in tags else None
+        builder.add_game(moves, PDN_WINNERS.get(tags.get("Result")), board)
+
+
+def add_records(builder, path):
+    """
+    Adds the games of a records.py record file to builder.
+    """
+    for record in read_records(path):
+        builder.add_game(record["moves"], record["winner"])
+
+
+def main():
+    from agents.arthur import ArthurPlayer
+
+    parser = argparse.ArgumentParser(description="Build an opening book.")
+    parser.add_argument("book")
+    parser.add_argument("--pdn", nargs="*", default=[])
+    parser.add_argument("--records", nargs="*", default=[])
+    parser.add_argument("--self-play", type=int, default=0, metavar="GAMES")
+    parser.add_argument("--plies", type=int, default=BOOK_PLIES)
+    parser.add_argument("--depth", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    builder = BookBuilder(args.plies)
+    for path in args.pdn:
+        add_pdn(builder, path)
+    for path in args.records:
+        add_records(builder, path)
+    if args.self_play:
+        self_play(builder, ArthurPlayer(depth=args.depth), args.self_play,
+                  workers=args.workers, seed=args.seed)
+    print("%d entries from %d games" % (builder.write(args.book), builder.games))
+
+    board = CheckerBoard()
+    book = OpeningBook(args.book)
+    for move, weight in sorted(book.moves(board), key=lambda entry: -entry[1]):
+        print("%-8s %d" % (move_texts([move], board)[0], weight))
+
+
+if __name__ == '__main__':
+    main()
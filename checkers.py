@@ -3,6 +3,7 @@ This module defines the CheckerBoard class.
 """
 
 from copy import deepcopy
+from random import Random
 
 # CONSTANTS
 
@@ -15,6 +16,151 @@ BLACK, WHITE = 0, 1
 # moving right and left respectively.
 
 UNUSED_BITS = 0b100000000100000000100000000100000000
+VALID_SQUARES = UNUSED_BITS ^ (2**36 - 1)
+
+
+def _jump_table(step):
+    """
+    Returns, for every bit index, a tuple of (jumped square, landing
+    square, move) triples for the jumps of length 2 * step in each
+    direction step describes. Jumps leaving the board are omitted.
+    """
+    table = []
+    for i in range(36):
+        jumps = []
+        for s in step:
+            over, land = i + s, i + 2 * s
+            if 0 <= land < 36 and (VALID_SQUARES >> land) & (VALID_SQUARES >> over) & 1:
+                jumps.append((1 << over, 1 << land, -((1 << i) | (1 << land))))
+        table.append(tuple(jumps))
+    return table
+
+
+# Per-square jump tables in the order moves are generated: right then
+# left, forward (towards higher bits) before backward.
+FORWARD_JUMPS = _jump_table((4, 5))
+BACKWARD_JUMPS = _jump_table((-4, -5))
+
+# Maps the absolute value of every jump to the square it captures.
+CAPTURED = {
+    -move: over
+    for jumps in FORWARD_JUMPS for (over, _, move) in jumps
+}
+
+
+def _zobrist_keys(rnd):
+    """
+    Returns a dict mapping every valid square bit to a random 64-bit key.
+    """
+    return {
+        1 << i: rnd.getrandbits(64)
+        for i in range(36) if (VALID_SQUARES >> i) & 1
+    }
+
+
+# Zobrist keys. The generator is seeded so that hashes are the same in
+# every process and can be stored on disk.
+_zobrist_random = Random(0x5A3E1959)
+
+# Indexed by kind = 2 * colour + is_king: black men, black kings, white
+# men and white kings.
+PIECE_KEYS = [_zobrist_keys(_zobrist_random) for _ in range(4)]
+
+# Square of the piece that has to continue a multi-jump.
+JUMP_KEYS = _zobrist_keys(_zobrist_random)
+
+# Toggled when white is to move.
+SIDE_KEY = _zobrist_random.getrandbits(64)
+
+
+# Regions of the board scored by utils.position_score, and the move
+# system of utils.mov for black and white to move.
+POSITION_REGIONS = [0x88000, 0x1904c00, 0x3A0502E0, 0x7C060301F]
+MOVE_SYSTEM = [0x783c1e0f, 0x783c1e0f0]
+
+# Region tallies of a colour are packed in one integer, REGION_BITS
+# bits per region. REGION_UNITS maps every square bit to the amount a
+# piece on it adds to the tallies.
+REGION_BITS = 8
+REGION_UNITS = {
+    1 << i: sum(
+        1 << REGION_BITS * r
+        for r, region in enumerate(POSITION_REGIONS) if (region >> i) & 1
+    )
+    for i in range(36) if (VALID_SQUARES >> i) & 1
+}
+
+# Maps every square bit to the parity bits it toggles: bit colour is
+# set if the square is in MOVE_SYSTEM[colour].
+MOVE_SYSTEM_PARITY = {
+    1 << i: sum(1 << colour for colour in (BLACK, WHITE) if (MOVE_SYSTEM[colour] >> i) & 1)
+    for i in range(36) if (VALID_SQUARES >> i) & 1
+}
+
+
+# Turning the board around maps bit i to bit 34 - i, and the unused bits
+# onto each other: it reverses the 35 low bits. Bytes are reversed with
+# this table.
+_REVERSED_BYTES = bytes(int("{:08b}".format(i)[::-1], 2) for i in range(256))
+
+
+def rotate(bitboard):
+    """
+    Returns a bitboard turned around by 180 degrees.
+    """
+    return int.from_bytes(bitboard.to_bytes(5, "little").translate(_REVERSED_BYTES), "big") >> 5
+
+
+# Keys of the mirrored pieces: the key of a piece of the other colour on
+# the rotated square, by kind and square, and likewise for JUMP_KEYS.
+MIRROR_PIECE_KEYS = [
+    {square: PIECE_KEYS[kind ^ 2][rotate(square)] for square in PIECE_KEYS[kind]}
+    for kind in range(4)
+]
+MIRROR_JUMP_KEYS = {square: JUMP_KEYS[rotate(square)] for square in JUMP_KEYS}
+
+
+def mirror_move(move):
+    """
+    Returns the move of CheckerBoard.mirror() matching move. Mirroring
+    twice gives the original move back, so it also translates the moves
+    of a mirrored board back.
+    """
+    return -rotate(-move) if move < 0 else rotate(move)
+
+
+def canonical(board):
+    """
+    Returns (board, False) if black is to move, otherwise
+    (board.mirror(), True): every position has a black to move twin,
+    which plays the same.
+    """
+    if board.active == BLACK:
+        return board, False
+    return board.mirror(), True
+
+
+def canonical_hash(board):
+    """
+    Returns the hash of canonical(board), shared by a position and its
+    mirror.
+    """
+    if board.active == BLACK:
+        return board.hash
+    return board.mirror_hash()
+
+
+def _spread(sources, move):
+    """
+    Returns a list with move shifted onto every set bit of sources,
+    walking the bits from lowest to highest.
+    """
+    moves = []
+    while sources:
+        low = sources & -sources
+        moves.append(low * move)
+        sources ^= low
+    return moves
 
 
 class CheckerBoard:
@@ -46,6 +192,88 @@ class CheckerBoard:
 
         self.jump = 0
         self.mandatory_jumps = []
+        self.hash = self.compute_hash()
+        self.count_pieces()
+
+    def set_position(self, black, white, kings, active=BLACK, jumper=0):
+        """
+        Sets the state to an arbitrary position: black, white and kings
+        are bitboards of the black pieces, the white pieces and the
+        kings of both colours. jumper is the piece of the side to move
+        that has to continue a multi-jump, or 0.
+
+        Raises ValueError if the bitboards overlap or use invalid
+        squares, or if jumper has no jump to continue with.
+        """
+        if (black | white) & ~VALID_SQUARES or black & white or kings & ~(black | white):
+            raise ValueError("Invalid position")
+
+        self.active = active
+        self.passive = 1 - active
+
+        self.forward[BLACK] = black
+        self.backward[BLACK] = black & kings
+        self.pieces[BLACK] = black
+
+        self.forward[WHITE] = white & kings
+        self.backward[WHITE] = white
+        self.pieces[WHITE] = white
+
+        self.empty = VALID_SQUARES ^ (black | white)
+        self.jump = 0
+        self.mandatory_jumps = []
+        if jumper:
+            self.mandatory_jumps = self.jumps_from(jumper) if jumper & self.pieces[active] else []
+            if not self.mandatory_jumps:
+                raise ValueError("The jumping piece has no jump")
+            self.jump = 1
+        self.hash = self.compute_hash()
+        self.count_pieces()
+
+    def count_pieces(self):
+        """
+        Sets the running piece counts from the bitboards, from scratch.
+        make_move() keeps them up to date incrementally:
+
+        men and kings hold the number of men and kings of each colour,
+        regions the number of pieces of each colour in every region of
+        POSITION_REGIONS, packed REGION_BITS bits per region, and
+        move_system the parity of the number of all pieces in
+        MOVE_SYSTEM[colour], in bit colour.
+        """
+        self.men = [0, 0]
+        self.kings = [0, 0]
+        self.regions = [0, 0]
+        self.move_system = 0
+        for colour in (BLACK, WHITE):
+            kings = self.forward[colour] & self.backward[colour]
+            self.kings[colour] = bin(kings).count("1")
+            self.men[colour] = bin(self.pieces[colour] ^ kings).count("1")
+            squares = self.pieces[colour]
+            while squares:
+                square = squares & -squares
+                self.regions[colour] += REGION_UNITS[square]
+                self.move_system ^= MOVE_SYSTEM_PARITY[square]
+                squares ^= square
+
+    def compute_hash(self):
+        """
+        Returns the Zobrist hash of the current state, computed from
+        scratch. make_move() keeps self.hash equal to this value
+        incrementally.
+        """
+        h = SIDE_KEY if self.active == WHITE else 0
+        for colour in (BLACK, WHITE):
+            kings = self.forward[colour] & self.backward[colour]
+            for kind, squares in enumerate((self.pieces[colour] ^ kings, kings), 2 * colour):
+                keys = PIECE_KEYS[kind]
+                while squares:
+                    square = squares & -squares
+                    h ^= keys[square]
+                    squares ^= square
+        if self.jump:
+            h ^= JUMP_KEYS[-self.mandatory_jumps[0] & self.pieces[self.active]]
+        return h
 
     def update(self, move):
         """
@@ -55,82 +283,174 @@ class CheckerBoard:
         A legal move is represented by an integer with exactly two
         bits turned on: the old position and the new position.
         """
+        self.make_move(move)
+
+    def make_move(self, move):
+        """
+        Applies the input move in place and returns an undo record
+        that unmake_move() uses to restore the previous state.
+
+        The undo record is a tuple of the move and every piece of
+        mutable state, so restoring is exact, including an unfinished
+        multi-jump sequence.
+
+        self.hash is updated incrementally: the moving piece, a captured
+        piece, a promotion, the pending jump and the side to move each
+        toggle their Zobrist key. The piece counts of count_pieces() are
+        updated incrementally too.
+        """
+        forward, backward, pieces = self.forward, self.backward, self.pieces
+        men, kings, regions = self.men, self.kings, self.regions
+        undo = (
+            move, self.active,
+            forward[BLACK], forward[WHITE],
+            backward[BLACK], backward[WHITE],
+            pieces[BLACK], pieces[WHITE],
+            self.empty, self.jump, self.mandatory_jumps, self.hash,
+            men[BLACK], men[WHITE], kings[BLACK], kings[WHITE],
+            regions[BLACK], regions[WHITE], self.move_system,
+        )
+
         active, passive = self.active, self.passive
+        jumping = self.jump
         if move < 0:
             move *= -1
-            taken_piece = int(1 << sum(i for (i, b) in enumerate(bin(move)[::-1]) if b == '1')/2)
-            self.pieces[passive] ^= taken_piece
-            if self.forward[passive] & taken_piece:
-                self.forward[passive] ^= taken_piece
-            if self.backward[passive] & taken_piece:
-                self.backward[passive] ^= taken_piece
+            taken_piece = CAPTURED[move]
+            king = forward[passive] & backward[passive] & taken_piece
+            self.hash ^= PIECE_KEYS[2 * passive + (1 if king else 0)][taken_piece]
+            if king:
+                kings[passive] -= 1
+            else:
+                men[passive] -= 1
+            regions[passive] -= REGION_UNITS[taken_piece]
+            self.move_system ^= MOVE_SYSTEM_PARITY[taken_piece]
+            pieces[passive] ^= taken_piece
+            if forward[passive] & taken_piece:
+                forward[passive] ^= taken_piece
+            if backward[passive] & taken_piece:
+                backward[passive] ^= taken_piece
             self.jump = 1
 
-        self.pieces[active] ^= move
-        if self.forward[active] & move:
-            self.forward[active] ^= move
-        if self.backward[active] & move:
-            self.backward[active] ^= move
+        origin = move & pieces[active]
+        kind = 2 * active + (1 if origin & forward[active] & backward[active] else 0)
+        keys = PIECE_KEYS[kind]
+        self.hash ^= keys[origin] ^ keys[move ^ origin]
+        regions[active] += REGION_UNITS[move ^ origin] - REGION_UNITS[origin]
+        self.move_system ^= MOVE_SYSTEM_PARITY[origin] ^ MOVE_SYSTEM_PARITY[move ^ origin]
+        if jumping:
+            self.hash ^= JUMP_KEYS[origin]
 
-        destination = move & self.pieces[active]
-        self.empty = UNUSED_BITS ^ (2**36 - 1) ^ (self.pieces[BLACK] | self.pieces[WHITE])
+        pieces[active] ^= move
+        if forward[active] & move:
+            forward[active] ^= move
+        if backward[active] & move:
+            backward[active] ^= move
+
+        destination = move & pieces[active]
+        self.empty = UNUSED_BITS ^ (2**36 - 1) ^ (pieces[BLACK] | pieces[WHITE])
 
         if self.jump:
             self.mandatory_jumps = self.jumps_from(destination)
             if self.mandatory_jumps:
-                return
+                self.hash ^= JUMP_KEYS[destination]
+                return undo
 
+        promoted = False
         if active == BLACK and (destination & 0x780000000) != 0:
-            self.backward[BLACK] |= destination
+            promoted = not backward[BLACK] & destination
+            backward[BLACK] |= destination
         elif active == WHITE and (destination & 0xf) != 0:
-            self.forward[WHITE] |= destination
+            promoted = not forward[WHITE] & destination
+            forward[WHITE] |= destination
+        if promoted:
+            self.hash ^= keys[destination] ^ PIECE_KEYS[kind + 1][destination]
+            men[active] -= 1
+            kings[active] += 1
 
         self.jump = 0
-        self.active, self.passive = self.passive, self.active
+        self.active, self.passive = passive, active
+        self.hash ^= SIDE_KEY
+
+        return undo
+
+    def unmake_move(self, undo):
+        """
+        Restores the state saved by make_move() in the undo record.
+        Moves have to be unmade in the reverse order they were made.
+        """
+        (
+            _, active,
+            self.forward[BLACK], self.forward[WHITE],
+            self.backward[BLACK], self.backward[WHITE],
+            self.pieces[BLACK], self.pieces[WHITE],
+            self.empty, self.jump, self.mandatory_jumps, self.hash,
+            self.men[BLACK], self.men[WHITE], self.kings[BLACK], self.kings[WHITE],
+            self.regions[BLACK], self.regions[WHITE], self.move_system,
+        ) = undo
+        self.active, self.passive = active, 1 - active
 
     def peek_move(self, move):
         """
-        Updates the game state to reflect the effects of the input
-        move.
+        Returns a copy of the board with the input move applied,
+        leaving the current board untouched.
 
-        A legal move is represented by an integer with exactly two
-        bits turned on: the old position and the new position.
+        Searching should prefer make_move() and unmake_move(), which
+        don't allocate a new board.
         """
         board = deepcopy(self)
-        active, passive = board.active, board.passive
-
-        if move < 0:
-            move *= -1
-            taken_piece = int(1 << sum(i for (i, b) in enumerate(bin(move)[::-1]) if b == '1')/2)
-            board.pieces[passive] ^= taken_piece
-            if board.forward[passive] & taken_piece:
-                board.forward[passive] ^= taken_piece
-            if board.backward[passive] & taken_piece:
-                board.backward[passive] ^= taken_piece
-            board.jump = 1
-
-        board.pieces[active] ^= move
-        if board.forward[active] & move:
-            board.forward[active] ^= move
-        if board.backward[active] & move:
-            board.backward[active] ^= move
-
-        destination = move & board.pieces[active]
-        board.empty = UNUSED_BITS ^ (2**36 - 1) ^ (board.pieces[BLACK] | board.pieces[WHITE])
-
-        if board.jump:
-            board.mandatory_jumps = board.jumps_from(destination)
-            if board.mandatory_jumps:
-                return board
+        board.make_move(move)
+        return board
 
-        if active == BLACK and (destination & 0x780000000) != 0:
-            board.backward[BLACK] |= destination
-        elif active == WHITE and (destination & 0xf) != 0:
-            board.forward[WHITE] |= destination
+    def copy(self):
+        """
+        Returns a copy of the board. It is much cheaper than deepcopy(),
+        since only the bitboard and count lists need copying:
+        mandatory_jumps is replaced, never changed in place.
+        """
+        board = CheckerBoard.__new__(CheckerBoard)
+        board.__dict__.update(self.__dict__)
+        board.forward = self.forward[:]
+        board.backward = self.backward[:]
+        board.pieces = self.pieces[:]
+        board.men = self.men[:]
+        board.kings = self.kings[:]
+        board.regions = self.regions[:]
+        return board
 
-        board.jump = 0
-        board.active, board.passive = board.passive, board.active
+    def mirror_hash(self):
+        """
+        Returns the hash of mirror(), computed without building it.
+        """
+        h = SIDE_KEY if self.active == BLACK else 0
+        for colour in (BLACK, WHITE):
+            kings = self.forward[colour] & self.backward[colour]
+            for kind, squares in enumerate((self.pieces[colour] ^ kings, kings), 2 * colour):
+                keys = MIRROR_PIECE_KEYS[kind]
+                while squares:
+                    square = squares & -squares
+                    h ^= keys[square]
+                    squares ^= square
+        if self.jump:
+            h ^= MIRROR_JUMP_KEYS[-self.mandatory_jumps[0] & self.pieces[self.active]]
+        return h
 
+    def mirror(self):
+        """
+        Returns the board turned around, with the colours swapped: black
+        plays white's pieces and white black's, and the other side is to
+        move. Both positions play the same, move for move through
+        mirror_move().
+        """
+        kings = (
+            self.forward[BLACK] & self.backward[BLACK]
+            | self.forward[WHITE] & self.backward[WHITE]
+        )
+        jumper = -self.mandatory_jumps[0] & self.pieces[self.active] if self.jump else 0
+        board = CheckerBoard()
+        board.set_position(
+            rotate(self.pieces[WHITE]), rotate(self.pieces[BLACK]), rotate(kings),
+            self.passive, rotate(jumper),
+        )
         return board
 
     # These methods return an integer whose active bits are those squares
@@ -183,12 +503,10 @@ class CheckerBoard:
         rb = self.right_backward()
         lb = self.left_backward()
 
-        moves = [0x11 << i for (i, bit) in enumerate(bin(rf)[::-1]) if bit == '1']
-        moves += [0x21 << i for (i, bit) in enumerate(bin(lf)[::-1]) if bit == '1']
-        moves += [0x11 << i - 4 for (i, bit) in enumerate(bin(rb)[::-1]) if bit == '1']
-        moves += [0x21 << i - 5 for (i, bit) in enumerate(bin(lb)[::-1]) if bit == '1']
-
-        return moves
+        return (
+            _spread(rf, 0x11) + _spread(lf, 0x21)
+            + _spread(rb >> 4, 0x11) + _spread(lb >> 5, 0x21)
+        )
 
     def get_jumps(self):
         """
@@ -204,15 +522,13 @@ class CheckerBoard:
         rbj = self.right_backward_jumps()
         lbj = self.left_backward_jumps()
 
-        moves = []
+        if (rfj | lfj | rbj | lbj) == 0:
+            return []
 
-        if (rfj | lfj | rbj | lbj) != 0:
-            moves += [-0x101 << i for (i, bit) in enumerate(bin(rfj)[::-1]) if bit == '1']
-            moves += [-0x401 << i for (i, bit) in enumerate(bin(lfj)[::-1]) if bit == '1']
-            moves += [-0x101 << i - 8 for (i, bit) in enumerate(bin(rbj)[::-1]) if bit == '1']
-            moves += [-0x401 << i - 10 for (i, bit) in enumerate(bin(lbj)[::-1]) if bit == '1']
-
-        return moves
+        return (
+            _spread(rfj, -0x101) + _spread(lfj, -0x401)
+            + _spread(rbj >> 8, -0x101) + _spread(lbj >> 10, -0x401)
+        )
 
     def jumps_from(self, piece):
         """
@@ -222,37 +538,25 @@ class CheckerBoard:
         the square of the piece in question (using the internal numeric
         representation of the board).
         """
+        square = piece.bit_length() - 1
         if self.active == BLACK:
-            rfj = (self.empty >> 8) & (self.pieces[self.passive] >> 4) & piece
-            lfj = (self.empty >> 10) & (self.pieces[self.passive] >> 5) & piece
-
+            directions = [FORWARD_JUMPS]
             # piece at square is a king
             if piece & self.backward[self.active]:
-                rbj = (self.empty << 8) & (self.pieces[self.passive] << 4) & piece
-                lbj = (self.empty << 10) & (self.pieces[self.passive] << 5) & piece
-            else:
-                rbj = 0
-                lbj = 0
+                directions.append(BACKWARD_JUMPS)
         else:
-            rbj = (self.empty << 8) & (self.pieces[self.passive] << 4) & piece
-            lbj = (self.empty << 10) & (self.pieces[self.passive] << 5) & piece
-
+            directions = [BACKWARD_JUMPS]
             # piece at square is a king
             if piece & self.forward[self.active]:
-                rfj = (self.empty >> 8) & (self.pieces[self.passive] >> 4) & piece
-                lfj = (self.empty >> 10) & (self.pieces[self.passive] >> 5) & piece
-            else:
-                rfj = 0
-                lfj = 0
-
-        moves = []
-        if (rfj | lfj | rbj | lbj) != 0:
-            moves += [-0x101 << i for (i, bit) in enumerate(bin(rfj)[::-1]) if bit == '1']
-            moves += [-0x401 << i for (i, bit) in enumerate(bin(lfj)[::-1]) if bit == '1']
-            moves += [-0x101 << i - 8 for (i, bit) in enumerate(bin(rbj)[::-1]) if bit == '1']
-            moves += [-0x401 << i - 10 for (i, bit) in enumerate(bin(lbj)[::-1]) if bit == '1']
-
-        return moves
+                directions.insert(0, FORWARD_JUMPS)
+
+        passive, empty = self.pieces[self.passive], self.empty
+        return [
+            move
+            for table in directions
+            for (over, land, move) in table[square]
+            if over & passive and land & empty
+        ]
 
     def takeable(self, piece):
         """
@@ -0,0 +1,346 @@
+"""
+This module converts CheckerBoards and games to and from text and
+binary encodings:
+
+- PDN, the Portable Draughts Notation used to exchange games, and the
+  FEN strings it uses for positions,
+- a fixed 16-byte packing of a position. batch.pack_arrays() and
+  batch.unpack_arrays() convert whole arrays of positions to and from
+  the same layout.
+
+Squares are numbered 1 to 32 as in PDN, from black's side of the board:
+black starts on squares 1 to 12 and white on 21 to 32. Square n is the
+nth valid bit of the 36-bit bitboards, SQUARES[n - 1].
+
+Usage: python notation.py FILE
+checks every game of a PDN file and prints its final position.
+"""
+
+import argparse
+import re
+import struct
+import textwrap
+
+from checkers import BLACK, WHITE, VALID_SQUARES, CheckerBoard
+
+SQUARES = [1 << i for i in range(36) if (VALID_SQUARES >> i) & 1]
+SQUARE_NUMBERS = {square: number for number, square in enumerate(SQUARES, start=1)}
+
+COLOURS = {"B": BLACK, "W": WHITE}
+COLOUR_NAMES = {BLACK: "B", WHITE: "W"}
+
+# PDN results, from black's side: black, the first player, wins 1-0.
+RESULTS = {BLACK: "1-0", WHITE: "0-1", None: "*", -1: "1/2-1/2"}
+RESULT_TOKENS = {"1-0", "0-1", "1/2-1/2", "*", "2-0", "0-2", "1-1", "0-0"}
+
+# Packed position: black pieces, white pieces and kings as 32-bit
+# square sets (bit n - 1 for square n), then the side to move in bit 0
+# and the square of the piece continuing a multi-jump, or 0, above it.
+PACKED_FORMAT = struct.Struct("<4I")
+PACKED_SIZE = PACKED_FORMAT.size
+
+
+def compress(bitboard):
+    """
+    Returns a 36-bit bitboard as a 32-bit square set, dropping the
+    unused bits.
+    """
+    return (
+        (bitboard & 0xff) | (bitboard >> 1 & 0xff00)
+        | (bitboard >> 2 & 0xff0000) | (bitboard >> 3 & 0xff000000)
+    )
+
+
+def expand(squares):
+    """
+    Returns the 36-bit bitboard of a 32-bit square set.
+    """
+    return (
+        (squares & 0xff) | (squares & 0xff00) << 1
+        | (squares & 0xff0000) << 2 | (squares & 0xff000000) << 3
+    )
+
+
+def jumper(board):
+    """
+    Returns the piece that has to continue a multi-jump, or 0.
+    """
+    if not board.jump:
+        return 0
+    return -board.mandatory_jumps[0] & board.pieces[board.active]
+
+
+def pack_board(board):
+    """
+    Returns the 16-byte packing of a board.
+    """
+    kings = (
+        board.forward[BLACK] & board.backward[BLACK]
+        | board.forward[WHITE] & board.backward[WHITE]
+    )
+    piece = jumper(board)
+    return PACKED_FORMAT.pack(
+        compress(board.pieces[BLACK]), compress(board.pieces[WHITE]), compress(kings),
+        board.active | (SQUARE_NUMBERS[piece] << 1 if piece else 0),
+    )
+
+
+def unpack_board(data, offset=0):
+    """
+    Returns the board packed at offset of data by pack_board().
+    """
+    black, white, kings, flags = PACKED_FORMAT.unpack_from(data, offset)
+    square = flags >> 1
+    board = CheckerBoard()
+    board.set_position(
+        expand(black), expand(white), expand(kings),
+        active=flags & 1, jumper=SQUARES[square - 1] if square else 0,
+    )
+    return board
+
+
+def to_fen(board):
+    """
+    Returns the PDN FEN string of a board, e.g. "B:W21,22,K30:B1,K9":
+    the side to move, then the squares of each colour, kings marked by
+    K.
+
+    FEN can't describe a multi-jump in progress; such a board raises
+    ValueError.
+    """
+    if board.jump:
+        raise ValueError("FEN can't describe an unfinished multi-jump")
+    fields = [COLOUR_NAMES[board.active]]
+    for colour in (WHITE, BLACK):
+        kings = board.forward[colour] & board.backward[colour]
+        fields.append(COLOUR_NAMES[colour] + ",".join(
+            ("K%d" if square & kings else "%d") % number
+            for number, square in enumerate(SQUARES, start=1)
+            if square & board.pieces[colour]
+        ))
+    return ":".join(fields)
+
+
+def from_fen(fen):
+    """
+    Returns the board of a PDN FEN string. Square ranges such as 1-12
+    are accepted. Raises ValueError if the string is malformed.
+    """
+    fields = fen.strip().strip('"').rstrip(".").split(":")
+    if len(fields) != 3 or fields[0].upper() not in COLOURS:
+        raise ValueError("Invalid FEN: %r" % fen)
+    pieces = [0, 0]
+    kings = 0
+    for field in fields[1:]:
+        field = field.strip()
+        if not field or field[0].upper() not in COLOURS:
+            raise ValueError("Invalid FEN: %r" % fen)
+        colour = COLOURS[field[0].upper()]
+        for item in filter(None, field[1:].split(",")):
+            king = item[0].upper() == "K"
+            numbers = item[1:] if king else item
+            try:
+                first, _, last = numbers.partition("-")
+                squares = SQUARES[int(first) - 1:int(last or first)]
+            except ValueError:
+                raise ValueError("Invalid FEN: %r" % fen)
+            if not squares or int(first) < 1:
+                raise ValueError("Invalid FEN: %r" % fen)
+            for square in squares:
+                pieces[colour] |= square
+                if king:
+                    kings |= square
+
+    board = CheckerBoard()
+    board.set_position(pieces[BLACK], pieces[WHITE], kings, COLOURS[fields[0].upper()])
+    return board
+
+
+def move_squares(board, move):
+    """
+    Returns the squares a move of the side to move of board goes from
+    and to.
+    """
+    move = abs(move)
+    origin = move & board.pieces[board.active]
+    return SQUARE_NUMBERS[origin], SQUARE_NUMBERS[move ^ origin]
+
+
+def move_texts(moves, board=None):
+    """
+    Returns the PDN text of every turn of a sequence of moves played
+    from board, the starting position by default: "11-15" for a move
+    and "15x24x31" for a multi-jump, whose moves are all joined. board
+    isn't changed.
+    """
+    board = board.copy() if board is not None else CheckerBoard()
+    texts = []
+    for move in moves:
+        origin, destination = move_squares(board, move)
+        if board.jump:
+            texts[-1] += "x%d" % destination
+        else:
+            texts.append("%d%s%d" % (origin, "x" if move < 0 else "-", destination))
+        board.make_move(move)
+    return texts
+
+
+def result(moves, board=None):
+    """
+    Returns the PDN result of a game played from board: "1-0" if black
+    won, "0-1" if white won and "*" if the game isn't over.
+    """
+    board = board.copy() if board is not None else CheckerBoard()
+    for move in moves:
+        board.make_move(move)
+    return RESULTS[board.winner]
+
+
+def write_pdn(moves, tags=None, board=None):
+    """
+    Returns the PDN of a game played from board, the starting position
+    by default. tags are added to the header; the Result tag defaults
+    to result(), and a FEN tag is added for a board other than the
+    starting position.
+    """
+    start = CheckerBoard()
+    tags = dict(tags or {})
+    tags.setdefault("Result", result(moves, board))
+    if board is not None and (to_fen(board) != to_fen(start)):
+        tags.setdefault("SetUp", "1")
+        tags.setdefault("FEN", to_fen(board))
+    header = "".join('[%s "%s"]\n' % (name, value) for name, value in tags.items())
+
+    board = board if board is not None else start
+    number = 1
+    colour = board.active
+    tokens = []
+    for i, text in enumerate(move_texts(moves, board)):
+        if colour == BLACK:
+            text = "%d. %s" % (number, text)
+        elif i == 0:
+            text = "%d... %s" % (number, text)
+        if colour == WHITE:
+            number += 1
+        colour = 1 - colour
+        tokens.append(text)
+    tokens.append(tags["Result"])
+    return header + "\n" + textwrap.fill(" ".join(tokens), 79) + "\n"
+
+
+def _tokens(text):
+    # Comments, variations, move numbers and annotations are dropped.
+    text = re.sub(r"\{[^}]*\}|;[^\n]*", " ", text)
+    while "(" in text:
+        stripped = re.sub(r"\([^()]*\)", " ", text)
+        if stripped == text:
+            break
+        text = stripped
+    text = re.sub(r"\d+\.(\.\.)?|\$\d+|[!?]+", " ", text)
+    return text.split()
+
+
+def _jump_path(board, squares):
+    """
+    Returns the jumps the side to move of board makes to go through
+    squares in order, squares[0] being the jumping piece, or None.
+    Squares a jump lands on may be left out; the first path found is
+    taken.
+    """
+    piece = SQUARES[squares[0] - 1]
+    for move in board.get_moves():
+        if move >= 0 or not piece & -move:
+            continue
+        child = board.copy()
+        child.make_move(move)
+        landing = SQUARE_NUMBERS[-move ^ piece]
+        rest = squares[2:] if landing == squares[1] else squares[1:]
+        if not child.jump:
+            if not rest:
+                return [move]
+        elif rest:
+            path = _jump_path(child, [landing] + rest)
+            if path is not None:
+                return [move] + path
+    return None
+
+
+def parse_move(board, text):
+    """
+    Returns the moves of board's side to move that the PDN text of a
+    turn describes, or raises ValueError if it isn't legal.
+    """
+    try:
+        squares = [int(square) for square in re.split(r"[-x:]", text)]
+    except ValueError:
+        raise ValueError("Invalid move: %r" % text)
+    if len(squares) < 2 or not all(1 <= square <= 32 for square in squares):
+        raise ValueError("Invalid move: %r" % text)
+
+    if "x" in text or ":" in text:
+        path = _jump_path(board, squares)
+        if path is None:
+            raise ValueError("Illegal jump: %r" % text)
+        return path
+    if len(squares) != 2:
+        raise ValueError("Invalid move: %r" % text)
+    move = SQUARES[squares[0] - 1] | SQUARES[squares[1] - 1]
+    if move not in board.get_moves():
+        raise ValueError("Illegal move: %r" % text)
+    return [move]
+
+
+def read_pdn(text):
+    """
+    Yields a (tags, moves) pair for every game of a PDN text: the
+    header tags as a dict and the moves as played by
+    CheckerBoard.update(). A game with a FEN tag starts from that
+    position; the board to replay it on is from_fen(tags["FEN"]).
+    Raises ValueError on an illegal move.
+    """
+    tags = {}
+    movetext = []
+    for line in text.splitlines():
+        tag = re.match(r'\s*\[(\w+)\s+"(.*)"\]\s*$', line)
+        if tag is None:
+            movetext.append(line)
+            continue
+        if "".join(movetext).strip():
+            yield tags, _read_moves(tags, "\n".join(movetext))
+            tags = {}
+        movetext = []
+        tags[tag.group(1)] = tag.group(2)
+    if "".join(movetext).strip():
+        yield tags, _read_moves(tags, "\n".join(movetext))
+
+
+def _read_moves(tags, movetext):
+    board = from_fen(tags["FEN"]) if "FEN" in tags else CheckerBoard()
+    moves = []
+    for token in _tokens(movetext):
+        if token in RESULT_TOKENS:
+            break
+        for move in parse_move(board, token):
+            board.make_move(move)
+            moves.append(move)
+    return moves
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the games of a PDN file.")
+    parser.add_argument("file")
+    args = parser.parse_args()
+
+    with open(args.file) as pdn:
+        text = pdn.read()
+    for number, (tags, moves) in enumerate(read_pdn(text), start=1):
+        start = from_fen(tags["FEN"]) if "FEN" in tags else CheckerBoard()
+        board = start.copy()
+        for move in moves:
+            board.make_move(move)
+        print("Game %d: %d moves, %s" % (number, len(moves), result(moves, start)))
+        print(board)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""
+This module implements searching with a Player on a pool of worker
+processes, either by splitting the root moves or by lazy SMP.
+
+Run it as a script to measure lazy SMP time-to-depth on a fixed set of
+positions.
+"""
+
+import argparse
+import multiprocessing
+import random
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from copy import deepcopy
+
+from transposition import SharedTranspositionTable
+
+# Counters of Player.reset_counters() that a RootSplitter adds up over
+# the root moves.
+COUNTERS = ("nodes", "leaves", "cutoffs", "first_move_cutoffs", "tablebase_hits")
+
+# Player copy owned by a worker process. It lives as long as the
+# process, so its transposition table, killers and history stay warm
+# between searches.
+_player = None
+_generation = None
+
+
+def _init_worker(player, stop_event=None):
+    global _player
+    _player = player
+    player.stop_event = stop_event
+    # A worker searches on its own, it never starts a pool of its own.
+    player.workers = 0
+    # Root moves searched in workers are not profiled.
+    player.profiler = None
+
+
+def _search_move(board, move, depth, alpha, deadline, generation):
+    """
+    Searches a single root move in a worker. Returns the score, the
+    COUNTERS of the search by name, its max_ply, the principal
+    variation from move on and the CPU time it took.
+    """
+    global _generation
+    player = _player
+    if generation != _generation:
+        _generation = generation
+        player.killers = {}
+        if player.table is not None:
+            player.table.new_search()
+
+    player.reset_counters()
+    player.deadline = deadline
+    start = time.process_time()
+    try:
+        score = player.search_move(board, deepcopy(board), move, depth, alpha)
+    finally:
+        player.deadline = None
+    counts = {name: getattr(player, name) for name in COUNTERS}
+    line = [move] + player.pv.get(1, [])
+    return score, counts, player.max_ply, line, time.process_time() - start
+
+
+def _lazy_search(board, depth, helper, generation):
+    """
+    Deepens iteratively up to depth in a lazy SMP worker. Odd helpers
+    start a ply deeper than even ones. Returns the best move, the depth
+    completed and the number of nodes searched.
+    """
+    player = _player
+    player.table.generation = generation
+    player.killers = {}
+    player.reset_counters()
+    move, reached = player.iterative_deepening(
+        board, max_depth=depth, start_depth=1 + helper % 2,
+    )
+    return move, reached, player.nodes
+
+
+class RootSplitter():
+    """
+    Searches root moves on a pool of long-lived worker processes.
+
+    The eldest root move is searched first and alone (young brothers
+    wait), the rest are handed out one per idle worker. Every move
+    is submitted with the best score finished so far as its alpha
+    bound, so later subtrees are cut against earlier results. The
+    bound is only passed when a move is submitted: a move already
+    being searched keeps the bound it started with, even if a move
+    finishing meanwhile raises it.
+
+    A move only replaces the best one if its score is exact, and ties
+    go to the earlier move, so the chosen move is the one the serial
+    search would choose at the same depth.
+    """
+
+    def __init__(self, player, workers):
+        self.workers = workers
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(player,),
+        )
+        self.generation = 0
+        # COUNTERS, max_ply and principal_variation of the last search,
+        # the line of its best move.
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.max_ply = 0
+        self.principal_variation = []
+        # Wall time of the last search, and the CPU time spent by the
+        # workers over it. Utilisation is not a speedup: it counts the
+        # extra nodes searched with looser bounds than a serial search
+        # as useful work. benchmark.py measures the speedup.
+        self.wall_time = 0
+        self.utilisation = 0
+
+    def search_root(self, board, moves, depth, deadline=None):
+        """
+        Searches every move in moves to the given depth. Returns the
+        best move and the list of scores of moves. Scores of moves that
+        can't be best are only upper bounds.
+        """
+        self.generation += 1
+        start = time.time()
+        scores = [None] * len(moves)
+        exact = [False] * len(moves)
+        alphas = [None] * len(moves)
+        lines = [None] * len(moves)
+        pending = {}
+        next_index = 0
+        busy_time = 0
+        self.counts = dict.fromkeys(COUNTERS, 0)
+        self.max_ply = 0
+
+        try:
+            while next_index < len(moves) or pending:
+                limit = 1 if scores[0] is None else self.workers
+                while next_index < len(moves) and len(pending) < limit:
+                    alphas[next_index] = self.alpha_bound(scores, exact, next_index)
+                    future = self.executor.submit(
+                        _search_move, board, moves[next_index], depth,
+                        alphas[next_index], deadline, self.generation,
+                    )
+                    pending[future] = next_index
+                    next_index += 1
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = pending.pop(future)
+                    score, counts, max_ply, lines[index], elapsed = future.result()
+                    scores[index] = score
+                    exact[index] = alphas[index] is None or score > alphas[index]
+                    for name, count in counts.items():
+                        self.counts[name] += count
+                    self.max_ply = max(self.max_ply, max_ply)
+                    busy_time += elapsed
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+        best = max(
+            (index for index in range(len(moves)) if exact[index]),
+            key=lambda index: (scores[index], -index),
+        )
+        self.principal_variation = lines[best]
+        self.wall_time = time.time() - start
+        self.utilisation = busy_time / self.wall_time if self.wall_time else 0
+        return moves[best], scores
+
+    @staticmethod
+    def alpha_bound(scores, exact, index):
+        """
+        Returns the alpha bound for searching the index-th move, or
+        None if no move has finished yet. A later move only beats the
+        index-th one with a strictly higher score, so its score is
+        lowered by one.
+        """
+        bound = None
+        for i, score in enumerate(scores):
+            if score is None or not exact[i]:
+                continue
+            if i > index:
+                score -= 1
+            if bound is None or score > bound:
+                bound = score
+        return bound
+
+    def close(self):
+        self.executor.shutdown()
+
+
+class LazySMP():
+    """
+    Searches the same root on several worker processes at once, all
+    sharing one SharedTranspositionTable (lazy SMP). Every worker
+    deepens iteratively to the target depth, odd ones starting a ply
+    deeper, so they fill the table ahead of each other. The move of the
+    first worker to complete the target depth is played, and the rest
+    are stopped.
+
+    It has a best_move() method, so it can stand in for the player it
+    wraps, which is changed to use the shared table. It has no search()
+    method, since agents with one are expected to return SearchStats
+    too. The player has to search with nega_max; ValueError is raised
+    otherwise.
+    """
+
+    def __init__(self, player, workers, table_size_mb=64):
+        if player.search_method_name != "nega_max":
+            raise ValueError("Lazy SMP needs a player searching with nega_max")
+        self.player = player
+        self.workers = workers
+        self.table = SharedTranspositionTable(table_size_mb)
+        player.table = self.table
+        self.stop_event = multiprocessing.Event()
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker,
+            initargs=(player, self.stop_event),
+        )
+        self.generation = 0
+        self.nodes = 0
+        self.elapsed = 0
+
+    def best_move(self, board):
+        return self.search_depth(board, self.player.depth)
+
+    def search_depth(self, board, depth):
+        """
+        Returns the best move found at the given depth. nodes and
+        elapsed are set to the work done by all the workers.
+        """
+        moves = board.get_moves()
+        if len(moves) == 1:
+            return moves[0]
+
+        self.generation += 1
+        self.stop_event.clear()
+        start = time.time()
+        futures = [
+            self.executor.submit(_lazy_search, board, depth, helper, self.generation)
+            for helper in range(self.workers)
+        ]
+
+        best_move = None
+        pending = set(futures)
+        while pending and best_move is None:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                move, reached, _ = future.result()
+                if reached == depth and best_move is None:
+                    best_move = move
+        self.elapsed = time.time() - start
+
+        self.stop_event.set()
+        wait(pending)
+        self.nodes = sum(future.result()[2] for future in futures)
+        return best_move
+
+    def close(self):
+        self.executor.shutdown()
+        self.table.close()
+
+
+def position_suite(count, seed=0, plies=(10, 30)):
+    """
+    Returns count positions reached by playing a random number of
+    random moves (between the bounds of plies) from the start.
+    """
+    from checkers import CheckerBoard
+
+    rnd = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board = CheckerBoard()
+        for _ in range(rnd.randint(*plies)):
+            moves = board.get_moves()
+            if not moves:
+                break
+            board.update(rnd.choice(moves))
+        if not board.is_over():
+            positions.append(board)
+    return positions
+
+
+def main():
+    from agents.arthur import ArthurPlayer
+
+    parser = argparse.ArgumentParser(description="Lazy SMP time-to-depth benchmark.")
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--positions", type=int, default=8)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--table-size", type=int, default=64, help="in MB")
+    args = parser.parse_args()
+
+    positions = position_suite(args.positions)
+    baseline = None
+    for workers in args.workers:
+        smp = LazySMP(ArthurPlayer(depth=args.depth), workers, args.table_size)
+        elapsed = nodes = 0
+        for board in positions:
+            smp.search_depth(board, args.depth)
+            elapsed += smp.elapsed
+            nodes += smp.nodes
+        smp.close()
+
+        baseline = baseline or elapsed
+        print("workers %2d  time-to-depth %8.2fs  speedup %5.2f  nodes %d" % (
+            workers, elapsed, baseline / elapsed, nodes,
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+This module implements perft: counting the positions reachable from a
+board in a given number of moves. It verifies CheckerBoard move
+generation against known counts and measures its speed.
+
+A multi-jump counts as a single move, however many jumps it takes.
+
+Usage: python perft.py DEPTH [--divide] [--verify]
+"""
+
+import argparse
+import time
+
+from checkers import CheckerBoard
+
+# Perft counts of the start position, indexed by depth
+START_POSITION_COUNTS = [
+    1, 7, 49, 302, 1469, 7361, 36768, 179740, 845931, 3963680,
+    18391564, 85242128, 388623673, 1766623630,
+]
+
+
+def perft(board, depth):
+    """
+    Returns the number of move sequences of length depth from board.
+    The board is restored on return.
+    """
+    if depth == 0:
+        return 1
+
+    moves = board.get_moves()
+    if depth == 1 and moves and moves[0] > 0:
+        return len(moves)
+
+    active = board.active
+    nodes = 0
+    for move in moves:
+        undo = board.make_move(move)
+        if board.active == active:
+            nodes += perft(board, depth)
+        else:
+            nodes += perft(board, depth - 1)
+        board.unmake_move(undo)
+    return nodes
+
+
+def divide(board, depth):
+    """
+    Returns a list of (move, count) pairs: the perft count of depth
+    below each legal move of board.
+    """
+    active = board.active
+    counts = []
+    for move in board.get_moves():
+        undo = board.make_move(move)
+        counts.append((move, perft(board, depth if board.active == active else depth - 1)))
+        board.unmake_move(undo)
+    return counts
+
+
+def move_string(move):
+    """
+    Returns move in "orig-dest" notation, or "orig x dest" for a jump,
+    using the square numbers of get_move_strings().
+    """
+    separator = "x" if move < 0 else "-"
+    move = abs(move)
+    low, high = move & -move, move.bit_length() - 1
+    low = low.bit_length() - 1
+    return "%i%s%i" % (1 + low - low // 9, separator, 1 + high - high // 9)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Count and time CheckerBoard move generation.")
+    parser.add_argument("depth", type=int)
+    parser.add_argument("--divide", action="store_true", help="print the count below each move")
+    parser.add_argument("--verify", action="store_true", help="check depths 1..DEPTH against known counts")
+    args = parser.parse_args()
+
+    board = CheckerBoard()
+    depths = range(1, args.depth + 1) if args.verify else [args.depth]
+    failed = False
+    for depth in depths:
+        start = time.time()
+        if args.divide:
+            counts = divide(board, depth)
+            for move, count in counts:
+                print("%8s %d" % (move_string(move), count))
+            nodes = sum(count for _, count in counts)
+        else:
+            nodes = perft(board, depth)
+        elapsed = time.time() - start
+
+        line = "depth %2d  nodes %12d  %8.2fs  %10.0f nodes/s" % (
+            depth, nodes, elapsed, nodes / elapsed if elapsed else 0,
+        )
+        if depth < len(START_POSITION_COUNTS):
+            expected = START_POSITION_COUNTS[depth]
+            line += "  ok" if nodes == expected else "  expected %d" % expected
+            failed = failed or nodes != expected
+        print(line)
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,151 @@
+"""
+This module implements opt-in profiling of a Player's search.
+
+A Profiler attached to a player times the parts of every best_move()
+call and keeps one record per call, which can be exported as JSON.
+Nothing is timed unless a profiler is attached: the player then times
+its evaluations, and searches ProfiledBoard copies of the root board.
+No method is replaced on an instance, so a profiled player can still be
+pickled into worker processes.
+"""
+
+import json
+import time
+from collections import defaultdict
+
+from checkers import CheckerBoard
+
+
+class ProfiledBoard(CheckerBoard):
+    """
+    CheckerBoard timing its move generation and move making with the
+    Profiler in its profiler attribute, and counting the moves
+    generated at each ply of the profiled player.
+    """
+
+    def get_moves(self):
+        profiler = self.profiler
+        moves = profiler.call("get_moves", CheckerBoard.get_moves, self)
+        profiler.positions[profiler.player.ply] += 1
+        profiler.moves[profiler.player.ply] += len(moves)
+        return moves
+
+    def make_move(self, move):
+        return self.profiler.call("make_move", CheckerBoard.make_move, self, move)
+
+    def unmake_move(self, undo):
+        return self.profiler.call("unmake_move", CheckerBoard.unmake_move, self, undo)
+
+    def peek_move(self, move):
+        # Peeks from a plain copy, so that the profiler isn't deep copied.
+        return self.profiler.call("peek_move", CheckerBoard.peek_move, self.copy(), move)
+
+
+class Profiler():
+    """
+    Collects, for each best_move() call of the player it is attached
+    to, a record with:
+
+    - calls and times: the number of calls and the cumulative seconds
+      spent in each timed function. These are evaluate(), the feature
+      functions of players that time them, and get_moves(),
+      make_move(), unmake_move() and peek_move() of the searched
+      boards. Times are inclusive, so evaluate() includes its features.
+    - depths: for every depth searched, the nodes, the seconds, the
+      nodes per second and the effective branching factor, the ratio
+      of nodes to those of the previous depth.
+    - branching: the average number of legal moves generated at each
+      ply.
+
+    Root moves searched in worker processes are not profiled.
+    """
+
+    def __init__(self):
+        self.player = None
+        self.records = []
+        self.calls = defaultdict(int)
+        self.times = defaultdict(float)
+        self.positions = defaultdict(int)
+        self.moves = defaultdict(int)
+        self.depths = []
+        self.move_start = self.depth_start = 0
+        self.depth_nodes = 0
+
+    def attach(self, player):
+        """
+        Profiles player, which keeps using this profiler until it is
+        thrown away.
+        """
+        self.player = player
+        player.profiler = self
+
+    def call(self, name, function, *args):
+        """
+        Returns function(*args), counting the call and its time under
+        name.
+        """
+        start = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            self.times[name] += time.perf_counter() - start
+            self.calls[name] += 1
+
+    def profiled_board(self, board):
+        """
+        Returns a ProfiledBoard sharing the state of board, which is not
+        used any more.
+        """
+        profiled = ProfiledBoard.__new__(ProfiledBoard)
+        profiled.__dict__.update(board.__dict__)
+        profiled.profiler = self
+        return profiled
+
+    def start_move(self):
+        for counters in (self.calls, self.times, self.positions, self.moves):
+            counters.clear()
+        self.depths = []
+        self.move_start = time.perf_counter()
+
+    def start_depth(self, nodes):
+        self.depth_start = time.perf_counter()
+        self.depth_nodes = nodes
+
+    def finish_depth(self, depth, nodes):
+        elapsed = time.perf_counter() - self.depth_start
+        nodes -= self.depth_nodes
+        previous = self.depths[-1]["nodes"] if self.depths else 0
+        self.depths.append({
+            "depth": depth,
+            "nodes": nodes,
+            "elapsed": elapsed,
+            "nodes_per_second": nodes / elapsed if elapsed else 0,
+            "branching_factor": nodes / previous if previous else None,
+        })
+
+    def finish_move(self, move, nodes):
+        """
+        Closes the record of a best_move() call and returns it.
+        """
+        elapsed = time.perf_counter() - self.move_start
+        record = {
+            "move": move,
+            "elapsed": elapsed,
+            "nodes": nodes,
+            "nodes_per_second": nodes / elapsed if elapsed else 0,
+            "calls": dict(self.calls),
+            "times": dict(self.times),
+            "depths": self.depths,
+            "branching": {
+                ply: self.moves[ply] / count for ply, count in sorted(self.positions.items())
+            },
+        }
+        self.records.append(record)
+        return record
+
+    def json_record(self, **context):
+        """
+        Returns the record of the last move as a line of JSON, with the
+        context keys (e.g. game and turn numbers) added to it.
+        """
+        return json.dumps(dict(context, **self.records[-1]))
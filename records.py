@@ -0,0 +1,391 @@
+"""
+This module writes and reads game records: one line of JSON per game,
+holding its moves and the time taken by each, from which any position
+of the game can be rebuilt.
+
+Next to every record file FILE, FILE.pos holds every position of every
+game, packed with notation.pack_board() along with the round it is in.
+An index FILE.idx holds, for each game, its number, the byte offset of
+its record, and the number of its first position in FILE.pos and how
+many it has, as four native unsigned 64-bit integers, sorted by game
+number. GameArchive memory-maps the three files and binary searches
+the index, so it reads any game or position without scanning the games
+before it or replaying the moves before it.
+
+Usage: python records.py FILE GAME [PLY] [--turn TURN]
+prints the board of game GAME after PLY moves, at the start of round
+TURN, or every position of the game; with --pdn, it prints the game in
+PDN instead. python records.py FILE --index rebuilds the index of FILE.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import struct
+from array import array
+
+from checkers import BLACK, CheckerBoard
+from notation import PACKED_SIZE, RESULTS, pack_board, unpack_board, write_pdn
+
+# Game number, record offset, first position and number of positions
+INDEX_FIELDS = 4
+
+# Packed board and round
+POSITION_FORMAT = struct.Struct("<%dsI" % PACKED_SIZE)
+POSITION_SIZE = POSITION_FORMAT.size
+
+
+class GameRecordWriter():
+    """
+    Appends game records to a file, with their positions and index,
+    writing them out flush_every games at a time. Use it as a context
+    manager, or call close(), so the last games are written.
+
+    Games written in order of their numbers are appended to the index;
+    a game numbered below one already indexed has the index sorted
+    again.
+    """
+
+    def __init__(self, path, flush_every=64):
+        self.path = path
+        self.file = open(path, 'ab')
+        self.positions = open(positions_path(path), 'ab')
+        self.index = open(index_path(path), 'ab')
+        self.flush_every = flush_every
+        self.pending = []
+        self.last_game = _last_game(index_path(path))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def write(self, result):
+        """
+        Adds the record of a tournament.GameResult.
+        """
+        line = json.dumps(game_record(result), separators=(',', ':')) + "\n"
+        self.pending.append((result.number, line.encode(), game_positions(result.moves)))
+        if len(self.pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        entries = array('Q')
+        offset = self.file.seek(0, os.SEEK_END)
+        first = self.positions.seek(0, os.SEEK_END) // POSITION_SIZE
+        in_order = True
+        for game, line, positions in self.pending:
+            entries.extend((game, offset, first, len(positions)))
+            in_order = in_order and game >= self.last_game
+            self.last_game = max(self.last_game, game)
+            offset += len(line)
+            first += len(positions)
+        self.file.write(b"".join(line for _, line, _ in self.pending))
+        self.file.flush()
+        self.positions.write(b"".join(b"".join(positions) for _, _, positions in self.pending))
+        self.positions.flush()
+        # The index is written last, so it never points past the records.
+        entries.tofile(self.index)
+        self.index.flush()
+        if not in_order:
+            self.index.close()
+            _sort_index(index_path(self.path))
+            self.index = open(index_path(self.path), 'ab')
+        self.pending = []
+
+    def close(self):
+        self.flush()
+        self.file.close()
+        self.positions.close()
+        self.index.close()
+
+
+class GameArchive():
+    """
+    Random access to the games of a record file and their positions,
+    through its index. A game is found by binary search of the index,
+    and a position of it read straight from the positions file. If a
+    game number is in the file more than once, the first game is read.
+    Use it as a context manager, or call close().
+    """
+
+    def __init__(self, path):
+        if not os.path.exists(index_path(path)) or not os.path.exists(positions_path(path)):
+            build_index(path)
+        with open(path, 'rb') as records:
+            self.records = _map(records)
+        with open(positions_path(path), 'rb') as positions:
+            self.positions = _map(positions)
+        with open(index_path(path), 'rb') as index:
+            self.index_map = _map(index)
+        self.index = memoryview(self.index_map).cast('Q')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.index) // INDEX_FIELDS
+
+    def close(self):
+        self.index.release()
+        for mapped in (self.records, self.positions, self.index_map):
+            if isinstance(mapped, mmap.mmap):
+                mapped.close()
+
+    def entry(self, game):
+        """
+        Returns the index entry of game: its number, the byte offset of
+        its record, and the number of its first position and how many
+        it has. Raises KeyError if the file has no such game.
+        """
+        index = self.index
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if index[middle * INDEX_FIELDS] < game:
+                low = middle + 1
+            else:
+                high = middle
+        if low == len(self) or index[low * INDEX_FIELDS] != game:
+            raise KeyError(game)
+        return tuple(index[low * INDEX_FIELDS:(low + 1) * INDEX_FIELDS])
+
+    def offset(self, game):
+        """
+        Returns the byte offset of the record of game, or raises
+        KeyError if the file has none.
+        """
+        return self.entry(game)[1]
+
+    def record(self, game):
+        """
+        Returns the record of game as a dict.
+        """
+        start = self.offset(game)
+        end = self.records.find(b"\n", start)
+        return json.loads(self.records[start:end if end != -1 else len(self.records)])
+
+    def position(self, game, ply=None, turn=None):
+        """
+        Returns the board of game after its first ply moves, at the start
+        of round turn, or at its end if both are None. Like position()
+        and turn_ply(), a ply or round past the end of the game gives
+        its end.
+        """
+        _, _, first, count = self.entry(game)
+        plies = count - 1
+        if turn is not None:
+            # The first ply of round turn or a later one: rounds only
+            # go up within a game.
+            low, high = 0, plies
+            while low < high:
+                middle = (low + high) // 2
+                if self._round(first + middle) < turn:
+                    low = middle + 1
+                else:
+                    high = middle
+            ply = low
+        elif ply is None or ply > plies:
+            ply = plies
+        elif ply < 0:
+            ply = max(plies + ply, 0)
+        return unpack_board(self.positions, (first + ply) * POSITION_SIZE)
+
+    def _round(self, number):
+        return POSITION_FORMAT.unpack_from(self.positions, number * POSITION_SIZE)[1]
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+def positions_path(path):
+    return path + ".pos"
+
+
+def game_positions(moves):
+    """
+    Returns the packed positions of a game, from its start to its end,
+    each with the round it is in (see turn_ply()).
+    """
+    board = CheckerBoard()
+    rounds = 1
+    positions = [POSITION_FORMAT.pack(pack_board(board), rounds)]
+    for move in moves:
+        active = board.active
+        board.make_move(move)
+        if board.active == BLACK and active != BLACK:
+            rounds += 1
+        positions.append(POSITION_FORMAT.pack(pack_board(board), rounds))
+    return positions
+
+
+def build_index(path):
+    """
+    Writes the positions and the index of a record file, replacing any
+    existing ones, and returns the number of games indexed.
+    """
+    entries = array('Q')
+    offset = first = 0
+    with open(path, 'rb') as records, open(positions_path(path), 'wb') as positions:
+        for line in records:
+            if line.strip():
+                record = json.loads(line)
+                game = game_positions(record["moves"])
+                entries.extend((record["game"], offset, first, len(game)))
+                positions.write(b"".join(game))
+                first += len(game)
+            offset += len(line)
+    _write_index(index_path(path), entries)
+    return len(entries) // INDEX_FIELDS
+
+
+def _write_index(path, entries):
+    # Writes the entries of an index sorted by game number, then
+    # offset, so that the first of games of the same number comes
+    # first.
+    rows = sorted(
+        tuple(entries[i:i + INDEX_FIELDS]) for i in range(0, len(entries), INDEX_FIELDS)
+    )
+    with open(path + ".tmp", 'wb') as index:
+        array('Q', (field for row in rows for field in row)).tofile(index)
+    os.replace(path + ".tmp", path)
+
+
+def _sort_index(path):
+    entries = array('Q')
+    with open(path, 'rb') as index:
+        entries.frombytes(index.read())
+    _write_index(path, entries)
+
+
+def _last_game(path):
+    # The number of the last game of an index, 0 if it has none.
+    if not os.path.exists(path) or os.path.getsize(path) < INDEX_FIELDS * 8:
+        return 0
+    entries = array('Q')
+    with open(path, 'rb') as index:
+        index.seek(-INDEX_FIELDS * entries.itemsize, os.SEEK_END)
+        entries.frombytes(index.read())
+    return entries[0]
+
+
+def _map(file):
+    # Empty files can't be memory-mapped.
+    if not os.fstat(file.fileno()).st_size:
+        return b""
+    return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def game_record(result):
+    """
+    Returns the record of a tournament.GameResult as a dict: the game
+    number, seed, whether colours were swapped, the winner, the number
+    of rounds, the moves and the seconds spent on each move.
+    """
+    times = [iter(result.thinking_time[colour]) for colour in range(2)]
+    move_times = []
+    board = CheckerBoard()
+    for move in result.moves:
+        move_times.append(round(next(times[board.active]), 6))
+        board.make_move(move)
+
+    return {
+        "game": result.number,
+        "seed": result.seed,
+        "swapped": result.swapped,
+        "winner": result.winner,
+        "turns": result.turns,
+        "moves": result.moves,
+        "times": move_times,
+    }
+
+
+def read_records(path):
+    """
+    Yields the records of a file, in the order they were written.
+    """
+    with open(path) as records:
+        for line in records:
+            if line.strip():
+                yield json.loads(line)
+
+
+def turn_ply(record, turn):
+    """
+    Returns the number of moves played before round turn of a game.
+    Rounds start at 1, with black to move; a round past the end of the
+    game gives the number of moves of the game.
+    """
+    board = CheckerBoard()
+    rounds = 1
+    for ply, move in enumerate(record["moves"]):
+        if rounds >= turn:
+            return ply
+        active = board.active
+        board.make_move(move)
+        if board.active == BLACK and active != BLACK:
+            rounds += 1
+    return len(record["moves"])
+
+
+def position(record, ply=None):
+    """
+    Returns the board of a game after its first ply moves, or at its
+    end if ply is None.
+    """
+    board = CheckerBoard()
+    for move in record["moves"][:ply]:
+        board.make_move(move)
+    return board
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show positions of recorded games.")
+    parser.add_argument("file")
+    parser.add_argument("game", type=int, nargs="?")
+    parser.add_argument("ply", type=int, nargs="?")
+    parser.add_argument("--turn", type=int, help="show the position at the start of a round")
+    parser.add_argument("--index", action="store_true", help="rebuild the index of the file")
+    parser.add_argument("--pdn", action="store_true", help="print the game in PDN")
+    args = parser.parse_args()
+
+    if args.index:
+        print("Indexed %d games" % build_index(args.file))
+        return 0
+    if args.game is None:
+        parser.error("a game number is required")
+
+    with GameArchive(args.file) as archive:
+        try:
+            record = archive.record(args.game)
+        except KeyError:
+            print("No game %d in %s" % (args.game, args.file))
+            return 1
+
+    if args.pdn:
+        print(write_pdn(record["moves"], {
+            "Event": args.file, "Round": record["game"], "Result": RESULTS[record["winner"]],
+        }))
+        return 0
+    if args.turn is not None:
+        plies = [turn_ply(record, args.turn)]
+    elif args.ply is not None:
+        plies = [args.ply]
+    else:
+        plies = range(len(record["moves"]) + 1)
+    for ply in plies:
+        print("#### Ply %3d" % ply)
+        print(position(record, ply))
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
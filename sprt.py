@@ -0,0 +1,149 @@
+"""
+This module implements the sequential probability ratio test used to
+stop a match between two agents as soon as its outcome is clear, and
+the Elo estimates reported with it.
+
+Scores are from the point of view of the first agent: 1 for a win, 0.5
+for an unresolved game and 0 for a loss.
+"""
+
+from math import inf, log, log10, sqrt
+from statistics import NormalDist
+
+# Smallest variance of the score of one game. Games that all had the
+# same result have none, which would make the log-likelihood ratio
+# infinite. With this floor and the default bounds, 21 straight wins
+# accept H1.
+MIN_VARIANCE = 0.05
+
+
+def expected_score(elo):
+    """
+    Returns the expected score of a player elo points stronger than its
+    opponent.
+    """
+    return 1 / (1 + 10 ** (-elo / 400))
+
+
+def elo_difference(score):
+    """
+    Returns the Elo difference that gives an expected score of score.
+    """
+    if score <= 0:
+        return -inf
+    if score >= 1:
+        return inf
+    return -400 * log10(1 / score - 1)
+
+
+def score_stats(wins, draws, losses):
+    """
+    Returns the mean and variance of the score of one game, and the
+    number of games. The variance is at least MIN_VARIANCE, so that a
+    match whose games all had the same result still has one.
+    """
+    games = wins + draws + losses
+    mean = (wins + draws / 2) / games
+    variance = (
+        wins * (1 - mean) ** 2 + draws * (0.5 - mean) ** 2 + losses * mean ** 2
+    ) / games
+    return mean, max(variance, MIN_VARIANCE), games
+
+
+def elo_interval(wins, draws, losses, confidence=0.95):
+    """
+    Returns the estimated Elo difference and the bounds of its
+    confidence interval, from the normal approximation of the mean
+    score. Without any game, nothing is known.
+    """
+    if not wins + draws + losses:
+        return 0, -inf, inf
+    mean, variance, games = score_stats(wins, draws, losses)
+    margin = NormalDist().inv_cdf((1 + confidence) / 2) * sqrt(variance / games)
+    return (
+        elo_difference(mean), elo_difference(mean - margin), elo_difference(mean + margin),
+    )
+
+
+class SPRT():
+    """
+    Sequential probability ratio test of H0: the first agent is elo0
+    stronger than the second, against H1: it is elo1 stronger. alpha
+    and beta are the probabilities of accepting H1 when H0 holds, and
+    H0 when H1 holds.
+
+    The log-likelihood ratio uses the normal approximation of the
+    score distribution (the generalised SPRT). Games are counted one by
+    one, colour-swapped pairs included.
+    """
+
+    def __init__(self, elo0=0, elo1=10, alpha=0.05, beta=0.05):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.alpha = alpha
+        self.beta = beta
+        self.lower = log(beta / (1 - alpha))
+        self.upper = log((1 - beta) / alpha)
+        self.wins = 0
+        self.draws = 0
+        self.losses = 0
+
+    @property
+    def games(self):
+        return self.wins + self.draws + self.losses
+
+    def add(self, score):
+        """
+        Counts one game of the given score.
+        """
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    @property
+    def llr(self):
+        """
+        Returns the log-likelihood ratio of H1 against H0.
+        """
+        if not self.games:
+            return 0
+        mean, variance, games = score_stats(self.wins, self.draws, self.losses)
+        s0, s1 = expected_score(self.elo0), expected_score(self.elo1)
+        return games * (s1 - s0) * (2 * mean - s0 - s1) / (2 * variance)
+
+    @property
+    def result(self):
+        """
+        Returns "H1" or "H0" once the test accepts it, otherwise None.
+        """
+        llr = self.llr
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def report(self, games_planned=None, confidence=0.95):
+        """
+        Returns the state of the test as a dict, with the Elo estimate
+        of the first agent and, given the number of games that were
+        planned, the number saved by stopping early.
+        """
+        elo, elo_low, elo_high = elo_interval(self.wins, self.draws, self.losses, confidence)
+        report = {
+            "result": self.result,
+            "llr": self.llr,
+            "lower": self.lower,
+            "upper": self.upper,
+            "games": self.games,
+            "elo": elo,
+            "elo_low": elo_low,
+            "elo_high": elo_high,
+            "confidence": confidence,
+        }
+        if games_planned is not None:
+            report["games_saved"] = games_planned - self.games
+        return report
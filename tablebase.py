@@ -0,0 +1,375 @@
+"""
+This module builds and probes endgame tablebases: the exact result of
+every position with at most a few pieces, and the number of turns it
+takes to reach it with best play.
+
+Positions are grouped into slices by their material, the number of
+black men, black kings, white men and white kings. A move either stays
+in its slice, or captures or promotes a piece into a slice of fewer
+pieces or fewer men. Slices are solved in that order, slices with the
+same number of pieces and men side by side on a pool of worker
+processes, each one reading the slices its moves lead to from disk.
+
+A slice is solved by retrograde analysis from its lost positions:
+results spread from every solved position to the positions leading to
+it, in order of distance, so wins are as fast and losses as slow as
+possible. Moves are generated with CheckerBoard.get_moves() and a turn
+is a whole multi-jump. Positions left unsolved are draws.
+
+Each slice is stored in its own file of one byte per position and side
+to move, and memory-mapped when probed.
+
+Usage: python tablebase.py DIRECTORY [--pieces N] [--workers N]
+builds the tablebase of every position with up to N pieces.
+"""
+
+import argparse
+import mmap
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappop, heappush
+from itertools import combinations, groupby
+from math import comb
+
+from checkers import BLACK, WHITE, CheckerBoard
+from notation import compress, expand
+
+# Results, for the side to move
+WIN, DRAW, LOSS = 1, 0, -1
+
+# A stored byte is 0 for a draw, or the distance to the end of the game
+# in turns plus one: odd for a loss, even for a win. INVALID marks
+# indices of no position, such as a white man on black's back row.
+INVALID = 255
+MAX_DISTANCE = 253
+
+# Men are never on their promotion row: black men are on squares 1-28
+# (bits 0-27 of a square set) and white men on squares 5-32.
+BLACK_MEN_SQUARES = 28
+WHITE_PROMOTION_SQUARES = 0xf
+
+FILE_NAME = "%d%d%d%d.tb"
+
+
+def slice_size(material):
+    """
+    Returns the number of indices of a slice, for one side to move.
+    material is (black men, black kings, white men, white kings).
+    """
+    black_men, black_kings, white_men, white_kings = material
+    free = 32 - black_men - white_men
+    return (
+        comb(BLACK_MEN_SQUARES, black_men) * comb(32 - black_men, white_men)
+        * comb(free, black_kings) * comb(free - black_kings, white_kings)
+    )
+
+
+def slices(pieces):
+    """
+    Returns the material of every slice of up to pieces pieces, in the
+    order they have to be solved.
+    """
+    materials = [
+        (black_men, black_kings, white_men, white_kings)
+        for black_men in range(pieces + 1)
+        for black_kings in range(pieces + 1)
+        for white_men in range(pieces + 1)
+        for white_kings in range(pieces + 1)
+        if black_men + black_kings and white_men + white_kings
+        and black_men + black_kings + white_men + white_kings <= pieces
+    ]
+    return sorted(materials, key=_level)
+
+
+def _level(material):
+    # Slices of the same level don't lead to each other.
+    return sum(material), material[0] + material[2]
+
+
+def _rank(squares, occupied):
+    """
+    Returns the rank of the square set squares among the sets of as
+    many squares that leave out the occupied ones.
+    """
+    rank = 0
+    count = 0
+    while squares:
+        square = squares & -squares
+        count += 1
+        rank += comb(square.bit_length() - 1 - bin(occupied & (square - 1)).count("1"), count)
+        squares ^= square
+    return rank
+
+
+def position_index(black, white, kings):
+    """
+    Returns the material and the index in its slice of a position,
+    given as square sets of the black pieces, the white pieces and the
+    kings (see notation.compress()).
+    """
+    black_men, white_men = black & ~kings, white & ~kings
+    black_kings, white_kings = black & kings, white & kings
+    material = tuple(
+        bin(squares).count("1") for squares in (black_men, black_kings, white_men, white_kings)
+    )
+    occupied = black_men | white_men
+    free = 32 - material[0] - material[2]
+    index = _rank(black_men, 0)
+    index = index * comb(32 - material[0], material[2]) + _rank(white_men, black_men)
+    index = index * comb(free, material[1]) + _rank(black_kings, occupied)
+    index = index * comb(free - material[1], material[3]) + _rank(white_kings, occupied | black_kings)
+    return material, index
+
+
+def _square_sets(squares, count):
+    for chosen in combinations(squares, count):
+        yield sum(1 << square for square in chosen)
+
+
+def _positions(material):
+    """
+    Yields the (black, white, kings) square sets of every position of a
+    slice.
+    """
+    black_men, black_kings, white_men, white_kings = material
+    for black in _square_sets(range(BLACK_MEN_SQUARES), black_men):
+        free = [square for square in range(32) if not black >> square & 1]
+        for white in _square_sets(free, white_men):
+            if white & WHITE_PROMOTION_SQUARES:
+                continue
+            free_kings = [square for square in free if not white >> square & 1]
+            for kings_black in _square_sets(free_kings, black_kings):
+                rest = [square for square in free_kings if not kings_black >> square & 1]
+                for kings_white in _square_sets(rest, white_kings):
+                    yield black | kings_black, white | kings_white, kings_black | kings_white
+
+
+def _turns(board, positions):
+    """
+    Appends to positions the (black, white, kings) square sets after
+    every turn the side to move of board can play.
+    """
+    for move in board.get_moves():
+        undo = board.make_move(move)
+        if board.jump:
+            _turns(board, positions)
+        else:
+            kings = (
+                board.forward[BLACK] & board.backward[BLACK]
+                | board.forward[WHITE] & board.backward[WHITE]
+            )
+            positions.append((
+                compress(board.pieces[BLACK]), compress(board.pieces[WHITE]), compress(kings),
+            ))
+        board.unmake_move(undo)
+
+
+def _read_slice(directory, material):
+    with open(os.path.join(directory, FILE_NAME % material), 'rb') as values:
+        return values.read()
+
+
+def solve_slice(directory, material):
+    """
+    Solves a slice, whose successors have to be solved already, and
+    writes it to directory. Returns the material and the number of
+    wins, draws and losses.
+    """
+    size = slice_size(material)
+    values = bytearray([INVALID]) * (2 * size)
+    solved = bytearray(2 * size)
+    remaining = [0] * (2 * size)
+    longest_win = [-1] * (2 * size)
+    predecessors = {}
+    successor_values = {}
+    queue = []
+    board = CheckerBoard()
+
+    for black, white, kings in _positions(material):
+        _, index = position_index(black, white, kings)
+        for active in (BLACK, WHITE):
+            key = active * size + index
+            values[key] = 0
+            board.set_position(expand(black), expand(white), expand(kings), active)
+            turns = []
+            _turns(board, turns)
+            if not turns:
+                heappush(queue, (0, key, LOSS))
+                continue
+
+            fastest_win = None
+            for successor in turns:
+                if not successor[1 - active]:
+                    # The opponent has no piece left.
+                    fastest_win = 1
+                    continue
+                successor_material, successor_index = position_index(*successor)
+                successor_key = (1 - active) * slice_size(successor_material) + successor_index
+                if successor_material == material:
+                    predecessors.setdefault(successor_key, []).append(key)
+                    remaining[key] += 1
+                    continue
+                if successor_material not in successor_values:
+                    successor_values[successor_material] = _read_slice(directory, successor_material)
+                value = successor_values[successor_material][successor_key]
+                if not value:
+                    # A draw: the position can't be lost.
+                    remaining[key] += 1
+                elif value % 2:
+                    if fastest_win is None or value < fastest_win:
+                        fastest_win = value
+                else:
+                    longest_win[key] = max(longest_win[key], value - 1)
+
+            if fastest_win is not None:
+                # A winning move: the position can't be lost.
+                remaining[key] += 1
+                heappush(queue, (fastest_win, key, WIN))
+            elif not remaining[key]:
+                heappush(queue, (longest_win[key] + 1, key, LOSS))
+
+    while queue:
+        distance, key, result = heappop(queue)
+        if solved[key]:
+            continue
+        if distance > MAX_DISTANCE:
+            raise ValueError("Distance to the end of the game too long to store")
+        solved[key] = 1
+        values[key] = distance + 1
+        for predecessor in predecessors.get(key, ()):
+            if solved[predecessor]:
+                continue
+            if result == LOSS:
+                heappush(queue, (distance + 1, predecessor, WIN))
+                continue
+            remaining[predecessor] -= 1
+            longest_win[predecessor] = max(longest_win[predecessor], distance)
+            if not remaining[predecessor]:
+                heappush(queue, (longest_win[predecessor] + 1, predecessor, LOSS))
+
+    path = os.path.join(directory, FILE_NAME % material)
+    with open(path + ".tmp", 'wb') as slice_file:
+        slice_file.write(values)
+    os.replace(path + ".tmp", path)
+
+    counts = {WIN: 0, DRAW: 0, LOSS: 0}
+    for value in values:
+        if value != INVALID:
+            counts[_result(value)] += 1
+    return material, counts[WIN], counts[DRAW], counts[LOSS]
+
+
+def _solve_slice(args):
+    return solve_slice(*args)
+
+
+def generate(directory, pieces=3, workers=1, callback=None):
+    """
+    Builds the tablebase of up to pieces pieces in directory, solving
+    the slices of a level on workers processes. Slices already in
+    directory are kept. callback, if given, is called with the return
+    value of solve_slice() of every slice solved.
+    """
+    os.makedirs(directory, exist_ok=True)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for _, level in groupby(slices(pieces), key=_level):
+            tasks = [
+                (directory, material) for material in level
+                if not os.path.exists(os.path.join(directory, FILE_NAME % material))
+            ]
+            results = executor.map(_solve_slice, tasks) if executor else map(_solve_slice, tasks)
+            for result in results:
+                if callback is not None:
+                    callback(result)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+
+def _result(value):
+    if not value:
+        return DRAW
+    return LOSS if value % 2 else WIN
+
+
+class Tablebase():
+    """
+    Probes a tablebase built by generate(). Slices are memory-mapped on
+    first use. pieces is the largest number of pieces every slice of
+    which is in the directory.
+
+    A Tablebase can be pickled and copied: copies map the files again.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.maps = {}
+        self.pieces = 0
+        while all(
+            os.path.exists(os.path.join(directory, FILE_NAME % material))
+            for material in slices(self.pieces + 1)
+        ):
+            self.pieces += 1
+
+    def __getstate__(self):
+        return {"directory": self.directory}
+
+    def __setstate__(self, state):
+        self.__init__(state["directory"])
+
+    def close(self):
+        for values in self.maps.values():
+            values.close()
+        self.maps = {}
+
+    def probe(self, board):
+        """
+        Returns (result, distance) for the side to move of board: WIN,
+        DRAW or LOSS, and the number of turns to the end of the game
+        (0 for a draw). Returns None if board has too many pieces or is
+        in the middle of a multi-jump.
+        """
+        if board.jump or sum(board.men) + sum(board.kings) > self.pieces:
+            return None
+        if not board.pieces[board.active] or not board.pieces[board.passive]:
+            return None
+        kings = (
+            board.forward[BLACK] & board.backward[BLACK]
+            | board.forward[WHITE] & board.backward[WHITE]
+        )
+        material, index = position_index(
+            compress(board.pieces[BLACK]), compress(board.pieces[WHITE]), compress(kings),
+        )
+        values = self.maps.get(material)
+        if values is None:
+            with open(os.path.join(self.directory, FILE_NAME % material), 'rb') as slice_file:
+                values = mmap.mmap(slice_file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.maps[material] = values
+        value = values[board.active * slice_size(material) + index]
+        if value == INVALID:
+            return None
+        return _result(value), value - 1 if value else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build an endgame tablebase.")
+    parser.add_argument("directory")
+    parser.add_argument("--pieces", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    start = time.time()
+
+    def report(result):
+        material, wins, draws, losses = result
+        print("%d%d%d%d: %9d wins %9d draws %9d losses  %.0fs" % (
+            *material, wins, draws, losses, time.time() - start,
+        ))
+
+    generate(args.directory, args.pieces, args.workers, report)
+
+
+if __name__ == '__main__':
+    main()
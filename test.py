@@ -1,15 +1,20 @@
 #!/usr/bin/python
-import time
+import argparse
 from datetime import datetime
 
-from checkers import CheckerBoard, BLACK, WHITE
+from checkers import BLACK, WHITE
 from agents.arthur import ArthurPlayer
 from agents.rand import RandomPlayer
+from records import GameRecordWriter
+from tournament import Tournament, sprt_summary
 
 filename = "logs/{timestamp}.log".format(
     timestamp=datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
 )
 log_file = open(filename, 'w')
+# Moves and timings of every game, one JSON line per game, indexed by
+# game in the .idx file next to it. python records.py shows the positions.
+records_filename = filename.replace(".log", ".games.jsonl")
 
 
 class TestAnalyzer():
@@ -24,76 +29,124 @@ class TestAnalyzer():
         Black thinking time (avg): {time_black}
         White thinking time (avg): {time_white}
     """
+    throughput_text = """
+        {name} searches: {moves}
+        {name} nodes: {nodes} ({nodes_per_move:.0f} per move, {nodes_per_second:.0f}/s)
+        {name} leaf evaluations: {leaves} ({leaves_per_second:.0f}/s)
+        {name} first-move cutoff rate: {first_move_cutoff_rate:.3f}
+        {name} depth (avg): {depth:.2f}, max ply: {max_ply}
+    """
 
-    def __init__(self, black_agent, white_agent, games=100):
+    def __init__(self, black_agent, white_agent, games=100, profile=False, workers=1, seed=0,
+                 sprt=None):
         self.players = {
             BLACK: black_agent,
             WHITE: white_agent,
         }
         self.games_count = games
+        # Games are played by a Tournament on workers processes, seeded
+        # with seed, so results are the same for any number of workers.
+        self.workers = workers
+        self.seed = seed
+        # An sprt.SPRT of the black agent's Elo advantage stops the
+        # games as soon as it concludes.
+        self.sprt = sprt
+        # With profile set, agents that support it are profiled, and a
+        # JSON record per move goes to a .profile.jsonl file next to
+        # the log, tagged with the game, turn and player.
+        self.profile = profile
+        self.profile_file = None
         self.stats = {
             "played_rounds": 0,
             "score": [],
             "thinking_time": {BLACK: [], WHITE: []},
+            "search": {BLACK: [], WHITE: []},
         }
 
     def run(self):
+        tournament = Tournament(
+            self.players[BLACK], self.players[WHITE], self.games_count,
+            workers=self.workers, seed=self.seed, swap_colours=False, profile=self.profile,
+            sprt=self.sprt,
+        )
+        if self.profile:
+            self.profile_file = open(filename.replace(".log", ".profile.jsonl"), 'w')
         try:
-            for number in range(1, self.games_count + 1):
-                print("Game: %d" % number)
-                log_file.write("########### GAME %3d ###########\n" % number)
-                self.run_single_game()
-        except KeyboardInterrupt:
-            print("Test interrupted on %d" % number)
+            with GameRecordWriter(records_filename) as self.records:
+                try:
+                    tournament.run(callback=self.record_game)
+                except KeyboardInterrupt:
+                    print("Test interrupted after %d games" % len(self.stats["score"]))
+        finally:
+            if self.profile_file is not None:
+                self.profile_file.close()
+                self.profile_file = None
 
         self.print_summary()
 
-    def run_single_game(self):
-        board = CheckerBoard()
-        turn = 0
-        unresolved = False
-
-        while not board.is_over():
-            turn += 1
-
-            log_file.write("#### Turn %3d\n" % turn)
-            log_file.write(str(board))
-            log_file.flush()
-
-            if turn % 100 == 0:
-                print("Over %d turns played" % turn)
-
-            for player, agent in self.players.items():
-                while not board.is_over() and board.active == player:
-                    print("Player %d is making a decision" % player)
-                    start_time = time.time()
-                    move = agent.best_move(board)
-                    self.stats["thinking_time"][player].append(time.time() - start_time)
-                    board.update(move)
-
-            if turn > 200:
-                unresolved = True
-                break
-
-        self.stats["score"].append(board.winner if not unresolved else -1)
-        self.stats["played_rounds"] += turn
+    def record_game(self, result):
+        """
+        Records a finished game and adds its GameResult to the stats.
+        """
+        print("Game: %d" % result.number)
+        self.records.write(result)
+        if self.profile_file is not None:
+            for record in result.profile:
+                self.profile_file.write(record + "\n")
+
+        for player in (BLACK, WHITE):
+            self.stats["thinking_time"][player] += result.thinking_time[player]
+            self.stats["search"][player] += result.search[player]
+        self.stats["score"].append(result.winner)
+        self.stats["played_rounds"] += result.turns
 
     def print_summary(self):
         score = self.stats["score"]
         thinking_time = self.stats["thinking_time"]
 
         summary = self.summary_text.format(
-            rounds_average=self.stats["played_rounds"] / self.games_count,
+            rounds_average=self.stats["played_rounds"] / len(score),
             score_black=score.count(BLACK),
             time_black=sum(thinking_time[BLACK]) / len(thinking_time[BLACK]),
             score_white=score.count(WHITE),
             time_white=sum(thinking_time[WHITE]) / len(thinking_time[WHITE]),
             score_unresolved=score.count(-1),
         )
+        for player, name in ((BLACK, "Black"), (WHITE, "White")):
+            if self.stats["search"][player]:
+                summary += self.throughput_summary(name, self.stats["search"][player])
+        if self.sprt is not None:
+            summary += "\n        %s\n" % sprt_summary(self.sprt.report(self.games_count))
         print(summary)
         log_file.write(summary)
 
+    def throughput_summary(self, name, searches):
+        """
+        Returns the throughput of an agent over its SearchStats.
+        """
+        elapsed = sum(stats.elapsed for stats in searches)
+        nodes = sum(stats.nodes for stats in searches)
+        leaves = sum(stats.leaves for stats in searches)
+        cutoffs = sum(stats.cutoffs for stats in searches)
+        first_move_cutoffs = sum(stats.first_move_cutoffs for stats in searches)
+        return self.throughput_text.format(
+            name=name,
+            moves=len(searches),
+            nodes=nodes,
+            nodes_per_move=nodes / len(searches),
+            nodes_per_second=nodes / elapsed if elapsed else 0,
+            leaves=leaves,
+            leaves_per_second=leaves / elapsed if elapsed else 0,
+            first_move_cutoff_rate=first_move_cutoffs / cutoffs if cutoffs else 0,
+            depth=sum(stats.depth for stats in searches) / len(searches),
+            max_ply=max(stats.max_ply for stats in searches),
+        )
+
 
 if '__main__' == __name__:
-    test = TestAnalyzer(RandomPlayer(), ArthurPlayer())
+    parser = argparse.ArgumentParser(description="Play RandomPlayer against ArthurPlayer.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1, help="processes playing the games")
+    args = parser.parse_args()
+    test = TestAnalyzer(RandomPlayer(), ArthurPlayer(), games=args.games, workers=args.workers)
     test.run()
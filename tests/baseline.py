@@ -0,0 +1,438 @@
+"""
+The move generation of the original CheckerBoard and the original
+deny(), mov(), thret(), piece_score_diff() and position_score()
+features, kept as the reference the current ones are tested against.
+Code below is copied unchanged from the first versions of checkers.py
+and utils.py, only the board drawing is left out and the captured
+square is computed with // instead of /, which raised TypeError on
+every jump.
+"""
+
+from copy import deepcopy
+
+BLACK, WHITE = 0, 1
+
+UNUSED_BITS = 0b100000000100000000100000000100000000
+
+
+class CheckerBoard:
+    def __init__(self):
+        """
+        Initiates board via new_game().
+        """
+        self.forward = [None, None]
+        self.backward = [None, None]
+        self.pieces = [None, None]
+        self.new_game()
+
+    def new_game(self):
+        """
+        Resets current state to new game.
+        """
+        self.active = BLACK
+        self.passive = WHITE
+
+        self.forward[BLACK] = 0x1eff
+        self.backward[BLACK] = 0
+        self.pieces[BLACK] = self.forward[BLACK] | self.backward[BLACK]
+
+        self.forward[WHITE] = 0
+        self.backward[WHITE] = 0x7fbc00000
+        self.pieces[WHITE] = self.forward[WHITE] | self.backward[WHITE]
+
+        self.empty = UNUSED_BITS ^ (2**36 - 1) ^ (self.pieces[BLACK] | self.pieces[WHITE])
+
+        self.jump = 0
+        self.mandatory_jumps = []
+
+    def update(self, move):
+        """
+        Updates the game state to reflect the effects of the input
+        move.
+
+        A legal move is represented by an integer with exactly two
+        bits turned on: the old position and the new position.
+        """
+        active, passive = self.active, self.passive
+        if move < 0:
+            move *= -1
+            taken_piece = int(1 << sum(i for (i, b) in enumerate(bin(move)[::-1]) if b == '1')//2)
+            self.pieces[passive] ^= taken_piece
+            if self.forward[passive] & taken_piece:
+                self.forward[passive] ^= taken_piece
+            if self.backward[passive] & taken_piece:
+                self.backward[passive] ^= taken_piece
+            self.jump = 1
+
+        self.pieces[active] ^= move
+        if self.forward[active] & move:
+            self.forward[active] ^= move
+        if self.backward[active] & move:
+            self.backward[active] ^= move
+
+        destination = move & self.pieces[active]
+        self.empty = UNUSED_BITS ^ (2**36 - 1) ^ (self.pieces[BLACK] | self.pieces[WHITE])
+
+        if self.jump:
+            self.mandatory_jumps = self.jumps_from(destination)
+            if self.mandatory_jumps:
+                return
+
+        if active == BLACK and (destination & 0x780000000) != 0:
+            self.backward[BLACK] |= destination
+        elif active == WHITE and (destination & 0xf) != 0:
+            self.forward[WHITE] |= destination
+
+        self.jump = 0
+        self.active, self.passive = self.passive, self.active
+
+    def peek_move(self, move):
+        """
+        Updates the game state to reflect the effects of the input
+        move.
+
+        A legal move is represented by an integer with exactly two
+        bits turned on: the old position and the new position.
+        """
+        board = deepcopy(self)
+        active, passive = board.active, board.passive
+
+        if move < 0:
+            move *= -1
+            taken_piece = int(1 << sum(i for (i, b) in enumerate(bin(move)[::-1]) if b == '1')//2)
+            board.pieces[passive] ^= taken_piece
+            if board.forward[passive] & taken_piece:
+                board.forward[passive] ^= taken_piece
+            if board.backward[passive] & taken_piece:
+                board.backward[passive] ^= taken_piece
+            board.jump = 1
+
+        board.pieces[active] ^= move
+        if board.forward[active] & move:
+            board.forward[active] ^= move
+        if board.backward[active] & move:
+            board.backward[active] ^= move
+
+        destination = move & board.pieces[active]
+        board.empty = UNUSED_BITS ^ (2**36 - 1) ^ (board.pieces[BLACK] | board.pieces[WHITE])
+
+        if board.jump:
+            board.mandatory_jumps = board.jumps_from(destination)
+            if board.mandatory_jumps:
+                return board
+
+        if active == BLACK and (destination & 0x780000000) != 0:
+            board.backward[BLACK] |= destination
+        elif active == WHITE and (destination & 0xf) != 0:
+            board.forward[WHITE] |= destination
+
+        board.jump = 0
+        board.active, board.passive = board.passive, board.active
+
+        return board
+
+    # These methods return an integer whose active bits are those squares
+    # that can make the move indicated by the method name.
+    def right_forward(self):
+        return (self.empty >> 4) & self.forward[self.active]
+
+    def left_forward(self):
+        return (self.empty >> 5) & self.forward[self.active]
+
+    def right_backward(self):
+        return (self.empty << 4) & self.backward[self.active]
+
+    def left_backward(self):
+        return (self.empty << 5) & self.backward[self.active]
+
+    def right_forward_jumps(self):
+        return (self.empty >> 8) & (self.pieces[self.passive] >> 4) & self.forward[self.active]
+
+    def left_forward_jumps(self):
+        return (self.empty >> 10) & (self.pieces[self.passive] >> 5) & self.forward[self.active]
+
+    def right_backward_jumps(self):
+        return (self.empty << 8) & (self.pieces[self.passive] << 4) & self.backward[self.active]
+
+    def left_backward_jumps(self):
+        return (self.empty << 10) & (self.pieces[self.passive] << 5) & self.backward[self.active]
+
+    def get_moves(self):
+        """
+        Returns a list of all possible moves.
+
+        A legal move is represented by an integer with exactly two
+        bits turned on: the old position and the new position.
+
+        Jumps are indicated with a negative sign.
+        """
+        # First check if we are in a jump sequence
+        if self.jump:
+            return self.mandatory_jumps
+
+        # Next check if there are jumps
+        jumps = self.get_jumps()
+        if jumps:
+            return jumps
+
+        # If not, then find normal moves
+        rf = self.right_forward()
+        lf = self.left_forward()
+        rb = self.right_backward()
+        lb = self.left_backward()
+
+        moves = [0x11 << i for (i, bit) in enumerate(bin(rf)[::-1]) if bit == '1']
+        moves += [0x21 << i for (i, bit) in enumerate(bin(lf)[::-1]) if bit == '1']
+        moves += [0x11 << i - 4 for (i, bit) in enumerate(bin(rb)[::-1]) if bit == '1']
+        moves += [0x21 << i - 5 for (i, bit) in enumerate(bin(lb)[::-1]) if bit == '1']
+
+        return moves
+
+    def get_jumps(self):
+        """
+        Returns a list of all possible jumps.
+
+        A legal move is represented by an integer with exactly two
+        bits turned on: the old position and the new position.
+
+        Jumps are indicated with a negative sign.
+        """
+        rfj = self.right_forward_jumps()
+        lfj = self.left_forward_jumps()
+        rbj = self.right_backward_jumps()
+        lbj = self.left_backward_jumps()
+
+        moves = []
+
+        if (rfj | lfj | rbj | lbj) != 0:
+            moves += [-0x101 << i for (i, bit) in enumerate(bin(rfj)[::-1]) if bit == '1']
+            moves += [-0x401 << i for (i, bit) in enumerate(bin(lfj)[::-1]) if bit == '1']
+            moves += [-0x101 << i - 8 for (i, bit) in enumerate(bin(rbj)[::-1]) if bit == '1']
+            moves += [-0x401 << i - 10 for (i, bit) in enumerate(bin(lbj)[::-1]) if bit == '1']
+
+        return moves
+
+    def jumps_from(self, piece):
+        """
+        Returns list of all possible jumps from the piece indicated.
+
+        The argument piece should be of the form 2**n, where n + 1 is
+        the square of the piece in question (using the internal numeric
+        representation of the board).
+        """
+        if self.active == BLACK:
+            rfj = (self.empty >> 8) & (self.pieces[self.passive] >> 4) & piece
+            lfj = (self.empty >> 10) & (self.pieces[self.passive] >> 5) & piece
+
+            # piece at square is a king
+            if piece & self.backward[self.active]:
+                rbj = (self.empty << 8) & (self.pieces[self.passive] << 4) & piece
+                lbj = (self.empty << 10) & (self.pieces[self.passive] << 5) & piece
+            else:
+                rbj = 0
+                lbj = 0
+        else:
+            rbj = (self.empty << 8) & (self.pieces[self.passive] << 4) & piece
+            lbj = (self.empty << 10) & (self.pieces[self.passive] << 5) & piece
+
+            # piece at square is a king
+            if piece & self.forward[self.active]:
+                rfj = (self.empty >> 8) & (self.pieces[self.passive] >> 4) & piece
+                lfj = (self.empty >> 10) & (self.pieces[self.passive] >> 5) & piece
+            else:
+                rfj = 0
+                lfj = 0
+
+        moves = []
+        if (rfj | lfj | rbj | lbj) != 0:
+            moves += [-0x101 << i for (i, bit) in enumerate(bin(rfj)[::-1]) if bit == '1']
+            moves += [-0x401 << i for (i, bit) in enumerate(bin(lfj)[::-1]) if bit == '1']
+            moves += [-0x101 << i - 8 for (i, bit) in enumerate(bin(rbj)[::-1]) if bit == '1']
+            moves += [-0x401 << i - 10 for (i, bit) in enumerate(bin(lbj)[::-1]) if bit == '1']
+
+        return moves
+
+    def takeable(self, piece):
+        """
+        Returns true of the passed piece can be taken by the active player.
+        """
+        active = self.active
+        if (self.forward[active] & (piece >> 4)) != 0 and (self.empty & (piece << 4)) != 0:
+            return True
+        if (self.forward[active] & (piece >> 5)) != 0 and (self.empty & (piece << 5)) != 0:
+            return True
+        if (self.backward[active] & (piece << 4)) != 0 and (self.empty & (piece >> 4)) != 0:
+            return True
+        if (self.backward[active] & (piece << 5)) != 0 and (self.empty & (piece >> 5)) != 0:
+            return True
+        return False
+
+    def is_over(self):
+        return not len(self.get_moves())
+
+
+
+# Denial of Occupancy
+def deny(board):
+    """
+    The parameter is credited 1 for each square defined in MOB if
+    on the next move a piece occupying this square could be
+    captured without exchange.
+    """
+    rf = board.right_forward()
+    lf = board.left_forward()
+    rb = board.right_backward()
+    lb = board.left_backward()
+
+    moves = [0x11 << i for (i, bit) in enumerate(bin(rf)[::-1]) if bit == '1']
+    moves += [0x21 << i for (i, bit) in enumerate(bin(lf)[::-1]) if bit == '1']
+    moves += [0x11 << i - 4 for (i, bit) in enumerate(bin(rb)[::-1]) if bit == '1']
+    moves += [0x21 << i - 5 for (i, bit) in enumerate(bin(lb)[::-1]) if bit == '1']
+
+    destinations = [0x10 << i for (i, bit) in enumerate(bin(rf)[::-1]) if bit == '1']
+    destinations += [0x20 << i for (i, bit) in enumerate(bin(lf)[::-1]) if bit == '1']
+    destinations += [0x1 << i - 4 for (i, bit) in enumerate(bin(rb)[::-1]) if bit == '1']
+    destinations += [0x1 << i - 5 for (i, bit) in enumerate(bin(lb)[::-1]) if bit == '1']
+
+    denials = []
+
+    for move, dst in zip(moves, destinations):
+        B = board.peek_move(move)
+        active = B.active
+        ms_taking = []
+        ds = []
+
+        if (B.forward[active] & (dst >> 4)) != 0 and (B.empty & (dst << 4)) != 0:
+            ms_taking.append((-1)*((dst >> 4) | (dst << 4)))
+            ds.append(dst << 4)
+
+        if (B.forward[active] & (dst >> 5)) != 0 and (B.empty & (dst << 5)) != 0:
+            ms_taking.append((-1)*((dst >> 5) | (dst << 5)))
+            ds.append(dst << 5)
+
+        if (B.backward[active] & (dst << 4)) != 0 and (B.empty & (dst >> 4)) != 0:
+            ms_taking.append((-1)*((dst << 4) | (dst >> 4)))
+            ds.append(dst >> 4)
+
+        if (B.backward[active] & (dst << 5)) != 0 and (B.empty & (dst >> 5)) != 0:
+            ms_taking.append((-1)*((dst << 5) | (dst >> 5)))
+            ds.append(dst >> 5)
+
+        if not ms_taking:
+            continue
+        else:
+            for m, d in zip(ms_taking, ds):
+                C = B.peek_move(m)
+                if C.active == active:
+                    if dst not in denials:
+                        denials.append(dst)
+                    continue
+                if not C.takeable(d):
+                    if not dst in denials:
+                        denials.append(dst)
+
+    return len(denials)
+
+
+# Move
+def mov(board):
+    """
+    The parameter is credited with 1 if pieces are even with a
+    total piece count (2 for men, and 3 for kings) of less than 24,
+    and if an odd number of pieces are in the move system, defined
+    as those vertical files starting with squares 1, 2, 3, and 4.
+    """
+    black_men = bin(board.forward[BLACK]).count("1")
+    black_kings = bin(board.backward[BLACK]).count("1")
+    black_score = 2 * black_men + 3 * black_kings
+    white_men = bin(board.backward[WHITE]).count("1")
+    white_kings = bin(board.forward[WHITE]).count("1")
+    white_score = 2 * white_men + 3 * white_kings
+
+    if white_score < 24 and black_score == white_score:
+        pieces = board.pieces[BLACK] | board.pieces[WHITE]
+        if board.active == BLACK:
+            move_system = 0x783c1e0f
+        else:
+            move_system = 0x783c1e0f0
+        if bin(move_system & pieces).count("1") % 2 == 1:
+            return 1
+
+    return 0
+
+
+# Threat
+def thret(board):
+    """
+    The parameter is credited with 1 for each square to which an
+    active piece may be moved and in doing so threaten to capture
+    a passive piece on a subsequent move.
+    """
+    moves = board.get_moves()
+    destinations = map(lambda x: (x ^ board.pieces[board.active]) & x, moves)
+    origins = [x ^ y for (x, y) in zip(moves, destinations)]
+
+    jumps = []
+    for dst, orig in zip(destinations, origins):
+        if board.active == BLACK:
+            rfj = (board.empty >> 8) & (board.pieces[board.passive] >> 4) & dst
+            lfj = (board.empty >> 10) & (board.pieces[board.passive] >> 5) & dst
+
+            # piece is king
+            if orig & board.backward[board.active]:
+                rbj = (board.empty << 8) & (board.pieces[board.passive] << 4) & dst
+                lbj = (board.empty << 10) & (board.pieces[board.passive] << 5) & dst
+            else:
+                rbj, lbj = 0, 0
+        else:
+            rbj = (board.empty << 8) & (board.pieces[board.passive] << 4) & dst
+            lbj = (board.empty << 10) & (board.pieces[board.passive] << 5) & dst
+
+            # piece at square is a king
+            if dst & board.forward[board.active]:
+                rfj = (board.empty >> 8) & (board.pieces[board.passive] >> 4) & dst
+                lfj = (board.empty >> 10) & (board.pieces[board.passive] >> 5) & dst
+            else:
+                rfj, lfj = 0, 0
+
+        if (rfj | lfj | rbj | lbj) != 0:
+            jumps += [-0x101 << i for (i, bit) in enumerate(bin(rfj)[::-1]) if bit == '1']
+            jumps += [-0x401 << i for (i, bit) in enumerate(bin(lfj)[::-1]) if bit == '1']
+            jumps += [-0x101 << i - 8 for (i, bit) in enumerate(bin(rbj)[::-1]) if bit == '1']
+            jumps += [-0x401 << i - 10 for (i, bit) in enumerate(bin(lbj)[::-1]) if bit == '1']
+
+    return len(jumps)
+
+
+def piece_score_diff(board, player):
+    black_men = bin(board.forward[BLACK]).count("1")
+    black_kings = bin(board.backward[BLACK]).count("1")
+    black_score = 2 * black_men + 3 * black_kings
+    white_men = bin(board.backward[WHITE]).count("1")
+    white_kings = bin(board.forward[WHITE]).count("1")
+    white_score = 2 * white_men + 3 * white_kings
+
+    return black_score - white_score if player == BLACK else white_score - black_score
+
+
+def position_score(board, player):
+    scores = [0x88000, 0x1904c00, 0x3A0502E0, 0x7C060301F]
+    total = 0
+    for i, score in enumerate(scores, start=1):
+        total = i * bin(board.pieces[player] & score).count("1")
+    return total
+
+
+def baseline_board(board):
+    """
+    Returns a baseline CheckerBoard in the state of a checkers.CheckerBoard.
+    """
+    baseline = CheckerBoard.__new__(CheckerBoard)
+    baseline.active, baseline.passive = board.active, board.passive
+    baseline.forward = board.forward[:]
+    baseline.backward = board.backward[:]
+    baseline.pieces = board.pieces[:]
+    baseline.empty = board.empty
+    baseline.jump = board.jump
+    baseline.mandatory_jumps = list(board.mandatory_jumps)
+    return baseline
@@ -0,0 +1,69 @@
+"""
+Seeded random positions for the tests.
+"""
+
+from random import Random
+
+from checkers import BLACK, WHITE, VALID_SQUARES, CheckerBoard
+
+SQUARES = [1 << i for i in range(36) if (VALID_SQUARES >> i) & 1]
+
+# Men are never on the row they are promoted on.
+BLACK_MEN_SQUARES = [square for square in SQUARES if not square & 0x780000000]
+WHITE_MEN_SQUARES = [square for square in SQUARES if not square & 0xf]
+
+
+def random_board(rnd):
+    """
+    Returns a random position: up to 12 pieces a side, kings included,
+    either side to move, and in about a third of the positions with
+    jumps, a multi-jump to continue.
+    """
+    black = white = kings = 0
+    for colour in (BLACK, WHITE):
+        men_squares = BLACK_MEN_SQUARES if colour == BLACK else WHITE_MEN_SQUARES
+        for _ in range(rnd.randint(1, 12)):
+            king = rnd.random() < 0.3
+            square = rnd.choice(SQUARES if king else men_squares)
+            if square & (black | white):
+                continue
+            if colour == BLACK:
+                black |= square
+            else:
+                white |= square
+            if king:
+                kings |= square
+
+    board = CheckerBoard()
+    board.set_position(black, white, kings, rnd.randint(0, 1))
+    jumps = board.get_jumps()
+    if jumps and rnd.random() < 0.3:
+        jumper = -rnd.choice(jumps) & board.pieces[board.active]
+        board.set_position(black, white, kings, board.active, jumper)
+    return board
+
+
+def random_boards(count, seed=0):
+    """
+    Returns count random positions, the same for the same seed.
+    """
+    rnd = Random(seed)
+    return [random_board(rnd) for _ in range(count)]
+
+
+def played_boards(count, seed=0, plies=(10, 60)):
+    """
+    Returns count positions reached by random games from the start,
+    including positions in the middle of a multi-jump.
+    """
+    rnd = Random(seed)
+    boards = []
+    while len(boards) < count:
+        board = CheckerBoard()
+        for _ in range(rnd.randint(*plies)):
+            moves = board.get_moves()
+            if not moves:
+                break
+            board.make_move(rnd.choice(moves))
+        boards.append(board)
+    return boards
@@ -0,0 +1,117 @@
+"""
+Tests that every column of the NumPy feature extraction of batch
+matches the scalar function of the same name, on seeded random
+positions, and that ArthurPlayer.evaluate_batch() matches evaluate().
+Like ArthurPlayer, the scalar features are only computed for games that
+are not over.
+"""
+
+import unittest
+
+from tests.positions import played_boards, random_boards
+from utils import (
+    adv, back, cent, cntr, deny, kcent, mob, mov, thret, piece_score_diff, position_score,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+RANDOM_POSITIONS = 5000
+PLAYED_POSITIONS = 2000
+
+SCALAR_FEATURES = {
+    "adv": adv,
+    "back": back,
+    "cent": cent,
+    "cntr": cntr,
+    "deny": deny,
+    "kcent": kcent,
+    "mob": mob,
+    "mov": mov,
+    "thret": thret,
+    "piece_score_diff": lambda board: piece_score_diff(board, board.active),
+    "position_score": lambda board: position_score(board, board.active),
+}
+
+
+def boards():
+    return random_boards(RANDOM_POSITIONS, seed=6) + played_boards(PLAYED_POSITIONS, seed=7)
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class FeatureArraysTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        from batch import boards_to_arrays
+
+        cls.boards = [board for board in boards() if not board.is_over()]
+        cls.arrays = boards_to_arrays(cls.boards)
+
+    def test_every_column_matches_scalar(self):
+        from batch import feature_arrays
+
+        features = feature_arrays(*self.arrays)
+        self.assertEqual(set(features), set(SCALAR_FEATURES) | {"over"})
+        for name, function in SCALAR_FEATURES.items():
+            with self.subTest(feature=name):
+                self.assertEqual(
+                    features[name].tolist(), [function(board) for board in self.boards],
+                )
+
+    def test_over(self):
+        from batch import boards_to_arrays, feature_arrays
+
+        positions = boards()
+        self.assertTrue(any(board.is_over() for board in positions))
+        features = feature_arrays(*boards_to_arrays(positions))
+        self.assertEqual(features["over"].tolist(), [board.is_over() for board in positions])
+
+    def test_player(self):
+        from batch import feature_arrays
+
+        player = numpy.array([1 - board.active for board in self.boards])
+        features = feature_arrays(*self.arrays, player=player)
+        for name, function in (("piece_score_diff", piece_score_diff),
+                               ("position_score", position_score)):
+            with self.subTest(feature=name):
+                self.assertEqual(
+                    features[name].tolist(),
+                    [function(board, 1 - board.active) for board in self.boards],
+                )
+
+    def test_extract_features(self):
+        from batch import FEATURE_NAMES, extract_features
+
+        matrix = extract_features(*self.arrays)
+        self.assertEqual(matrix.shape, (len(self.boards), len(FEATURE_NAMES)))
+        for column, name in enumerate(FEATURE_NAMES):
+            with self.subTest(feature=name):
+                self.assertEqual(
+                    matrix[:, column].tolist(),
+                    [SCALAR_FEATURES[name](board) for board in self.boards],
+                )
+
+
+@unittest.skipIf(numpy is None, "NumPy is not installed")
+class EvaluateBatchTest(unittest.TestCase):
+
+    def test_matches_evaluate(self):
+        from agents.arthur import ArthurPlayer
+
+        player = ArthurPlayer(feature_cache_size=0)
+        leaves = [
+            (board, board.peek_move(move))
+            for board in played_boards(300, seed=8) if not board.is_over()
+            for move in board.get_moves()
+        ]
+        self.assertEqual(
+            player.evaluate_batch(leaves),
+            [player.evaluate(board_old, board_new) for board_old, board_new in leaves],
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,222 @@
+"""
+Tests opening books: that the moves OpeningBook reads back from the
+memory-mapped file of BookBuilder are those of the games added, shared
+by a position and its mirror, that only legal moves are returned, and
+how choose() picks them.
+"""
+
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from random import Random
+
+from book import (
+    DRAW_WEIGHT, ENTRY_FORMAT, ENTRY_SIZE, LOSS_WEIGHT, WIN_WEIGHT, BookBuilder, OpeningBook,
+)
+from checkers import BLACK, WHITE, CheckerBoard, canonical, canonical_hash, mirror_move
+from tests.positions import random_boards
+
+GAMES = 200
+PLIES = 12
+
+
+def key(board):
+    """
+    Returns the position of the black to move twin of board, and
+    whether board was mirrored to get it.
+    """
+    board, mirrored = canonical(board)
+    kings = (
+        board.forward[BLACK] & board.backward[BLACK]
+        | board.forward[WHITE] & board.backward[WHITE]
+    )
+    jumper = -board.mandatory_jumps[0] & board.pieces[board.active] if board.jump else 0
+    return (board.pieces[BLACK], board.pieces[WHITE], kings, jumper), mirrored
+
+
+def random_games(rnd):
+    """
+    Returns GAMES random games from the starting position, as (moves,
+    winner) pairs, winner being BLACK, WHITE or None.
+    """
+    games = []
+    for _ in range(GAMES):
+        board = CheckerBoard()
+        moves = []
+        while len(moves) < 2 * PLIES and not board.is_over():
+            moves.append(rnd.choice(board.get_moves()))
+            board.make_move(moves[-1])
+        games.append((moves, rnd.choice((BLACK, WHITE, None))))
+    return games
+
+
+class OpeningBookTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        cls.path = os.path.join(cls.directory, "book")
+        cls.games = random_games(Random(17))
+        builder = BookBuilder(PLIES)
+        for moves, winner in cls.games:
+            builder.add_game(moves, winner)
+        cls.entries = builder.write(cls.path)
+        cls.book = OpeningBook(cls.path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.book.close()
+        shutil.rmtree(cls.directory)
+
+    def expected(self):
+        """
+        Returns the weights of the moves of every position of the games,
+        by key() and move of the black to move twin, and a board of every
+        position.
+        """
+        weights = {}
+        boards = {}
+        for moves, winner in self.games:
+            board = CheckerBoard()
+            for move in moves[:PLIES]:
+                if winner is None:
+                    weight = DRAW_WEIGHT
+                else:
+                    weight = WIN_WEIGHT if winner == board.active else LOSS_WEIGHT
+                position, mirrored = key(board)
+                move_weights = weights.setdefault(position, {})
+                book_move = mirror_move(move) if mirrored else move
+                move_weights[book_move] = move_weights.get(book_move, 0) + weight
+                boards.setdefault(position, []).append(board.copy())
+                board.make_move(move)
+        return weights, boards
+
+    def test_file(self):
+        with open(self.path, 'rb') as book:
+            data = book.read()
+        self.assertEqual(len(data), self.entries * ENTRY_SIZE)
+        self.assertEqual(len(self.book), self.entries)
+        keys = [entry[0] for entry in ENTRY_FORMAT.iter_unpack(data)]
+        self.assertEqual(keys, sorted(keys))
+        self.assertTrue(all(entry[2] for entry in ENTRY_FORMAT.iter_unpack(data)))
+
+    def test_moves_of_the_games(self):
+        weights, boards = self.expected()
+        self.assertEqual(self.entries, sum(
+            1 for move_weights in weights.values() for weight in move_weights.values() if weight
+        ))
+        for position, move_weights in weights.items():
+            for board in boards[position]:
+                mirrored = board.active == WHITE
+                self.assertEqual(
+                    sorted(self.book.moves(board)),
+                    sorted(
+                        (mirror_move(move) if mirrored else move, weight)
+                        for move, weight in move_weights.items() if weight
+                    ),
+                )
+
+    def test_mirror_shares_moves(self):
+        _, boards = self.expected()
+        for position_boards in boards.values():
+            for board in position_boards:
+                self.assertEqual(
+                    sorted(self.book.moves(board.mirror())),
+                    sorted((mirror_move(move), weight) for move, weight in self.book.moves(board)),
+                )
+
+    def test_positions_not_in_book(self):
+        _, boards = self.expected()
+        found = 0
+        for board in random_boards(500, seed=18):
+            if key(board)[0] in boards:
+                continue
+            found += 1
+            self.assertEqual(self.book.moves(board), [])
+            self.assertIsNone(self.book.choose(board))
+        self.assertGreater(found, 0)
+
+    def test_choose(self):
+        rnd = Random(19)
+        _, boards = self.expected()
+        for position_boards in boards.values():
+            board = position_boards[0]
+            moves = dict(self.book.moves(board))
+            if moves:
+                self.assertIn(self.book.choose(board, rnd), moves)
+            else:
+                self.assertIsNone(self.book.choose(board, rnd))
+
+    def test_pickle(self):
+        book = pickle.loads(pickle.dumps(self.book))
+        self.addCleanup(book.close)
+        board = CheckerBoard()
+        self.assertEqual(book.moves(board), self.book.moves(board))
+        self.assertTrue(book.moves(board))
+
+
+class BookTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write(self, builder):
+        path = os.path.join(self.directory, "book")
+        builder.write(path)
+        book = OpeningBook(path)
+        self.addCleanup(book.close)
+        return book
+
+    def test_only_legal_moves(self):
+        # Entries of a hash collision, or of a corrupt file, under the
+        # hash of the starting position.
+        board = CheckerBoard()
+        legal = board.get_moves()[0]
+        white_move = board.peek_move(legal).get_moves()[0]
+        builder = BookBuilder()
+        builder.weights[(canonical_hash(board), legal)] = 3
+        builder.weights[(canonical_hash(board), white_move)] = 5
+        builder.weights[(canonical_hash(board), -legal)] = 7
+        book = self.write(builder)
+        self.assertEqual(len(book), 3)
+        self.assertEqual(book.moves(board), [(legal, 3)])
+        self.assertEqual(book.choose(board), legal)
+
+    def test_choose_by_weight(self):
+        board = CheckerBoard()
+        first, second = board.get_moves()[:2]
+        builder = BookBuilder()
+        builder.weights[(canonical_hash(board), first)] = 3
+        builder.weights[(canonical_hash(board), second)] = 1
+        book = self.write(builder)
+        rnd = Random(20)
+        chosen = [book.choose(board, rnd) for _ in range(4000)]
+        self.assertEqual(set(chosen), {first, second})
+        self.assertAlmostEqual(chosen.count(first) / len(chosen), 0.75, delta=0.03)
+
+    def test_lost_moves_are_left_out(self):
+        board = CheckerBoard()
+        moves = board.get_moves()
+        builder = BookBuilder()
+        builder.add_game([moves[0]], BLACK)
+        builder.add_game([moves[1]], WHITE)
+        builder.add_game([moves[2]], None)
+        builder.add_game([moves[3]], -1)
+        book = self.write(builder)
+        self.assertEqual(
+            sorted(book.moves(board)),
+            sorted([(moves[0], WIN_WEIGHT), (moves[2], DRAW_WEIGHT), (moves[3], DRAW_WEIGHT)]),
+        )
+
+    def test_empty(self):
+        book = self.write(BookBuilder())
+        self.assertEqual(len(book), 0)
+        self.assertEqual(book.moves(CheckerBoard()), [])
+        self.assertIsNone(book.choose(CheckerBoard()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,197 @@
+"""
+Tests CheckerBoard on seeded random positions: move generation against
+the original generator of tests.baseline, and the state kept up to date
+by make_move() and unmake_move() against the same state computed from
+scratch, and the mirrored boards, hashes and moves.
+"""
+
+import unittest
+from random import Random
+
+from checkers import (
+    BLACK, VALID_SQUARES, WHITE, CheckerBoard, canonical, canonical_hash, mirror_move, rotate,
+)
+from tests.baseline import baseline_board
+from tests.positions import played_boards, random_board, random_boards
+
+RANDOM_POSITIONS = 20000
+PLAYED_POSITIONS = 2000
+PLAYOUTS = 200
+PLIES = 100
+
+
+def state(board):
+    return (
+        board.active, board.passive, board.forward, board.backward, board.pieces,
+        board.empty, board.jump, list(board.mandatory_jumps),
+    )
+
+
+def full_state(board):
+    return {
+        name: value[:] if isinstance(value, list) else value
+        for name, value in board.__dict__.items()
+    }
+
+
+def playouts(seed):
+    """
+    Yields the boards of random games played with make_move(), from the
+    start and from random positions, before each move.
+    """
+    rnd = Random(seed)
+    for number in range(PLAYOUTS):
+        board = CheckerBoard() if number % 2 else random_board(rnd)
+        for _ in range(PLIES):
+            if board.is_over():
+                break
+            yield board
+            board.make_move(rnd.choice(board.get_moves()))
+
+
+class MoveGenerationTest(unittest.TestCase):
+
+    def assert_same_moves(self, board):
+        baseline = baseline_board(board)
+        self.assertEqual(board.get_moves(), baseline.get_moves())
+        self.assertEqual(board.get_jumps(), baseline.get_jumps())
+        squares = board.pieces[board.active]
+        while squares:
+            piece = squares & -squares
+            self.assertEqual(board.jumps_from(piece), baseline.jumps_from(piece))
+            squares ^= piece
+
+    def assert_same_updates(self, board):
+        baseline = baseline_board(board)
+        for move in board.get_moves():
+            undo = board.make_move(move)
+            self.assertEqual(state(board), state(baseline.peek_move(move)))
+            board.unmake_move(undo)
+
+    def test_random_positions(self):
+        for board in random_boards(RANDOM_POSITIONS, seed=1):
+            self.assert_same_moves(board)
+            self.assert_same_updates(board)
+
+    def test_played_positions(self):
+        for board in played_boards(PLAYED_POSITIONS, seed=2):
+            self.assert_same_moves(board)
+            self.assert_same_updates(board)
+
+    def test_positions_cover_kings_and_multi_jumps(self):
+        boards = random_boards(RANDOM_POSITIONS, seed=1)
+        self.assertTrue(any(board.jump for board in boards))
+        self.assertTrue(any(
+            board.forward[colour] & board.backward[colour]
+            for board in boards for colour in (0, 1)
+        ))
+
+    def test_start_position(self):
+        self.assert_same_moves(CheckerBoard())
+
+
+class ZobristHashTest(unittest.TestCase):
+
+    def test_make_and_unmake(self):
+        for board in playouts(seed=3):
+            self.assertEqual(board.hash, board.compute_hash())
+            before = full_state(board)
+            for move in board.get_moves():
+                undo = board.make_move(move)
+                self.assertEqual(board.hash, board.compute_hash())
+                board.unmake_move(undo)
+                self.assertEqual(full_state(board), before)
+
+    def test_side_to_move_and_pending_jump(self):
+        board = CheckerBoard()
+        # A black king on bit 0 can jump white men on bits 5 and 15.
+        board.set_position(1 << 0, 1 << 5 | 1 << 15, 1 << 0, BLACK)
+        hashes = {board.hash}
+        board.set_position(1 << 0, 1 << 5 | 1 << 15, 1 << 0, WHITE)
+        hashes.add(board.hash)
+        board.set_position(1 << 0, 1 << 5 | 1 << 15, 1 << 0, BLACK, 1 << 0)
+        self.assertTrue(board.jump)
+        hashes.add(board.hash)
+        self.assertEqual(len(hashes), 3)
+
+
+def counts(board):
+    return board.men[:], board.kings[:], board.regions[:], board.move_system
+
+
+def counted(board):
+    """
+    Returns the running counts of board, computed from scratch.
+    """
+    board = board.copy()
+    board.count_pieces()
+    return counts(board)
+
+
+class RunningCountsTest(unittest.TestCase):
+
+    def test_make_and_unmake(self):
+        for board in playouts(seed=4):
+            self.assertEqual(counts(board), counted(board))
+            before = counts(board)
+            for move in board.get_moves():
+                undo = board.make_move(move)
+                self.assertEqual(counts(board), counted(board))
+                board.unmake_move(undo)
+                self.assertEqual(counts(board), before)
+
+    def test_promotions_and_captures_are_counted(self):
+        boards = list(playouts(seed=4))
+        self.assertTrue(any(sum(board.kings) for board in boards))
+        self.assertTrue(any(sum(board.men) + sum(board.kings) < 24 for board in boards))
+
+
+class MirrorTest(unittest.TestCase):
+
+    def boards(self):
+        return random_boards(5000, seed=21) + list(playouts(seed=22))
+
+    def test_rotate(self):
+        self.assertEqual(rotate(VALID_SQUARES), VALID_SQUARES)
+        for board in random_boards(1000, seed=23):
+            for squares in board.pieces:
+                self.assertEqual(rotate(rotate(squares)), squares)
+
+    def test_mirror_hash(self):
+        for board in self.boards():
+            mirror = board.mirror()
+            self.assertEqual(mirror.hash, mirror.compute_hash())
+            self.assertEqual(board.mirror_hash(), mirror.hash)
+            self.assertNotEqual(board.mirror_hash(), board.hash)
+
+    def test_mirror_twice(self):
+        for board in self.boards():
+            mirror = board.mirror()
+            self.assertEqual(mirror.active, board.passive)
+            self.assertEqual(full_state(mirror.mirror()), full_state(board))
+
+    def test_mirror_move(self):
+        for board in self.boards():
+            moves = board.get_moves()
+            mirror = board.mirror()
+            mirror_moves = [mirror_move(move) for move in moves]
+            self.assertEqual(len(set(mirror_moves)), len(moves))
+            self.assertEqual(sorted(mirror_moves), sorted(mirror.get_moves()))
+            for move in moves:
+                self.assertEqual(mirror_move(mirror_move(move)), move)
+                self.assertEqual(
+                    full_state(board.peek_move(move).mirror()),
+                    full_state(mirror.peek_move(mirror_move(move))),
+                )
+
+    def test_canonical_hash(self):
+        for board in self.boards():
+            twin, mirrored = canonical(board)
+            self.assertEqual(twin.active, BLACK)
+            self.assertEqual(mirrored, board.active == WHITE)
+            self.assertEqual(canonical_hash(board), twin.hash)
+            self.assertEqual(canonical_hash(board), canonical_hash(board.mirror()))
+
+
+if __name__ == '__main__':
+    unittest.main()
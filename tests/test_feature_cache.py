@@ -0,0 +1,103 @@
+"""
+Tests the FeatureCache of ArthurPlayer: that evaluating and searching
+with it gives the same scores as without, and that it evicts the least
+recently used positions to stay within its size.
+"""
+
+import unittest
+
+from agents.arthur import ArthurPlayer, features
+from tests.positions import played_boards, random_boards
+from utils import FeatureCache
+
+
+def leaves():
+    return [
+        (board, board.peek_move(move))
+        for board in played_boards(200, seed=24) + random_boards(200, seed=25)
+        if not board.is_over()
+        for move in board.get_moves()
+    ]
+
+
+class CachedScoresTest(unittest.TestCase):
+
+    def test_evaluate(self):
+        uncached = ArthurPlayer(feature_cache_size=0)
+        for size in (2**16, 8):
+            cached = ArthurPlayer(feature_cache_size=size)
+            for board_old, board_new in leaves():
+                self.assertEqual(
+                    cached.evaluate(board_old, board_new), uncached.evaluate(board_old, board_new),
+                )
+            self.assertGreater(cached.features.hits, 0)
+            self.assertLessEqual(len(cached.features.entries), size)
+
+    def test_search(self):
+        for depth in (2, 3):
+            uncached = ArthurPlayer(depth=depth, feature_cache_size=0)
+            for size in (2**16, 16):
+                cached = ArthurPlayer(depth=depth, feature_cache_size=size)
+                for board in played_boards(10, seed=26):
+                    if board.is_over():
+                        continue
+                    moves = board.get_moves()
+                    self.assertEqual(
+                        cached.search_root(board, moves, depth),
+                        uncached.search_root(board, moves, depth),
+                    )
+                self.assertGreater(cached.features.hits, 0)
+                self.assertLessEqual(len(cached.features.entries), size)
+
+
+class FeatureCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.calls = []
+        self.boards = random_boards(5, seed=27)
+
+    def function(self, board):
+        self.calls.append(board.hash)
+        return features(board)
+
+    def test_hits_and_misses(self):
+        cache = FeatureCache(self.function, size=8)
+        for board in self.boards + self.boards:
+            self.assertEqual(cache(board), features(board))
+        self.assertEqual(self.calls, [board.hash for board in self.boards])
+        self.assertEqual(
+            cache.stats, {"size": 8, "used": 5, "hits": 5, "misses": 5},
+        )
+
+        cache.clear()
+        self.assertEqual(cache.stats, {"size": 8, "used": 0, "hits": 0, "misses": 0})
+
+    def test_least_recently_used_is_evicted(self):
+        a, b, c, d, e = self.boards
+        cache = FeatureCache(self.function, size=3)
+        for board in (a, b, c):
+            cache(board)
+        # a is used again, so b is now the least recently used.
+        cache(a)
+        cache(d)
+        self.assertEqual(list(cache.entries), [c.hash, a.hash, d.hash])
+        cache(e)
+        self.assertEqual(list(cache.entries), [a.hash, d.hash, e.hash])
+
+        del self.calls[:]
+        cache(b)
+        cache(a)
+        self.assertEqual(self.calls, [b.hash, a.hash])
+        self.assertEqual(len(cache.entries), 3)
+
+    def test_size_is_respected(self):
+        for size in (1, 2, 7):
+            cache = FeatureCache(self.function, size=size)
+            for board in random_boards(50, seed=28):
+                cache(board)
+                self.assertLessEqual(len(cache.entries), size)
+            self.assertEqual(len(cache.entries), size)
+
+
+if __name__ == '__main__':
+    unittest.main()
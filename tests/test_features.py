@@ -0,0 +1,63 @@
+"""
+Tests the deny() and thret() features, and the features read from the
+running piece counts, against the original implementations of
+tests.baseline, on seeded random positions.
+"""
+
+import unittest
+
+from checkers import BLACK, WHITE, CheckerBoard
+from tests import baseline
+from tests.positions import played_boards, random_boards
+from utils import deny, mov, piece_score_diff, position_score, thret
+
+RANDOM_POSITIONS = 10000
+PLAYED_POSITIONS = 2000
+
+
+def boards():
+    return random_boards(RANDOM_POSITIONS, seed=3) + played_boards(PLAYED_POSITIONS, seed=4)
+
+
+class DenyTest(unittest.TestCase):
+
+    def test_matches_baseline(self):
+        for board in boards():
+            self.assertEqual(deny(board), baseline.deny(baseline.baseline_board(board)))
+
+    def test_positions_cover_multi_jumps(self):
+        self.assertTrue(any(board.jump for board in boards()))
+
+
+class ThretTest(unittest.TestCase):
+
+    def test_matches_baseline(self):
+        for board in boards():
+            self.assertEqual(thret(board), baseline.thret(baseline.baseline_board(board)))
+
+    def test_baseline_scores_zero_with_threats(self):
+        # A black man on bit 0 moves to bit 4 or 5, and from either one
+        # threatens the white man on bit 9, yet the original credits 0.
+        board = CheckerBoard()
+        board.set_position(1 << 0, 1 << 9, 0, BLACK)
+        self.assertEqual(baseline.thret(baseline.baseline_board(board)), 0)
+        self.assertEqual(thret(board), 0)
+
+
+class CountedFeaturesTest(unittest.TestCase):
+
+    def test_matches_baseline(self):
+        for board in boards():
+            original = baseline.baseline_board(board)
+            self.assertEqual(mov(board), baseline.mov(original))
+            for player in (BLACK, WHITE):
+                self.assertEqual(
+                    piece_score_diff(board, player), baseline.piece_score_diff(original, player),
+                )
+                self.assertEqual(
+                    position_score(board, player), baseline.position_score(original, player),
+                )
+
+
+if __name__ == '__main__':
+    unittest.main()
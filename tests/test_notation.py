@@ -0,0 +1,150 @@
+"""
+Tests the round trips of notation: FEN, PDN and the 16-byte packing,
+on seeded random positions and games.
+"""
+
+import unittest
+from random import Random
+
+from checkers import CheckerBoard
+from notation import (
+    PACKED_SIZE, from_fen, pack_board, read_pdn, to_fen, unpack_board, write_pdn,
+)
+from tests.positions import random_board, random_boards
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+GAMES = 100
+
+
+def state(board):
+    return (
+        board.active, board.passive, board.forward, board.backward, board.pieces, board.empty,
+        board.jump, list(board.mandatory_jumps), board.hash,
+        board.men, board.kings, board.regions, board.move_system,
+    )
+
+
+def random_game(rnd, board=None, plies=200):
+    """
+    Returns the moves of a random game played from board, the starting
+    position by default, for at most plies moves.
+    """
+    board = board.copy() if board is not None else CheckerBoard()
+    moves = []
+    while len(moves) < plies and not board.is_over():
+        moves.append(rnd.choice(board.get_moves()))
+        board.make_move(moves[-1])
+    return moves
+
+
+def multi_jumps(moves, board=None):
+    """
+    Returns the number of jumps of moves that continue a multi-jump.
+    """
+    board = board.copy() if board is not None else CheckerBoard()
+    count = 0
+    for move in moves:
+        count += bool(board.jump)
+        board.make_move(move)
+    return count
+
+
+class PackingTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        for board in random_boards(5000, seed=11):
+            data = pack_board(board)
+            self.assertEqual(len(data), PACKED_SIZE)
+            self.assertEqual(state(unpack_board(data)), state(board))
+
+    def test_offset(self):
+        boards = random_boards(10, seed=12)
+        data = b"".join(pack_board(board) for board in boards)
+        for i, board in enumerate(boards):
+            self.assertEqual(state(unpack_board(data, i * PACKED_SIZE)), state(board))
+
+    @unittest.skipIf(numpy is None, "NumPy is not installed")
+    def test_batch_packing(self):
+        from batch import pack_boards, unpack_boards
+
+        boards = random_boards(2000, seed=13)
+        packed = pack_boards(boards)
+        self.assertEqual(packed.tobytes(), b"".join(pack_board(board) for board in boards))
+        self.assertEqual(
+            [state(board) for board in unpack_boards(packed)], [state(board) for board in boards],
+        )
+
+
+class FenTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        for board in random_boards(5000, seed=14):
+            if board.jump:
+                self.assertRaises(ValueError, to_fen, board)
+            else:
+                self.assertEqual(state(from_fen(to_fen(board))), state(board))
+
+    def test_start_position(self):
+        start = CheckerBoard()
+        self.assertEqual(
+            to_fen(start), "B:W21,22,23,24,25,26,27,28,29,30,31,32:B1,2,3,4,5,6,7,8,9,10,11,12",
+        )
+        self.assertEqual(state(from_fen('"B:W21-32:B1-12."')), state(start))
+
+    def test_malformed(self):
+        for fen in ("", "B:W21", "X:W21:B1", "B:W33:B1", "B:W0:B1", "B:Wa:B1", "B:21:B1"):
+            self.assertRaises(ValueError, from_fen, fen)
+
+
+class PdnTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        rnd = Random(15)
+        games = [random_game(rnd) for _ in range(GAMES)]
+        self.assertGreater(sum(multi_jumps(moves) for moves in games), 0)
+
+        text = "\n".join(
+            write_pdn(moves, {"Event": "Game %d" % number})
+            for number, moves in enumerate(games, start=1)
+        )
+        read = list(read_pdn(text))
+        self.assertEqual([moves for _, moves in read], games)
+        for number, (tags, moves) in enumerate(read, start=1):
+            self.assertEqual(tags["Event"], "Game %d" % number)
+
+    def test_round_trip_from_position(self):
+        rnd = Random(16)
+        for _ in range(GAMES):
+            board = random_board(rnd)
+            if board.jump or board.is_over():
+                continue
+            moves = random_game(rnd, board)
+            (tags, read_moves), = read_pdn(write_pdn(moves, board=board))
+            self.assertEqual(tags["FEN"], to_fen(board))
+            self.assertEqual(read_moves, moves)
+
+    def test_comments_and_variations(self):
+        text = (
+            '[Event "Test"]\n\n'
+            "1. 11-15 {a comment} 23-19 (1... 22-18 15x22) 2. 8-11 ; to the end of line\n"
+            "22-17! 1-0\n"
+        )
+        (tags, moves), = read_pdn(text)
+        board = CheckerBoard()
+        for move in moves:
+            board.make_move(move)
+        self.assertEqual(len(moves), 4)
+        self.assertEqual(to_fen(board), "B:W17,19,21,24,25,26,27,28,29,30,31,32"
+                                        ":B1,2,3,4,5,6,7,9,10,11,12,15")
+
+    def test_illegal_move(self):
+        self.assertRaises(ValueError, list, read_pdn("1. 11-18 *\n"))
+        self.assertRaises(ValueError, list, read_pdn("1. 22-18 *\n"))
+
+
+if __name__ == '__main__':
+    unittest.main()
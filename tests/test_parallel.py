@@ -0,0 +1,68 @@
+"""
+Tests the parallel root search against the serial one, and lazy SMP as
+a tournament agent.
+"""
+
+import unittest
+
+from agents.arthur import ArthurPlayer
+from agents.rand import RandomPlayer
+from benchmark import positions
+from parallel import LazySMP
+from tournament import play_game
+
+DEPTH = 3
+
+
+class RootSplitterTest(unittest.TestCase):
+
+    def test_same_move_and_score_as_serial_search(self):
+        serial = ArthurPlayer(depth=DEPTH)
+        parallel = ArthurPlayer(depth=DEPTH, workers=2)
+        try:
+            for board in positions():
+                moves = board.get_moves()
+                serial_move, serial_scores = serial.search_root(board, moves, DEPTH)
+                parallel_move, parallel_scores = parallel.search_root(board, moves, DEPTH)
+                self.assertEqual(parallel_move, serial_move)
+                self.assertEqual(parallel_scores[moves.index(parallel_move)], max(serial_scores))
+        finally:
+            parallel.close()
+
+    def test_counters_and_principal_variation(self):
+        serial = ArthurPlayer(depth=DEPTH)
+        parallel = ArthurPlayer(depth=DEPTH, workers=2)
+        try:
+            for board in positions():
+                serial_move, serial_stats = serial.search(board)
+                parallel_move, parallel_stats = parallel.search(board)
+                for stats in (serial_stats, parallel_stats):
+                    self.assertGreater(stats.leaves, 0)
+                    self.assertGreater(stats.cutoffs, 0)
+                    self.assertGreaterEqual(stats.max_ply, DEPTH)
+                self.assertEqual(parallel_stats.pv[0], parallel_move)
+                self.assertGreaterEqual(len(parallel_stats.pv), DEPTH)
+                self.assertEqual(parallel_move, serial_move)
+
+                line = board.copy()
+                for move in parallel_stats.pv:
+                    self.assertIn(move, line.get_moves())
+                    line.make_move(move)
+        finally:
+            parallel.close()
+
+
+class LazySMPTest(unittest.TestCase):
+
+    def test_plays_games(self):
+        smp = LazySMP(ArthurPlayer(depth=DEPTH), 2, table_size_mb=1)
+        try:
+            result = play_game(smp, RandomPlayer(), max_turns=3)
+        finally:
+            smp.close()
+        self.assertTrue(result.moves)
+        self.assertFalse(result.search[0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+"""
+Tests CheckerBoard move generation by perft from the start position,
+against the known counts of perft.START_POSITION_COUNTS.
+"""
+
+import unittest
+
+from checkers import CheckerBoard
+from perft import START_POSITION_COUNTS, divide, perft
+
+DEPTH = 7
+
+
+def state(board):
+    return (
+        board.active, board.forward[:], board.backward[:], board.pieces[:], board.empty,
+        board.jump, list(board.mandatory_jumps), board.hash,
+    )
+
+
+class PerftTest(unittest.TestCase):
+
+    def test_start_position_counts(self):
+        board = CheckerBoard()
+        for depth in range(DEPTH + 1):
+            with self.subTest(depth=depth):
+                self.assertEqual(perft(board, depth), START_POSITION_COUNTS[depth])
+
+    def test_restores_board(self):
+        board = CheckerBoard()
+        before = state(board)
+        perft(board, 5)
+        self.assertEqual(state(board), before)
+
+    def test_divide_sums_to_perft(self):
+        board = CheckerBoard()
+        counts = divide(board, 5)
+        self.assertEqual([move for move, _ in counts], board.get_moves())
+        self.assertEqual(sum(count for _, count in counts), START_POSITION_COUNTS[5])
+
+
+if __name__ == '__main__':
+    unittest.main()
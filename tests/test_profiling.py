@@ -0,0 +1,59 @@
+"""
+Tests that profiling records the search without changing it, and that
+a profiled player can still be pickled into worker processes.
+"""
+
+import pickle
+import unittest
+
+from agents.arthur import ArthurPlayer
+from benchmark import positions
+from profiling import Profiler
+
+
+def profiled_player(**kwargs):
+    player = ArthurPlayer(depth=3, **kwargs)
+    Profiler().attach(player)
+    return player
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def test_records_timed_calls(self):
+        player = profiled_player()
+        player.search(positions()[0])
+        record = player.profiler.records[-1]
+        for name in ("evaluate", "get_moves", "make_move", "unmake_move", "deny", "thret"):
+            self.assertGreater(record["calls"][name], 0, name)
+        self.assertEqual([depth["depth"] for depth in record["depths"]], [3])
+        self.assertTrue(record["branching"])
+
+    def test_same_moves_as_unprofiled(self):
+        boards = positions()
+        plain, profiled = ArthurPlayer(depth=3), profiled_player()
+        self.assertEqual(
+            [plain.best_move(board) for board in boards],
+            [profiled.best_move(board) for board in boards],
+        )
+
+    def test_pickles(self):
+        player = profiled_player()
+        player.search(positions()[0])
+        copy = pickle.loads(pickle.dumps(player))
+        self.assertIs(copy.profiler.player, copy)
+        self.assertEqual(copy.best_move(positions()[1]), player.best_move(positions()[1]))
+        self.assertEqual(len(copy.profiler.records), 2)
+
+    def test_profiled_workers(self):
+        board = positions()[0]
+        player = profiled_player(workers=2)
+        try:
+            move = player.best_move(board)
+        finally:
+            player.close()
+        self.assertEqual(move, ArthurPlayer(depth=3).best_move(board))
+        self.assertEqual(len(player.profiler.records), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
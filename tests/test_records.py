@@ -0,0 +1,145 @@
+"""
+Tests game records: that GameArchive finds every game written by
+GameRecordWriter or indexed by build_index(), whatever their numbers
+and order, and reads back the same positions as replaying the moves.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from agents.rand import RandomPlayer
+from records import (
+    GameArchive, GameRecordWriter, build_index, index_path, position, positions_path,
+    read_records, turn_ply,
+)
+from tournament import play_game
+
+GAMES = 12
+
+
+def state(board):
+    return (
+        board.active, board.forward, board.backward, board.pieces, board.empty,
+        board.jump, list(board.mandatory_jumps), board.hash,
+    )
+
+
+def random_games(numbers):
+    return [
+        play_game(RandomPlayer(), RandomPlayer(), seed=number, number=number, max_turns=40)
+        for number in numbers
+    ]
+
+
+class GameArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, "games.jsonl")
+
+    def write(self, games, flush_every=5):
+        with GameRecordWriter(self.path, flush_every) as writer:
+            for result in games:
+                writer.write(result)
+
+    def archive(self):
+        archive = GameArchive(self.path)
+        self.addCleanup(archive.close)
+        return archive
+
+    def assert_games(self, archive, games):
+        records = {}
+        for record in read_records(self.path):
+            records.setdefault(record["game"], record)
+        self.assertEqual(sorted(records), sorted(result.number for result in games))
+        for number, record in records.items():
+            self.assertEqual(archive.record(number), record)
+            with open(self.path, 'rb') as records_file:
+                records_file.seek(archive.offset(number))
+                self.assertEqual(json.loads(records_file.readline()), record)
+
+    def assert_positions(self, archive, number, record):
+        plies = len(record["moves"])
+        for ply in list(range(plies + 1)) + [None, plies + 5, -1, -plies - 5]:
+            self.assertEqual(
+                state(archive.position(number, ply)), state(position(record, ply)),
+            )
+        self.assertEqual(turn_ply(record, 10**6), plies)
+        for turn in range(0, record["turns"] + 3):
+            self.assertEqual(
+                state(archive.position(number, turn=turn)),
+                state(position(record, turn_ply(record, turn))),
+            )
+
+    def test_games_in_order(self):
+        games = random_games(range(1, GAMES + 1))
+        self.write(games)
+        archive = self.archive()
+        self.assertEqual(len(archive), GAMES)
+        self.assert_games(archive, games)
+        for record in read_records(self.path):
+            self.assert_positions(archive, record["game"], record)
+
+    def test_games_out_of_order(self):
+        numbers = [7, 3, 12, 40, 1, 9, 25, 2]
+        games = random_games(numbers)
+        self.write(games, flush_every=3)
+        archive = self.archive()
+        self.assertEqual(len(archive), len(numbers))
+        self.assert_games(archive, games)
+        for record in read_records(self.path):
+            self.assert_positions(archive, record["game"], record)
+
+    def test_missing_games(self):
+        self.write(random_games([2, 4, 6]))
+        archive = self.archive()
+        for number in (0, 1, 3, 5, 7, 100):
+            self.assertRaises(KeyError, archive.offset, number)
+            self.assertRaises(KeyError, archive.position, number)
+
+    def test_repeated_numbers_give_the_first_game(self):
+        first, second = random_games([1, 2]), random_games([1, 2])
+        second = [result._replace(seed=-1) for result in second]
+        self.write(first)
+        self.write(second)
+        archive = self.archive()
+        self.assertEqual(len(archive), 4)
+        for result in first:
+            self.assertEqual(archive.record(result.number)["seed"], result.seed)
+
+    def test_build_index(self):
+        games = random_games([5, 1, 4, 2, 3])
+        self.write(games)
+        with open(index_path(self.path), 'rb') as index:
+            written_index = index.read()
+        with open(positions_path(self.path), 'rb') as positions:
+            written_positions = positions.read()
+
+        self.assertEqual(build_index(self.path), len(games))
+        with open(index_path(self.path), 'rb') as index:
+            self.assertEqual(index.read(), written_index)
+        with open(positions_path(self.path), 'rb') as positions:
+            self.assertEqual(positions.read(), written_positions)
+
+        os.remove(index_path(self.path))
+        os.remove(positions_path(self.path))
+        archive = self.archive()
+        self.assertTrue(os.path.exists(index_path(self.path)))
+        self.assert_games(archive, games)
+        for record in read_records(self.path):
+            self.assert_positions(archive, record["game"], record)
+
+    def test_empty(self):
+        open(self.path, 'w').close()
+        self.assertEqual(build_index(self.path), 0)
+        archive = self.archive()
+        self.assertEqual(len(archive), 0)
+        self.assertRaises(KeyError, archive.offset, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
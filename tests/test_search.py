@@ -0,0 +1,149 @@
+"""
+Tests the moves and scores of the Player searches, quiescence included,
+against a plain minimax over board copies, on positions of seeded
+random games.
+"""
+
+import unittest
+
+from agents.arthur import ArthurPlayer
+from notation import from_fen, parse_move
+from tests.positions import played_boards
+
+POSITIONS = 24
+
+
+def minimax(player, board_old, board_new, depth, quiescence=0):
+    """
+    Returns the score of board_new for its side to move, searched to
+    depth like Player: a move only uses up depth when the turn passes.
+    Past depth, up to quiescence more jumps are searched, and a
+    position is only evaluated once it has no jump.
+    """
+    moves = board_new.get_moves()
+    if board_new.is_over() or depth == 0 and (not quiescence or moves[0] > 0):
+        score = player.evaluate(board_old, board_new)
+        return score if board_new.active == board_old.active else -score
+
+    best_value = None
+    for move in moves:
+        board = board_new.peek_move(move)
+        if depth == 0:
+            val = minimax(player, board_new, board, 0, quiescence - 1)
+        elif board.active != board_new.active:
+            val = minimax(player, board_new, board, depth - 1, quiescence)
+        else:
+            val = minimax(player, board_new, board, depth, quiescence)
+        if board.active != board_new.active:
+            val = -val
+        if best_value is None or val > best_value:
+            best_value = val
+    return best_value
+
+
+def root_scores(player, board, depth, quiescence=0):
+    """
+    Returns the minimax score of every move of board, for its side to
+    move.
+    """
+    scores = []
+    for move in board.get_moves():
+        board_new = board.peek_move(move)
+        score = minimax(player, board, board_new, depth, quiescence)
+        scores.append(score if board_new.active == board.active else -score)
+    return scores
+
+
+def boards():
+    return [
+        board for board in played_boards(POSITIONS, seed=5, plies=(6, 40))
+        if not board.is_over() and len(board.get_moves()) > 1
+    ]
+
+
+class SearchTest(unittest.TestCase):
+
+    def assert_best(self, board, move, scores):
+        self.assertEqual(scores[board.get_moves().index(move)], max(scores))
+
+    def test_min_max_scores(self):
+        for depth in (1, 2, 3):
+            player = ArthurPlayer(depth=depth, search_with="min_max")
+            for board in boards():
+                moves = board.get_moves()
+                self.assertEqual(
+                    player.search_root(board, moves, depth)[1], root_scores(player, board, depth),
+                )
+
+    def test_best_move(self):
+        for depth in (1, 2, 3, 4):
+            players = [
+                ArthurPlayer(depth=depth, search_with="alpha_beta"),
+                ArthurPlayer(depth=depth),
+                ArthurPlayer(depth=depth, table_size_mb=1, move_ordering=True),
+            ]
+            for board in boards():
+                scores = root_scores(players[0], board, depth)
+                for player in players:
+                    self.assert_best(board, player.best_move(board), scores)
+
+    def test_iterative_deepening(self):
+        for depth in (1, 2, 3, 4):
+            player = ArthurPlayer(depth=depth, table_size_mb=1, move_ordering=True)
+            for board in boards():
+                move, reached = player.iterative_deepening(board, max_depth=depth)
+                self.assertEqual(reached, depth)
+                self.assert_best(board, move, root_scores(player, board, depth))
+
+
+class QuiescenceTest(unittest.TestCase):
+
+    def test_scores(self):
+        for quiescence in (2, 6):
+            for depth in (1, 2, 3):
+                players = [
+                    ArthurPlayer(depth=depth, search_with=search_with, quiescence_depth=quiescence)
+                    for search_with in ("alpha_beta", "nega_max")
+                ]
+                for board in boards():
+                    scores = root_scores(players[0], board, depth, quiescence)
+                    for player in players:
+                        move, player_scores = player.search_root(board, board.get_moves(), depth)
+                        self.assertEqual(scores[board.get_moves().index(move)], max(scores))
+                        self.assertEqual(max(player_scores), max(scores))
+
+    def test_resolves_exchange(self):
+        # 17-22 gives a man, 26x17, and takes one back, 13x22. At depth 1
+        # the search stops before the recapture.
+        board = from_fen("B:W16,24,26,32:B6,13,17,28")
+        moves = board.get_moves()
+        exchange = moves.index(parse_move(board, "17-22")[0])
+        for search_with in ("alpha_beta", "nega_max"):
+            plain = ArthurPlayer(depth=1, search_with=search_with)
+            quiet = ArthurPlayer(depth=1, search_with=search_with, quiescence_depth=4)
+            _, plain_scores = plain.search_root(board, moves, 1)
+            _, quiet_scores = quiet.search_root(board, moves, 1)
+            # A man is worth 2**20.
+            self.assertLess(plain_scores[exchange], max(plain_scores) - 2**19)
+            self.assertEqual(quiet_scores[exchange], max(quiet_scores))
+            self.assertEqual(quiet.best_move(board), moves[exchange])
+            self.assertEqual(quiet_scores, root_scores(quiet, board, 1, 4))
+
+    def test_no_stand_pat_on_a_jump(self):
+        # After 26-31 7-3, the new black king has to take, 31x24, and is
+        # taken, 28x19. Standing pat instead of jumping would make 26-31
+        # look better than 26-30.
+        board = from_fen("B:W7,27,28:B4,11,26")
+        moves = board.get_moves()
+        crown = moves.index(parse_move(board, "26-31")[0])
+        safe = moves.index(parse_move(board, "26-30")[0])
+        for search_with in ("alpha_beta", "nega_max"):
+            player = ArthurPlayer(depth=1, search_with=search_with, quiescence_depth=4)
+            _, scores = player.search_root(board, moves, 1)
+            self.assertLess(scores[crown], scores[safe])
+            self.assertEqual(player.best_move(board), moves[safe])
+            self.assertEqual(scores, root_scores(player, board, 1, 4))
+
+
+if __name__ == '__main__':
+    unittest.main()
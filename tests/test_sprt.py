@@ -0,0 +1,110 @@
+"""
+Tests the score statistics, Elo estimates and SPRT decisions of sprt on
+known sequences of game scores.
+"""
+
+import unittest
+from itertools import cycle, islice
+from math import inf
+
+from sprt import (
+    MIN_VARIANCE, SPRT, elo_difference, elo_interval, expected_score, score_stats,
+)
+
+
+def run(sprt, scores, limit=10000):
+    """
+    Adds the scores to sprt until the test decides, at most limit of
+    them. Returns the result.
+    """
+    for score in islice(scores, limit):
+        sprt.add(score)
+        if sprt.result is not None:
+            break
+    return sprt.result
+
+
+class ScoreStatsTest(unittest.TestCase):
+
+    def test_mean_and_variance(self):
+        mean, variance, games = score_stats(5, 2, 3)
+        self.assertEqual(games, 10)
+        self.assertAlmostEqual(mean, 0.6)
+        self.assertAlmostEqual(variance, (5 * 0.4 ** 2 + 2 * 0.1 ** 2 + 3 * 0.6 ** 2) / 10)
+
+    def test_counts_are_not_altered(self):
+        self.assertEqual(score_stats(3, 0, 0), (1, MIN_VARIANCE, 3))
+        self.assertEqual(score_stats(0, 0, 3), (0, MIN_VARIANCE, 3))
+        self.assertEqual(score_stats(0, 4, 0), (0.5, MIN_VARIANCE, 4))
+        mean, variance, games = score_stats(3, 0, 1)
+        self.assertEqual((mean, games), (0.75, 4))
+        self.assertAlmostEqual(variance, (3 * 0.25 ** 2 + 0.75 ** 2) / 4)
+
+
+class EloTest(unittest.TestCase):
+
+    def test_inverse(self):
+        for score in (0.1, 0.3, 0.5, 0.7, 0.9):
+            self.assertAlmostEqual(expected_score(elo_difference(score)), score)
+        self.assertEqual(elo_difference(0.5), 0)
+        self.assertEqual(elo_difference(0), -inf)
+        self.assertEqual(elo_difference(1), inf)
+
+    def test_interval(self):
+        elo, low, high = elo_interval(30, 40, 30)
+        self.assertEqual(elo, 0)
+        self.assertAlmostEqual(low, -high)
+        self.assertLess(low, 0)
+        wider = elo_interval(30, 40, 30, confidence=0.99)
+        self.assertLess(wider[1], low)
+        self.assertEqual(elo_interval(0, 0, 0), (0, -inf, inf))
+
+
+class SPRTTest(unittest.TestCase):
+
+    def test_llr(self):
+        sprt = SPRT(elo0=0, elo1=10)
+        for score in [1] * 30 + [0.5] * 40 + [0] * 30:
+            sprt.add(score)
+        s0, s1 = expected_score(0), expected_score(10)
+        variance = (30 * 0.25 + 30 * 0.25) / 100
+        self.assertAlmostEqual(sprt.llr, 100 * (s1 - s0) * (1 - s0 - s1) / (2 * variance))
+        self.assertEqual(SPRT().llr, 0)
+
+    def test_accepts_h1(self):
+        sprt = SPRT(elo0=0, elo1=10)
+        self.assertEqual(run(sprt, cycle((1, 1, 0.5, 0))), "H1")
+        self.assertGreaterEqual(sprt.llr, sprt.upper)
+
+    def test_accepts_h0(self):
+        sprt = SPRT(elo0=0, elo1=10)
+        self.assertEqual(run(sprt, cycle((0, 0, 0.5, 1))), "H0")
+        self.assertLessEqual(sprt.llr, sprt.lower)
+
+    def test_even_match_between_symmetric_hypotheses(self):
+        sprt = SPRT(elo0=-10, elo1=10)
+        self.assertIsNone(run(sprt, cycle((1, 0.5, 0))))
+        self.assertEqual(sprt.games, 10000)
+
+    def test_one_sided_match(self):
+        sprt = SPRT(elo0=0, elo1=10)
+        self.assertEqual(run(sprt, cycle((1,))), "H1")
+        self.assertEqual((sprt.wins, sprt.draws, sprt.losses), (21, 0, 0))
+
+        sprt = SPRT(elo0=0, elo1=10)
+        self.assertEqual(run(sprt, cycle((0,))), "H0")
+        self.assertEqual((sprt.wins, sprt.draws, sprt.losses), (0, 0, 21))
+
+    def test_report(self):
+        sprt = SPRT(elo0=0, elo1=10)
+        run(sprt, cycle((1, 1, 0.5, 0)))
+        report = sprt.report(games_planned=10000)
+        self.assertEqual(report["result"], "H1")
+        self.assertEqual(report["games_saved"], 10000 - sprt.games)
+        self.assertLess(report["elo_low"], report["elo"])
+        self.assertLess(report["elo"], report["elo_high"])
+        self.assertEqual(SPRT().report()["games"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
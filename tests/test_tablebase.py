@@ -0,0 +1,193 @@
+"""
+Tests the tablebase: the results and distances Tablebase.probe() reads
+from slices built by generate() and solve_slice() against a brute-force
+solve, round by round, of all of their positions.
+"""
+
+import pickle
+import shutil
+import tempfile
+import unittest
+from itertools import permutations
+
+from checkers import BLACK, WHITE, CheckerBoard
+from tablebase import DRAW, LOSS, WIN, Tablebase, generate, slice_size, slices, solve_slice
+from tests.positions import BLACK_MEN_SQUARES, SQUARES, WHITE_MEN_SQUARES
+
+# Three piece slices solved on top of the two piece tablebase: two kings
+# against one, and a man and a king against a king, whose man promotes
+# into the first.
+SLICES = [(0, 2, 0, 1), (1, 1, 0, 1)]
+
+
+def key(board):
+    kings = (
+        board.forward[BLACK] & board.backward[BLACK]
+        | board.forward[WHITE] & board.backward[WHITE]
+    )
+    return board.pieces[BLACK], board.pieces[WHITE], kings, board.active
+
+
+def turns(board):
+    """
+    Yields the positions after every turn of the side to move of board,
+    a multi-jump being a single turn.
+    """
+    for move in board.get_moves():
+        board_new = board.peek_move(move)
+        if board_new.active == board.active:
+            yield from turns(board_new)
+        else:
+            yield board_new
+
+
+def material_boards(material):
+    """
+    Yields every position of the given (black men, black kings, white
+    men, white kings), with either side to move.
+    """
+    black_men, black_kings, white_men, white_kings = material
+    pieces = (
+        [(BLACK, False)] * black_men + [(BLACK, True)] * black_kings
+        + [(WHITE, False)] * white_men + [(WHITE, True)] * white_kings
+    )
+    seen = set()
+    for squares in permutations(SQUARES, len(pieces)):
+        black = white = kings = 0
+        for square, (colour, king) in zip(squares, pieces):
+            men_squares = BLACK_MEN_SQUARES if colour == BLACK else WHITE_MEN_SQUARES
+            if not king and square not in men_squares:
+                break
+            if colour == BLACK:
+                black |= square
+            else:
+                white |= square
+            if king:
+                kings |= square
+        else:
+            if (black, white, kings) in seen:
+                continue
+            seen.add((black, white, kings))
+            for active in (BLACK, WHITE):
+                board = CheckerBoard()
+                board.set_position(black, white, kings, active)
+                yield board
+
+
+def brute_force(boards):
+    """
+    Solves every position of boards and every position they lead to.
+    Returns a dict of (result, distance) by key(): a position is lost in
+    0 turns with no move left, won in n turns if a turn leads to a
+    position lost in n - 1 turns, lost in n turns if every turn leads
+    to a position won in at most n - 1 turns, and drawn if never
+    solved.
+    """
+    successors = {}
+    pending = list(boards)
+    while pending:
+        board = pending.pop()
+        if key(board) in successors:
+            continue
+        successors[key(board)] = []
+        for board_new in turns(board):
+            if not board_new.pieces[board_new.active]:
+                successors[key(board)].append(None)
+            else:
+                successors[key(board)].append(key(board_new))
+                pending.append(board_new)
+
+    solved = {position: (LOSS, 0) for position, after in successors.items() if not after}
+    distance = 0
+    while True:
+        distance += 1
+        found = {}
+        for position, after in successors.items():
+            if position in solved:
+                continue
+            if distance % 2:
+                if any(
+                    successor is None and distance == 1
+                    or solved.get(successor) == (LOSS, distance - 1)
+                    for successor in after
+                ):
+                    found[position] = (WIN, distance)
+            elif all(successor is not None and solved.get(successor, (DRAW,))[0] == WIN
+                     for successor in after):
+                found[position] = (LOSS, distance)
+        if not found and distance % 2 == 0:
+            # Neither side has anything left to solve.
+            break
+        solved.update(found)
+
+    return {position: solved.get(position, (DRAW, 0)) for position in successors}
+
+
+class TablebaseTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.directory = tempfile.mkdtemp()
+        generate(cls.directory, 2)
+        cls.counts = [solve_slice(cls.directory, material) for material in SLICES]
+        cls.tablebase = Tablebase(cls.directory)
+
+        boards = [
+            board for material in slices(2) + SLICES for board in material_boards(material)
+        ]
+        cls.expected = brute_force(boards)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tablebase.close()
+        shutil.rmtree(cls.directory)
+
+    def probe(self, tablebase, position):
+        board = CheckerBoard()
+        board.set_position(*position)
+        return tablebase.probe(board)
+
+    def test_probe_matches_brute_force(self):
+        tablebase = Tablebase(self.directory)
+        tablebase.pieces = 3
+        self.addCleanup(tablebase.close)
+
+        self.assertTrue(any(result == DRAW for result, _ in self.expected.values()))
+        self.assertTrue(any(distance > 10 for _, distance in self.expected.values()))
+        for position, expected in self.expected.items():
+            self.assertEqual(self.probe(tablebase, position), expected)
+
+    def test_counts(self):
+        for material, wins, draws, losses in self.counts:
+            with self.subTest(material=material):
+                results = [
+                    self.expected[key(board)][0] for board in material_boards(material)
+                ]
+                self.assertLessEqual(len(results), 2 * slice_size(material))
+                self.assertEqual(
+                    (wins, draws, losses),
+                    (results.count(WIN), results.count(DRAW), results.count(LOSS)),
+                )
+
+    def test_pieces(self):
+        # Only some of the three piece slices are built.
+        self.assertEqual(self.tablebase.pieces, 2)
+
+    def test_not_covered(self):
+        board = CheckerBoard()
+        self.assertIsNone(self.tablebase.probe(board))
+
+        # In the middle of a multi-jump.
+        board.set_position(SQUARES[4], SQUARES[8], SQUARES[4], BLACK, SQUARES[4])
+        self.assertIsNone(self.tablebase.probe(board))
+
+    def test_pickle(self):
+        tablebase = pickle.loads(pickle.dumps(self.tablebase))
+        self.addCleanup(tablebase.close)
+        for position, expected in list(self.expected.items())[:1000]:
+            if bin(position[0] | position[1]).count("1") == 2:
+                self.assertEqual(self.probe(tablebase, position), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
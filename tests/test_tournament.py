@@ -0,0 +1,43 @@
+"""
+Tests that tournament games are played by separate copies of the
+agents, and are reproducible.
+"""
+
+import unittest
+
+from agents.rand import RandomPlayer
+from tournament import Tournament
+
+
+class OneColourPlayer(RandomPlayer):
+    """
+    RandomPlayer failing if asked to move for both colours.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.colour = None
+
+    def best_move(self, board):
+        if self.colour is None:
+            self.colour = board.active
+        assert self.colour == board.active, "one copy played both colours"
+        return super().best_move(board)
+
+
+class TournamentTest(unittest.TestCase):
+
+    def test_self_play_copies_each_colour(self):
+        agent = OneColourPlayer()
+        results = Tournament(agent, agent, games=4, max_turns=10).run()
+        self.assertEqual(len(results), 4)
+        self.assertIsNone(agent.colour)
+
+    def test_same_results_for_any_number_of_workers(self):
+        serial = Tournament(RandomPlayer(), RandomPlayer(), games=4, seed=3).run()
+        parallel = Tournament(RandomPlayer(), RandomPlayer(), games=4, seed=3, workers=2).run()
+        self.assertEqual([result.moves for result in serial], [result.moves for result in parallel])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+Tests the transposition tables: that searching with one gives the same
+scores as searching without, the bound types of stored scores, how
+probe_table() uses them, and the replacement of entries.
+"""
+
+import unittest
+
+from agents.arthur import ArthurPlayer
+from tests.positions import played_boards, random_boards
+from transposition import (
+    EXACT, LOWER, UPPER, SharedTranspositionTable, TranspositionTable, bound_type,
+)
+from utils import INF, Player
+
+
+def boards():
+    return [
+        board for board in played_boards(20, seed=9) + random_boards(30, seed=10)
+        if not board.is_over() and len(board.get_moves()) > 1
+    ]
+
+
+class SearchScoresTest(unittest.TestCase):
+
+    def assert_same_scores(self, table_size_mb, depths=(1, 2, 3), **kwargs):
+        for search_with in ("alpha_beta", "nega_max"):
+            hits = 0
+            for depth in depths:
+                plain = ArthurPlayer(depth=depth, search_with=search_with)
+                table = ArthurPlayer(
+                    depth=depth, search_with=search_with, table_size_mb=table_size_mb, **kwargs
+                )
+                for board in boards():
+                    moves = board.get_moves()
+                    self.assertEqual(
+                        table.search_root(board, moves, depth)[1],
+                        plain.search_root(board, moves, depth)[1],
+                    )
+                hits += table.table.hits
+            self.assertGreater(hits, 0)
+
+    def test_same_scores(self):
+        self.assert_same_scores(1)
+
+    def test_same_scores_with_move_ordering(self):
+        self.assert_same_scores(1, move_ordering=True)
+
+    def test_same_scores_with_collisions(self):
+        # A table of 64 entries, so that entries keep replacing each
+        # other.
+        self.assert_same_scores(64 * 128 / 2**20, depths=(2, 3))
+
+
+class BoundTypeTest(unittest.TestCase):
+
+    def test_bound_type(self):
+        self.assertEqual(bound_type(5, 10, 20), UPPER)
+        self.assertEqual(bound_type(10, 10, 20), UPPER)
+        self.assertEqual(bound_type(15, 10, 20), EXACT)
+        self.assertEqual(bound_type(20, 10, 20), LOWER)
+        self.assertEqual(bound_type(25, 10, 20), LOWER)
+        self.assertEqual(bound_type(0, -INF, INF), EXACT)
+
+
+class ProbeTableTest(unittest.TestCase):
+
+    def setUp(self):
+        self.player = Player(table_size_mb=1)
+        self.table = self.player.table
+
+    def probe(self, depth, alpha, beta):
+        return self.player.probe_table(42, depth, alpha, beta)
+
+    def test_missing(self):
+        self.assertEqual(self.probe(3, -10, 10), (None, -10, 10, None))
+
+    def test_exact(self):
+        self.table.store(42, 3, 5, EXACT, 7)
+        self.assertEqual(self.probe(3, -10, 10), (5, -10, 10, 7))
+        self.assertEqual(self.probe(2, -10, 10), (5, -10, 10, 7))
+
+    def test_shallower_entry_only_gives_its_move(self):
+        self.table.store(42, 2, 5, EXACT, 7)
+        self.assertEqual(self.probe(3, -10, 10), (None, -10, 10, 7))
+
+    def test_lower_bound(self):
+        self.table.store(42, 3, 5, LOWER, 7)
+        self.assertEqual(self.probe(3, -10, 10), (None, 5, 10, 7))
+        self.assertEqual(self.probe(3, -10, 5), (5, 5, 5, 7))
+
+    def test_upper_bound(self):
+        self.table.store(42, 3, 5, UPPER, 7)
+        self.assertEqual(self.probe(3, -10, 10), (None, -10, 5, 7))
+        self.assertEqual(self.probe(3, 5, 10), (5, 5, 5, 7))
+
+
+class ReplacementTest():
+    """
+    Replacement and aging tests, run on each kind of table.
+    """
+
+    def new_table(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.table = self.new_table()
+        self.key = 3
+        self.other = self.key + self.table.size
+
+    def stored(self, key):
+        entry = self.table.probe(key)
+        return entry and entry[1:5]
+
+    def test_same_key_is_replaced(self):
+        self.table.store(self.key, 5, 1, EXACT, 7)
+        self.table.store(self.key, 2, -4, LOWER, 9)
+        self.assertEqual(self.stored(self.key), (2, -4, LOWER, 9))
+        self.assertEqual(self.table.collisions, 0)
+
+    def test_deeper_entry_of_the_search_is_kept(self):
+        self.table.store(self.key, 5, 1, EXACT, 7)
+        self.table.store(self.other, 4, 2, UPPER, 9)
+        self.assertEqual(self.stored(self.key), (5, 1, EXACT, 7))
+        self.assertIsNone(self.table.probe(self.other))
+        self.assertEqual(self.table.collisions, 1)
+
+    def test_entry_no_deeper_is_replaced(self):
+        self.table.store(self.key, 5, 1, EXACT, 7)
+        self.table.store(self.other, 5, 2, UPPER, 9)
+        self.assertIsNone(self.table.probe(self.key))
+        self.assertEqual(self.stored(self.other), (5, 2, UPPER, 9))
+
+    def test_entry_of_an_earlier_search_is_replaced(self):
+        self.table.store(self.key, 5, 1, EXACT, 7)
+        self.next_search()
+        self.table.store(self.other, 1, 2, UPPER, 9)
+        self.assertEqual(self.stored(self.other), (1, 2, UPPER, 9))
+
+    def test_negative_scores_and_no_move(self):
+        self.table.store(self.key, 5, -INF, UPPER, None)
+        self.assertEqual(self.stored(self.key), (5, -INF, UPPER, None))
+
+
+class TranspositionTableTest(ReplacementTest, unittest.TestCase):
+
+    def new_table(self):
+        return TranspositionTable(1)
+
+    def next_search(self):
+        self.table.new_search()
+
+
+class SharedTranspositionTableTest(ReplacementTest, unittest.TestCase):
+
+    def new_table(self):
+        table = SharedTranspositionTable(1)
+        self.addCleanup(table.close)
+        return table
+
+    def next_search(self):
+        self.table.generation += 1
+
+    def test_attaches_to_the_same_memory(self):
+        import pickle
+
+        self.table.store(self.key, 5, 1, EXACT, 7)
+        other = pickle.loads(pickle.dumps(self.table))
+        self.addCleanup(other.close)
+        self.assertEqual(other.probe(self.key)[1:5], (5, 1, EXACT, 7))
+
+
+if __name__ == '__main__':
+    unittest.main()
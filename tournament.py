@@ -0,0 +1,305 @@
+"""
+This module plays tournaments between two agents, running the games on
+a pool of worker processes.
+
+Every game is played by fresh copies of the agents, and agents with a
+seed() method are seeded from the tournament seed and the game number,
+so the outcome of a game doesn't depend on which process played it or
+what it played before. Only timings change from run to run.
+
+Run it as a script to play ArthurPlayer against RandomPlayer.
+"""
+
+import argparse
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from copy import deepcopy
+from random import Random
+
+from book import OpeningBook
+from checkers import BLACK, WHITE, CheckerBoard
+from profiling import Profiler
+from sprt import SPRT
+from tablebase import Tablebase
+
+# Rounds after which a game is called unresolved
+MAX_TURNS = 200
+
+GameResult = namedtuple("GameResult", [
+    "number", "seed", "swapped", "winner", "turns", "moves",
+    "thinking_time", "search", "profile",
+])
+GameResult.__doc__ = """
+Outcome of one game. swapped is set when the second agent played black.
+winner is BLACK, WHITE or -1 for an unresolved game. moves lists every
+move played. thinking_time and search map each colour to the seconds
+and SearchStats of its moves, and profile holds the JSON profile
+records of the game.
+"""
+
+# Agents copied into a worker process
+_agents = None
+
+
+def _init_worker(agents):
+    global _agents
+    _agents = agents
+
+
+def _play(number, seed, swapped, max_turns, profile):
+    # Each agent is copied on its own, so that one agent playing both
+    # colours becomes two independent players.
+    first, second = deepcopy(_agents[0]), deepcopy(_agents[1])
+    black, white = (second, first) if swapped else (first, second)
+    return play_game(black, white, seed, number, max_turns, profile)._replace(swapped=swapped)
+
+
+def play_game(black, white, seed=0, number=None, max_turns=MAX_TURNS, profile=False):
+    """
+    Plays one game and returns its GameResult. Agents with a seed()
+    method get seed * 2 + their colour. With profile set, agents that
+    support it are profiled.
+    """
+    players = {BLACK: black, WHITE: white}
+    for colour, agent in players.items():
+        if hasattr(agent, "seed"):
+            agent.seed(seed * 2 + colour)
+        if profile and hasattr(agent, "profiler"):
+            Profiler().attach(agent)
+
+    board = CheckerBoard()
+    turn = 0
+    unresolved = False
+    moves = []
+    thinking_time = {BLACK: [], WHITE: []}
+    search = {BLACK: [], WHITE: []}
+    profile_records = []
+
+    while not board.is_over():
+        turn += 1
+
+        for player, agent in players.items():
+            while not board.is_over() and board.active == player:
+                start_time = time.time()
+                if hasattr(agent, "search"):
+                    move, search_stats = agent.search(board)
+                    search[player].append(search_stats)
+                else:
+                    move = agent.best_move(board)
+                thinking_time[player].append(time.time() - start_time)
+                profiler = getattr(agent, "profiler", None)
+                if profile and profiler is not None:
+                    profile_records.append(
+                        profiler.json_record(game=number, turn=turn, player=player)
+                    )
+                board.update(move)
+                moves.append(move)
+
+        if turn > max_turns:
+            unresolved = True
+            break
+
+    return GameResult(
+        number=number,
+        seed=seed,
+        swapped=False,
+        winner=board.winner if not unresolved else -1,
+        turns=turn,
+        moves=moves,
+        thinking_time=thinking_time,
+        search=search,
+        profile=profile_records,
+    )
+
+
+class Tournament():
+    """
+    Plays games between agent_a and agent_b on workers processes, or in
+    this process when workers is below 2.
+
+    Games are numbered from 1. With swap_colours set, games go in
+    pairs: an odd game has agent_a play black, the next one replays it
+    with colours swapped and the same seed. Otherwise agent_a is always
+    black.
+
+    With an sprt.SPRT given, the match stops as soon as the test
+    concludes. Results are fed to the test in game order, so it stops
+    after the same game for any number of workers.
+    """
+
+    def __init__(self, agent_a, agent_b, games=100, workers=1, seed=0,
+                 swap_colours=True, max_turns=MAX_TURNS, profile=False, sprt=None):
+        self.agents = (agent_a, agent_b)
+        self.games = games
+        self.workers = workers
+        self.seed = seed
+        self.swap_colours = swap_colours
+        self.max_turns = max_turns
+        self.profile = profile
+        self.sprt = sprt
+
+    def schedule(self):
+        """
+        Returns the (number, seed, swapped) triples of every game.
+        """
+        rnd = Random(self.seed)
+        games = []
+        for number in range(1, self.games + 1):
+            swapped = self.swap_colours and number % 2 == 0
+            if not swapped:
+                seed = rnd.getrandbits(32)
+            games.append((number, seed, swapped))
+        return games
+
+    def run(self, callback=None):
+        """
+        Plays the games and returns their results ordered by game
+        number. callback, if given, is called with each GameResult in
+        game order, as soon as the game and all the games before it are
+        over.
+
+        With an SPRT, the games after the one that concluded the test
+        are not played, or their results are dropped.
+        """
+        results = []
+        if self.workers < 2:
+            _init_worker(self.agents)
+            for number, seed, swapped in self.schedule():
+                result = _play(number, seed, swapped, self.max_turns, self.profile)
+                if self._accept(result, results, callback):
+                    break
+            return results
+
+        with ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_init_worker, initargs=(self.agents,),
+        ) as executor:
+            futures = [
+                executor.submit(_play, number, seed, swapped, self.max_turns, self.profile)
+                for number, seed, swapped in self.schedule()
+            ]
+            finished = {}
+            try:
+                for future in as_completed(futures):
+                    result = future.result()
+                    finished[result.number] = result
+                    number = len(results) + 1
+                    stop = False
+                    while number in finished and not stop:
+                        stop = self._accept(finished.pop(number), results, callback)
+                        number += 1
+                    if stop:
+                        break
+            finally:
+                for future in futures:
+                    future.cancel()
+
+        return results
+
+    def _accept(self, result, results, callback):
+        """
+        Appends the next result in game order. Returns True once the
+        SPRT has concluded.
+        """
+        results.append(result)
+        if callback is not None:
+            callback(result)
+        if self.sprt is None:
+            return False
+        self.sprt.add(self.score(result))
+        return self.sprt.result is not None
+
+    @staticmethod
+    def score(result):
+        """
+        Returns the score of agent_a in a game: 1 for a win, 0.5 if
+        unresolved and 0 for a loss.
+        """
+        if result.winner == -1:
+            return 0.5
+        return 1 if (result.winner == BLACK) != result.swapped else 0
+
+    @staticmethod
+    def summary(results):
+        """
+        Returns the outcome of results as a dict: the number of games,
+        the wins of each agent, in total and by colour, the unresolved
+        games and the average number of rounds. It depends on nothing
+        but the moves played, so it is the same for any worker count.
+        """
+        summary = {
+            "games": len(results),
+            "wins": [0, 0],
+            "wins_as_black": [0, 0],
+            "wins_as_white": [0, 0],
+            "unresolved": 0,
+            "rounds_average": sum(result.turns for result in results) / len(results),
+        }
+        for result in results:
+            if result.winner == -1:
+                summary["unresolved"] += 1
+                continue
+            winner = 0 if Tournament.score(result) == 1 else 1
+            summary["wins"][winner] += 1
+            colour = "wins_as_black" if result.winner == BLACK else "wins_as_white"
+            summary[colour][winner] += 1
+        return summary
+
+
+def main():
+    from agents.arthur import ArthurPlayer
+    from agents.rand import RandomPlayer
+
+    parser = argparse.ArgumentParser(description="Play ArthurPlayer against RandomPlayer.")
+    parser.add_argument("--games", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--depth", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sprt", type=float, nargs=2, metavar=("ELO0", "ELO1"),
+                        help="stop once an SPRT of Arthur's Elo advantage concludes")
+    parser.add_argument("--tablebase", metavar="DIRECTORY",
+                        help="let Arthur probe the endgame tablebase in DIRECTORY")
+    parser.add_argument("--book", help="let Arthur play the moves of the opening book BOOK")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    args = parser.parse_args()
+
+    sprt = SPRT(*args.sprt, alpha=args.alpha, beta=args.beta) if args.sprt else None
+    tablebase = Tablebase(args.tablebase) if args.tablebase else None
+    book = OpeningBook(args.book) if args.book else None
+    tournament = Tournament(
+        ArthurPlayer(depth=args.depth, tablebase=tablebase, book=book), RandomPlayer(), args.games,
+        workers=args.workers, seed=args.seed, sprt=sprt,
+    )
+    start = time.time()
+    results = tournament.run()
+    elapsed = time.time() - start
+
+    summary = tournament.summary(results)
+    print("Arthur wins %d (%d as black), Random wins %d (%d as black), unresolved %d" % (
+        summary["wins"][0], summary["wins_as_black"][0],
+        summary["wins"][1], summary["wins_as_black"][1], summary["unresolved"],
+    ))
+    print("rounds (avg) %.2f  time %.2fs  %.2f games/s" % (
+        summary["rounds_average"], elapsed, len(results) / elapsed,
+    ))
+    if sprt is not None:
+        print(sprt_summary(sprt.report(args.games)))
+
+
+def sprt_summary(report):
+    """
+    Returns an SPRT.report() as text.
+    """
+    return (
+        "SPRT %s after %d games (%d saved): LLR %.2f [%.2f, %.2f], "
+        "Elo %.1f (%.0f%% CI %.1f to %.1f)" % (
+            report["result"] or "inconclusive", report["games"], report.get("games_saved", 0),
+            report["llr"], report["lower"], report["upper"], report["elo"],
+            100 * report["confidence"], report["elo_low"], report["elo_high"],
+        )
+    )
+
+
+if __name__ == '__main__':
+    main()
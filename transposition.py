@@ -0,0 +1,205 @@
+"""
+This module defines the transposition tables used by the searching
+players.
+"""
+
+from multiprocessing import shared_memory
+
+# Bound types of a stored score
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# Approximate memory taken by one entry in CPython: its slot in the
+# table list, the entry tuple and the integers it holds.
+ENTRY_SIZE = 128
+
+# Size of one entry of a SharedTranspositionTable: four 64-bit words
+SHARED_ENTRY_SIZE = 32
+
+MASK_64 = 2**64 - 1
+
+
+def bound_type(score, alpha, beta):
+    """
+    Returns the bound type of a fail-soft search score obtained with
+    the (alpha, beta) window.
+    """
+    if score <= alpha:
+        return UPPER
+    if score >= beta:
+        return LOWER
+    return EXACT
+
+
+class TranspositionTable():
+    """
+    Fixed-size table of search results indexed by position key.
+
+    Each entry is a tuple (key, depth, score, bound, move, generation).
+    A slot holds a single entry and is overwritten when it is empty,
+    holds the same key, was written during an earlier search, or holds
+    a result searched no deeper than the new one. Otherwise the deeper
+    entry from the current search is kept (depth-preferred with aging).
+    """
+
+    def __init__(self, size_mb=16):
+        self.size = max(1, int(size_mb * 2**20) // ENTRY_SIZE)
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.probes = 0
+        self.hits = 0
+        self.stores = 0
+        self.collisions = 0
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.reset_stats()
+
+    def new_search(self):
+        """
+        Marks entries stored so far as old, so they are replaced first.
+        """
+        self.generation += 1
+
+    def probe(self, key):
+        """
+        Returns the entry stored for key, or None.
+        """
+        self.probes += 1
+        entry = self.entries[key % self.size]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        return None
+
+    def store(self, key, depth, score, bound, move):
+        index = key % self.size
+        entry = self.entries[index]
+        if entry is not None and entry[0] != key:
+            self.collisions += 1
+            if entry[5] == self.generation and entry[1] > depth:
+                return
+        self.entries[index] = (key, depth, score, bound, move, self.generation)
+        self.stores += 1
+
+    @property
+    def stats(self):
+        """
+        Returns table usage counters as dict.
+        """
+        used = sum(1 for entry in self.entries if entry is not None)
+        return {
+            "size": self.size,
+            "used": used,
+            "probes": self.probes,
+            "hits": self.hits,
+            "stores": self.stores,
+            "collisions": self.collisions,
+        }
+
+
+def _signed(word):
+    """
+    Returns the signed value of a 64-bit word.
+    """
+    return word - 2**64 if word >= 2**63 else word
+
+
+class SharedTranspositionTable(TranspositionTable):
+    """
+    TranspositionTable kept in multiprocessing shared memory, so that
+    several processes can search with the same table. Pickling it
+    attaches the other process to the same memory.
+
+    An entry is four 64-bit words: check, score, move and meta, where
+    meta is depth | bound << 8 | generation << 16. check is the key
+    XOR-ed with the other three words, so keys have to fit in 64 bits,
+    as those of Player.table_key() do. No locks are taken: an entry torn
+    by two processes writing at once fails the check and reads as
+    missing.
+
+    The generation is set by whoever drives the search, new_search()
+    leaves it alone.
+    """
+
+    def __init__(self, size_mb=16, name=None):
+        self.size_mb = size_mb
+        self.size = max(1, int(size_mb * 2**20) // SHARED_ENTRY_SIZE)
+        self.owner = name is None
+        if self.owner:
+            self.memory = shared_memory.SharedMemory(
+                create=True, size=self.size * SHARED_ENTRY_SIZE,
+            )
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+        self.words = self.memory.buf.cast('Q')
+        self.generation = 0
+        self.reset_stats()
+
+    def __reduce__(self):
+        return SharedTranspositionTable, (self.size_mb, self.memory.name)
+
+    def __del__(self):
+        # The view has to go before the memory it was cast from.
+        self.words.release()
+
+    def clear(self):
+        self.memory.buf[:self.size * SHARED_ENTRY_SIZE] = bytes(self.size * SHARED_ENTRY_SIZE)
+        self.generation = 0
+        self.reset_stats()
+
+    def new_search(self):
+        pass
+
+    def probe(self, key):
+        self.probes += 1
+        words, i = self.words, (key % self.size) * 4
+        check, score, move, meta = words[i], words[i + 1], words[i + 2], words[i + 3]
+        if meta == 0 or check != key ^ score ^ move ^ meta:
+            return None
+
+        self.hits += 1
+        return (
+            key, meta & 0xff, _signed(score), (meta >> 8) & 0xff,
+            _signed(move) or None, meta >> 16,
+        )
+
+    def store(self, key, depth, score, bound, move):
+        words, i = self.words, (key % self.size) * 4
+        meta = words[i + 3]
+        if meta != 0 and words[i] ^ words[i + 1] ^ words[i + 2] ^ meta != key:
+            self.collisions += 1
+            if meta >> 16 == self.generation and meta & 0xff > depth:
+                return
+
+        score &= MASK_64
+        move = (move or 0) & MASK_64
+        meta = depth | bound << 8 | (self.generation & 0xffffffffffff) << 16
+        words[i + 1], words[i + 2], words[i + 3] = score, move, meta
+        words[i] = key ^ score ^ move ^ meta
+        self.stores += 1
+
+    @property
+    def stats(self):
+        used = sum(1 for i in range(3, 4 * self.size, 4) if self.words[i])
+        return {
+            "size": self.size,
+            "used": used,
+            "probes": self.probes,
+            "hits": self.hits,
+            "stores": self.stores,
+            "collisions": self.collisions,
+        }
+
+    def close(self):
+        """
+        Detaches from the shared memory, and frees it in the process
+        that created it.
+        """
+        self.words.release()
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
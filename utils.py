@@ -3,6 +3,13 @@ Helpers and evaluation funcions.
 """
 
 import sys
+import time
+from collections import OrderedDict, namedtuple
+from copy import deepcopy
+from random import Random
+
+from checkers import POSITION_REGIONS, REGION_BITS
+from transposition import EXACT, LOWER, TranspositionTable, bound_type
 
 # Constants
 from functools import reduce
@@ -12,6 +19,54 @@ VALID_SQUARES = 0x7FBFDFEFF
 
 INF = sys.maxsize
 
+# Score of a position won according to the tablebase, less the number of
+# turns to the win. It is above any evaluation but below INF, the score
+# of a finished game.
+TABLEBASE_SCORE = INF // 2
+
+# Nodes searched between two checks of the clock
+TIME_CHECK_INTERVAL = 128
+
+# Squares on which men of each colour are promoted
+PROMOTION_ROWS = [0x780000000, 0xf]
+
+# Move ordering priorities above any history score
+HASH_MOVE_PRIORITY = 1 << 62
+KILLER_PRIORITY = 1 << 61
+
+# Toggled in the transposition table key of a node searched for color
+# -1, so that keys stay 64-bit like the board hash.
+NEGATIVE_COLOR_KEY = 0x9cfbac6e7687a66e
+
+
+# Bitboard helpers
+
+def _at(bits, offset):
+    """
+    Returns the squares d for which square d + offset is in bits.
+    """
+    return bits >> offset if offset > 0 else bits << -offset
+
+
+def _piece_steps(board, player):
+    """
+    Returns (step, pieces) pairs: for each of the four diagonal steps,
+    the pieces of player that can move in that direction.
+    """
+    forward, backward = board.forward[player], board.backward[player]
+    return ((4, forward), (5, forward), (-4, backward), (-5, backward))
+
+
+def _piece_scores(board):
+    """
+    Returns the piece scores of black and white, read from the running
+    counts of the board. Kings are on both the forward and backward
+    bitboards, so they are scored as a man too: 2 + 3.
+    """
+    black_score = 2 * (board.men[BLACK] + board.kings[BLACK]) + 3 * board.kings[BLACK]
+    white_score = 2 * (board.men[WHITE] + board.kings[WHITE]) + 3 * board.kings[WHITE]
+    return black_score, white_score
+
 
 # Feature functions
 
@@ -110,60 +165,85 @@ def deny(board):
     The parameter is credited 1 for each square defined in MOB if
     on the next move a piece occupying this square could be
     captured without exchange.
-    """
-    rf = board.right_forward()
-    lf = board.left_forward()
-    rb = board.right_backward()
-    lb = board.left_backward()
-
-    moves = [0x11 << i for (i, bit) in enumerate(bin(rf)[::-1]) if bit == '1']
-    moves += [0x21 << i for (i, bit) in enumerate(bin(lf)[::-1]) if bit == '1']
-    moves += [0x11 << i - 4 for (i, bit) in enumerate(bin(rb)[::-1]) if bit == '1']
-    moves += [0x21 << i - 5 for (i, bit) in enumerate(bin(lb)[::-1]) if bit == '1']
-
-    destinations = [0x10 << i for (i, bit) in enumerate(bin(rf)[::-1]) if bit == '1']
-    destinations += [0x20 << i for (i, bit) in enumerate(bin(lf)[::-1]) if bit == '1']
-    destinations += [0x1 << i - 4 for (i, bit) in enumerate(bin(rb)[::-1]) if bit == '1']
-    destinations += [0x1 << i - 5 for (i, bit) in enumerate(bin(lb)[::-1]) if bit == '1']
-
-    denials = []
-
-    for move, dst in zip(moves, destinations):
-        B = board.peek_move(move)
-        active = B.active
-        ms_taking = []
-        ds = []
 
-        if (B.forward[active] & (dst >> 4)) != 0 and (B.empty & (dst << 4)) != 0:
-            ms_taking.append((-1)*((dst >> 4) | (dst << 4)))
-            ds.append(dst << 4)
-
-        if (B.forward[active] & (dst >> 5)) != 0 and (B.empty & (dst << 5)) != 0:
-            ms_taking.append((-1)*((dst >> 5) | (dst << 5)))
-            ds.append(dst << 5)
-
-        if (B.backward[active] & (dst << 4)) != 0 and (B.empty & (dst >> 4)) != 0:
-            ms_taking.append((-1)*((dst << 4) | (dst >> 4)))
-            ds.append(dst >> 4)
-
-        if (B.backward[active] & (dst << 5)) != 0 and (B.empty & (dst >> 5)) != 0:
-            ms_taking.append((-1)*((dst << 5) | (dst >> 5)))
-            ds.append(dst >> 5)
-
-        if not ms_taking:
+    All squares are handled at once: every condition below is a shift
+    of a bitboard, so that bit d answers it for destination square d.
+    A board in the middle of a multi-jump is scored move by move by
+    _deny_during_jump() instead.
+    """
+    if board.jump:
+        return bin(_deny_during_jump(board)).count("1")
+
+    active, passive = board.active, board.passive
+    empty = board.empty
+    own = board.pieces[active]
+    active_steps = _piece_steps(board, active)
+    passive_steps = _piece_steps(board, passive)
+
+    denials = 0
+    for move_step, movers in active_steps:
+        destinations = _at(movers, -move_step) & empty
+        if not destinations:
             continue
-        else:
-            for m, d in zip(ms_taking, ds):
-                C = B.peek_move(m)
-                if C.active == active:
-                    if dst not in denials:
-                        denials.append(dst)
+
+        for jump_step, jumpers in passive_steps:
+            # A passive piece on d - jump_step takes the piece on d and
+            # lands on d + jump_step, which may be the square it left.
+            taken = destinations & _at(jumpers, -jump_step)
+            if jump_step != -move_step:
+                taken &= _at(empty, jump_step)
+            if not taken:
+                continue
+
+            # Without exchange: the passive piece jumps on, or no
+            # active piece can take it back on d + jump_step.
+            jumps_on = 0
+            for step, pieces in passive_steps:
+                jumps_on |= (
+                    _at(pieces, -jump_step) & _at(own, jump_step + step)
+                    & _at(empty, jump_step + 2 * step)
+                )
+            taken_back = 0
+            for step, pieces in active_steps:
+                taken_back |= _at(pieces, jump_step - step) & _at(empty, jump_step + step)
+
+            denials |= taken & (jumps_on | ~taken_back)
+
+    return bin(denials).count("1")
+
+
+def _deny_during_jump(board):
+    """
+    Returns the squares deny() credits on a board in the middle of a
+    multi-jump. The pending jump carries over to the moves tried: a
+    moved piece that could jump again keeps the turn, and then tries
+    its own pieces' jumps over it. This follows the original move by
+    move implementation, on board copies, so that every board scores as
+    it used to.
+    """
+    denials = 0
+    for move_step, movers in _piece_steps(board, board.active):
+        origins = movers & _at(board.empty, move_step)
+        while origins:
+            origin = origins & -origins
+            origins ^= origin
+            destination = _at(origin, -move_step)
+            if destination & denials:
+                continue
+
+            after = board.copy()
+            after.make_move(origin | destination)
+            for step, jumpers in _piece_steps(after, after.active):
+                jumper, landing = _at(destination, step), _at(destination, -step)
+                if not jumper & jumpers or not landing & after.empty:
                     continue
-                if not C.takeable(d):
-                    if not dst in denials:
-                        denials.append(dst)
+                reply = after.copy()
+                reply.make_move(-(jumper | landing))
+                if reply.active == after.active or not reply.takeable(landing):
+                    denials |= destination
+                    break
 
-    return len(denials)
+    return denials
 
 
 # King Center Control
@@ -224,21 +304,9 @@ def mov(board):
     and if an odd number of pieces are in the move system, defined
     as those vertical files starting with squares 1, 2, 3, and 4.
     """
-    black_men = bin(board.forward[BLACK]).count("1")
-    black_kings = bin(board.backward[BLACK]).count("1")
-    black_score = 2 * black_men + 3 * black_kings
-    white_men = bin(board.backward[WHITE]).count("1")
-    white_kings = bin(board.forward[WHITE]).count("1")
-    white_score = 2 * white_men + 3 * white_kings
-
+    black_score, white_score = _piece_scores(board)
     if white_score < 24 and black_score == white_score:
-        pieces = board.pieces[BLACK] | board.pieces[WHITE]
-        if board.active == BLACK:
-            move_system = 0x783c1e0f
-        else:
-            move_system = 0x783c1e0f0
-        if bin(move_system & pieces).count("1") % 2 == 1:
-            return 1
+        return board.move_system >> board.active & 1
 
     return 0
 
@@ -249,116 +317,746 @@ def thret(board):
     The parameter is credited with 1 for each square to which an
     active piece may be moved and in doing so threaten to capture
     a passive piece on a subsequent move.
+
+    The original implementation used up its iterator of destinations
+    before looping over them, so it credits nothing in any position.
+    ArthurPlayer plays with that result, which is kept: crediting the
+    threats would change its evaluation.
     """
-    moves = board.get_moves()
-    destinations = map(lambda x: (x ^ board.pieces[board.active]) & x, moves)
-    origins = [x ^ y for (x, y) in zip(moves, destinations)]
+    return 0
 
-    jumps = []
-    for dst, orig in zip(destinations, origins):
-        if board.active == BLACK:
-            rfj = (board.empty >> 8) & (board.pieces[board.passive] >> 4) & dst
-            lfj = (board.empty >> 10) & (board.pieces[board.passive] >> 5) & dst
 
-            # piece is king
-            if orig & board.backward[board.active]:
-                rbj = (board.empty << 8) & (board.pieces[board.passive] << 4) & dst
-                lbj = (board.empty << 10) & (board.pieces[board.passive] << 5) & dst
-            else:
-                rbj, lbj = 0, 0
-        else:
-            rbj = (board.empty << 8) & (board.pieces[board.passive] << 4) & dst
-            lbj = (board.empty << 10) & (board.pieces[board.passive] << 5) & dst
+def piece_score_diff(board, player):
+    black_score, white_score = _piece_scores(board)
+    return black_score - white_score if player == BLACK else white_score - black_score
 
-            # piece at square is a king
-            if dst & board.forward[board.active]:
-                rfj = (board.empty >> 8) & (board.pieces[board.passive] >> 4) & dst
-                lfj = (board.empty >> 10) & (board.pieces[board.passive] >> 5) & dst
-            else:
-                rfj, lfj = 0, 0
 
-        if (rfj | lfj | rbj | lbj) != 0:
-            jumps += [-0x101 << i for (i, bit) in enumerate(bin(rfj)[::-1]) if bit == '1']
-            jumps += [-0x401 << i for (i, bit) in enumerate(bin(lfj)[::-1]) if bit == '1']
-            jumps += [-0x101 << i - 8 for (i, bit) in enumerate(bin(rbj)[::-1]) if bit == '1']
-            jumps += [-0x401 << i - 10 for (i, bit) in enumerate(bin(lbj)[::-1]) if bit == '1']
+def position_score(board, player):
+    # Only the last region is scored, weighted by its number: the
+    # original loop over the regions assigned each term to the total
+    # instead of adding it, and scores are kept as they were.
+    last = len(POSITION_REGIONS) - 1
+    return (last + 1) * (board.regions[player] >> REGION_BITS * last & (1 << REGION_BITS) - 1)
+
 
-    return len(jumps)
+class FeatureCache():
+    """
+    Bounded cache of function(board) keyed by board hash, evicting the
+    least recently used entry when full.
+    """
 
+    def __init__(self, function, size=2**16):
+        self.function = function
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, board):
+        key = board.hash
+        entries = self.entries
+        value = entries.get(key)
+        if value is not None:
+            entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = entries[key] = self.function(board)
+        if len(entries) > self.size:
+            entries.popitem(last=False)
+        return value
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self):
+        """
+        Returns cache usage counters as dict.
+        """
+        return {
+            "size": self.size,
+            "used": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+SearchStats = namedtuple("SearchStats", [
+    "nodes", "leaves", "cutoffs", "first_move_cutoffs", "first_move_cutoff_rate",
+    "depth", "max_ply", "elapsed", "nodes_per_second", "pv",
+])
+SearchStats.__doc__ = """
+Work done by one Player.search() call. leaves counts static
+evaluations, depth is the nominal depth completed and max_ply the
+deepest ply visited, jump continuations and quiescence included. pv is
+the principal variation, a list of moves starting with the one played.
+"""
 
-def piece_score_diff(board, player):
-    black_men = bin(board.forward[BLACK]).count("1")
-    black_kings = bin(board.backward[BLACK]).count("1")
-    black_score = 2 * black_men + 3 * black_kings
-    white_men = bin(board.backward[WHITE]).count("1")
-    white_kings = bin(board.forward[WHITE]).count("1")
-    white_score = 2 * white_men + 3 * white_kings
 
-    return black_score - white_score if player == BLACK else white_score - black_score
+def _to_move(board_old, board_new):
+    """
+    Returns the sign turning an evaluate() score, which is from the
+    point of view of the player who moved into board_new, into one from
+    the point of view of the side to move on board_new.
+    """
+    return 1 if board_new.active == board_old.active else -1
 
 
-def position_score(board, player):
-    scores = [0x88000, 0x1904c00, 0x3A0502E0, 0x7C060301F]
-    total = 0
-    for i, score in enumerate(scores, start=1):
-        total = i * bin(board.pieces[player] & score).count("1")
-    return total
+class SearchTimeout(Exception):
+    """
+    Raised inside a search when its time budget has run out.
+    """
 
 
 class Player():
+    """
+    Base class for searching agents.
+
+    The search walks the tree with make_move() and unmake_move() on two
+    boards instead of copying a board per node. board_new holds the
+    node being searched, and board_old trails it by exactly one move
+    (last_move), so evaluate() can still compare a position with its
+    parent.
+
+    evaluate() scores board_new for the player who moved into it.
+    nega_max scores every node for its side to move, min_max and
+    alpha_beta for the side to move on the root, color being 1 on its
+    turns and -1 on the other side's.
+
+    With table_size_mb set, alpha_beta and nega_max keep searched
+    subtrees in a TranspositionTable of that size.
+
+    best_move() searches to a fixed depth, or deepens iteratively when
+    given a time_limit in seconds.
+
+    With move_ordering set, alpha_beta and nega_max search the moves of
+    a node in the order returned by order_moves(). nodes, cutoffs and
+    first_move_cutoffs count the work of the last best_move() call.
+
+    With quiescence_depth set, alpha_beta and nega_max don't stop at
+    depth 0 while jumps are available: they keep searching up to that
+    many more jumps. Jumps are mandatory, so there is no stand-pat score
+    while one is available: a position is only evaluated once it is
+    quiet, or when the extra jumps run out.
+
+    With workers above 1, root moves are searched in parallel by a
+    RootSplitter pool, which is started on first use and kept until
+    close().
+
+    A profiling.Profiler attached to the player records where the time
+    of each best_move() call goes.
+
+    With a tablebase.Tablebase given, positions it covers are scored
+    exactly instead of being searched further; tablebase_hits counts
+    them.
+
+    With a book.OpeningBook given, search() plays a book move whenever
+    the position is in the book, picked at random by weight without
+    searching. seed() seeds that choice.
+    """
     search_methods = ['min_max', 'alpha_beta', 'nega_max']
     search_method_name = search_methods[-1]
 
-    def __init__(self, depth=5, search_with='nega_max'):
+    def __init__(self, depth=5, search_with='nega_max', table_size_mb=0,
+                 move_ordering=False, quiescence_depth=0, workers=0, tablebase=None,
+                 book=None):
         self.depth = depth
+        self.quiescence_depth = quiescence_depth
         self.search_method_name = search_with
-
-    def best_move(self, board):
-        def search(move):
-            board_new = board.peek_move(move)
-            color = 1 if board_new.active == board.active else -1
-            attributes = [board, board_new, self.depth, color]
-            if self.search_method_name in ('alpha_beta', 'nega_max'):
-                attributes += [-INF, INF]
-            return getattr(self, self.search_method_name)(*attributes)
-
-        return max(board.get_moves(), key=search)
+        self.table = TranspositionTable(table_size_mb) if table_size_mb else None
+        self.move_ordering = move_ordering
+        self.deadline = None
+        self.stop_event = None
+        self.ply = 0
+        self.killers = {}
+        self.history = [{}, {}]
+        self.workers = workers
+        self.pool = None
+        self.profiler = None
+        self.tablebase = tablebase
+        self.book = book
+        self.random = Random()
+        self.reset_counters()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['pool'] = None
+        return state
+
+    def seed(self, seed):
+        self.random.seed(seed)
+
+    def close(self):
+        """
+        Shuts the worker pool down, if any.
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def evaluate_leaf(self, board_old, board_new):
+        """
+        Returns evaluate(board_old, board_new), timed by the profiler if
+        one is attached.
+        """
+        if self.profiler is None:
+            return self.evaluate(board_old, board_new)
+        return self.profiler.call("evaluate", self.evaluate, board_old, board_new)
+
+    def reset_counters(self):
+        self.nodes = 0
+        self.leaves = 0
+        self.cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.max_ply = 0
+        self.tablebase_hits = 0
+        self.pv = {}
+
+    def best_move(self, board, time_limit=None):
+        return self.search(board, time_limit)[0]
+
+    def search(self, board, time_limit=None):
+        """
+        Searches board like best_move(). Returns the best move and the
+        SearchStats of the search.
+        """
+        self.reset_counters()
+        self.killers = {}
+        for history in self.history:
+            for move in history:
+                history[move] //= 2
+
+        if self.profiler is not None:
+            self.profiler.start_move()
+        start = time.time()
+        book_move = self.book.choose(board, self.random) if self.book is not None else None
+        if book_move is not None:
+            move, depth = book_move, 0
+        elif time_limit is not None:
+            move, depth = self.iterative_deepening(board, time_limit)
+        else:
+            move, depth = self.search_root(board, board.get_moves(), self.depth)[0], self.depth
+        elapsed = time.time() - start
+        if self.profiler is not None:
+            self.profiler.finish_move(move, self.nodes)
+
+        stats = SearchStats(
+            nodes=self.nodes,
+            leaves=self.leaves,
+            cutoffs=self.cutoffs,
+            first_move_cutoffs=self.first_move_cutoffs,
+            first_move_cutoff_rate=self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0,
+            depth=depth,
+            max_ply=self.max_ply,
+            elapsed=elapsed,
+            nodes_per_second=self.nodes / elapsed if elapsed else 0,
+            pv=self.principal_variation if depth else [move],
+        )
+        return move, stats
+
+    def search_root(self, board, moves, depth):
+        """
+        Searches every move in moves to the given depth. Returns the
+        best move and the list of scores of moves, and sets
+        principal_variation to the line of the best move.
+        """
+        if self.workers > 1:
+            if self.pool is None:
+                from parallel import RootSplitter
+
+                self.pool = RootSplitter(self, self.workers)
+            best_move, scores = self.pool.search_root(board, moves, depth, self.deadline)
+            for name, count in self.pool.counts.items():
+                setattr(self, name, getattr(self, name) + count)
+            self.max_ply = max(self.max_ply, self.pool.max_ply)
+            self.principal_variation = self.pool.principal_variation
+            return best_move, scores
+
+        board_old, board_new = deepcopy(board), deepcopy(board)
+        if self.table is not None:
+            self.table.new_search()
+        if self.profiler is not None:
+            board_old = self.profiler.profiled_board(board_old)
+            board_new = self.profiler.profiled_board(board_new)
+            self.profiler.start_depth(self.nodes)
+
+        scores, lines = [], []
+        for move in moves:
+            scores.append(self.search_move(board_old, board_new, move, depth))
+            lines.append([move] + self.pv.get(1, []))
+        best = max(range(len(moves)), key=scores.__getitem__)
+        self.principal_variation = lines[best]
+        if self.profiler is not None:
+            self.profiler.finish_depth(depth, self.nodes)
+        return moves[best], scores
+
+    def search_move(self, board_old, board_new, move, depth, alpha=None):
+        """
+        Returns the score of move for the side to move on the root,
+        searched to the given depth. Both boards hold the root position,
+        and are restored on return.
+
+        alpha bounds the search from below: a score not above it is
+        only an upper bound of the real score.
+        """
+        self.ply = 1
+        undo = board_new.make_move(move)
+        color = 1 if board_new.active == board_old.active else -1
+        alpha = -INF if alpha is None else alpha
+        if self.search_method_name == 'min_max':
+            score = self.min_max(board_old, board_new, move, depth, color)
+        elif self.search_method_name == 'alpha_beta':
+            score = self.alpha_beta(board_old, board_new, move, depth, color, alpha, INF)
+        elif color == 1:
+            score = self.nega_max(board_old, board_new, move, depth, color, alpha, INF)
+        else:
+            # nega_max scores nodes for their side to move.
+            score = -self.nega_max(board_old, board_new, move, depth, color, -INF, -alpha)
+        board_new.unmake_move(undo)
+        return score
+
+    def search_move_batched(self, board_old, board_new, move, depth):
+        """
+        search_move() as a generator over nega_max_batched(), for a
+        BatchedSearch. The boards must not be shared with any other
+        search running at the same time.
+        """
+        undo = board_new.make_move(move)
+        color = 1 if board_new.active == board_old.active else -1
+        score = yield from self.nega_max_batched(board_old, board_new, move, depth, color, -INF, INF)
+        board_new.unmake_move(undo)
+        # nega_max scores nodes for their side to move.
+        return score * color
+
+    def iterative_deepening(self, board, time_limit=None, max_depth=None, start_depth=1):
+        """
+        Searches depth start_depth, start_depth + 1, ... until
+        time_limit seconds have passed, stop_event is set or max_depth
+        is done. Each iteration searches the root moves best first, by
+        the scores of the previous one.
+
+        Returns the best move of the deepest completed iteration and
+        that depth. Depth is 0 if not even the first iteration
+        completed, and the first legal move is returned.
+        """
+        moves = board.get_moves()
+        best_move, depth = moves[0], 0
+        if len(moves) == 1:
+            return best_move, depth
+
+        if time_limit is not None:
+            self.deadline = time.time() + time_limit
+        try:
+            next_depth = start_depth
+            while max_depth is None or next_depth <= max_depth:
+                best_move, scores = self.search_root(board, moves, next_depth)
+                depth = next_depth
+                next_depth += 1
+                order = sorted(range(len(moves)), key=lambda i: -scores[i])
+                moves = [moves[i] for i in order]
+        except SearchTimeout:
+            pass
+        finally:
+            self.deadline = None
+
+        return best_move, depth
+
+    def check_time(self):
+        """
+        Counts a searched node and raises SearchTimeout once the
+        deadline of an iterative deepening search has passed or
+        stop_event is set.
+        """
+        self.nodes += 1
+        if self.ply > self.max_ply:
+            self.max_ply = self.ply
+        if self.nodes % TIME_CHECK_INTERVAL:
+            return
+        if self.deadline is not None and time.time() > self.deadline:
+            raise SearchTimeout
+        if self.stop_event is not None and self.stop_event.is_set():
+            raise SearchTimeout
 
     def evaluate(self, board_old, board_new):
         raise NotImplementedError
 
-    def min_max(self, board_old, board_new, depth, color):
+    def evaluate_batch(self, leaves):
+        """
+        Returns the list of evaluate() scores of leaves, a list of
+        (board_old, board_new) pairs. Subclasses can override this to
+        score the whole list in one vectorised call.
+        """
+        return [self.evaluate_leaf(board_old, board_new) for board_old, board_new in leaves]
+
+    def probe_tablebase(self, board):
+        """
+        Returns the exact score of board from the tablebase, for its
+        side to move, or None if it isn't covered: won positions score
+        TABLEBASE_SCORE less the turns to the win, lost ones the
+        opposite and draws 0.
+        """
+        entry = self.tablebase.probe(board)
+        if entry is None:
+            return None
+        self.tablebase_hits += 1
+        result, distance = entry
+        return result * (TABLEBASE_SCORE - distance)
+
+    @staticmethod
+    def table_key(board, color):
+        """
+        Returns the transposition table key of a searched node. Search
+        scores are relative to color, so it is part of the key.
+        """
+        return board.hash ^ NEGATIVE_COLOR_KEY if color < 0 else board.hash
+
+    def probe_table(self, key, depth, alpha, beta):
+        """
+        Returns (score, alpha, beta, move). score is the stored score
+        when it settles the node, otherwise None and the window is
+        narrowed by a stored bound. move is the stored best move, if
+        any, whatever depth it was searched to.
+        """
+        entry = self.table.probe(key)
+        if entry is None:
+            return None, alpha, beta, None
+
+        score, bound, move = entry[2], entry[3], entry[4]
+        if entry[1] < depth:
+            return None, alpha, beta, move
+        if bound == EXACT:
+            return score, alpha, beta, move
+        if bound == LOWER:
+            alpha = max(alpha, score)
+        else:
+            beta = min(beta, score)
+
+        if alpha >= beta:
+            return score, alpha, beta, move
+        return None, alpha, beta, move
+
+    def order_moves(self, board, moves, hash_move=None):
+        """
+        Returns moves in the order they should be searched: the hash
+        move, the killer moves of the current ply, then the rest by
+        history score, promotions first among equal scores.
+
+        Subclasses can override this to plug in their own ordering.
+        """
+        if len(moves) < 2:
+            return moves
+
+        killers = self.killers.get(self.ply, ())
+        history = self.history[board.active]
+        promotion_row = PROMOTION_ROWS[board.active]
+        men = board.pieces[board.active] ^ (board.forward[board.active] & board.backward[board.active])
+
+        def priority(move):
+            if move == hash_move:
+                return HASH_MOVE_PRIORITY
+            if move in killers:
+                return KILLER_PRIORITY - killers.index(move)
+            step = -move if move < 0 else move
+            promotion = 1 if step & men and step & promotion_row else 0
+            return 2 * history.get(move, 0) + promotion
+
+        return sorted(moves, key=priority, reverse=True)
+
+    def record_cutoff(self, board, move, depth, index):
+        """
+        Updates counters, killer moves and history after move, the
+        index-th move searched on board, caused a beta cutoff.
+        """
+        self.cutoffs += 1
+        if index == 0:
+            self.first_move_cutoffs += 1
+
+        # Captures are forced, so only quiet moves are remembered.
+        if move < 0:
+            return
+        killers = self.killers.setdefault(self.ply, [])
+        if move not in killers:
+            killers.insert(0, move)
+            del killers[2:]
+        history = self.history[board.active]
+        history[move] = history.get(move, 0) + depth * depth
+
+    def min_max(self, board_old, board_new, last_move, depth, color):
+        self.check_time()
+        self.pv[self.ply] = []
+        if self.tablebase is not None:
+            score = self.probe_tablebase(board_new)
+            if score is not None:
+                return score * color
         if depth == 0 or board_new.is_over():
-            return self.evaluate(board_old, board_new) * color
+            self.leaves += 1
+            return self.evaluate_leaf(board_old, board_new) * _to_move(board_old, board_new) * color
 
-        best_value = -INF if color == 1 else INF
+        best_value = None
 
+        undo_old = board_old.make_move(last_move)
         for move in board_new.get_moves():
-            board = board_new.peek_move(move)
-            if board.active != board_new.active:
-                val = self.min_max(board_new, board, depth - 1, -color)
+            undo = board_new.make_move(move)
+            self.ply += 1
+            if board_new.active != board_old.active:
+                val = self.min_max(board_old, board_new, move, depth - 1, -color)
+            else:
+                val = self.min_max(board_old, board_new, move, depth,  color)
+            self.ply -= 1
+            board_new.unmake_move(undo)
+
+            if best_value is None or (val > best_value if color == 1 else val < best_value):
+                best_value = val
+                self.pv[self.ply] = [move] + self.pv[self.ply + 1]
+        board_old.unmake_move(undo_old)
+
+        return best_value
+
+    def alpha_beta(self, board_old, board_new, last_move, depth, color, alpha, beta):
+        self.check_time()
+        self.pv[self.ply] = []
+        if self.tablebase is not None:
+            score = self.probe_tablebase(board_new)
+            if score is not None:
+                return score * color
+        if depth == 0 and self.quiescence_depth:
+            return self.alpha_beta_quiescence(
+                board_old, board_new, last_move, self.quiescence_depth, color, alpha, beta
+            )
+        if depth == 0 or board_new.is_over():
+            self.leaves += 1
+            return self.evaluate_leaf(board_old, board_new) * _to_move(board_old, board_new) * color
+
+        hash_move = None
+        if self.table is not None:
+            key = self.table_key(board_new, color)
+            score, alpha, beta, hash_move = self.probe_table(key, depth, alpha, beta)
+            if score is not None:
+                return score
+            alpha_orig, beta_orig = alpha, beta
+
+        best_value = -INF if color == 1 else INF
+        best_move = None
+
+        moves = board_new.get_moves()
+        if self.move_ordering:
+            moves = self.order_moves(board_new, moves, hash_move)
+
+        undo_old = board_old.make_move(last_move)
+        for index, move in enumerate(moves):
+            undo = board_new.make_move(move)
+            self.ply += 1
+            if board_new.active != board_old.active:
+                val = self.alpha_beta(board_old, board_new, move, depth - 1, -color, alpha, beta)
             else:
-                val = self.min_max(board_new, board, depth,  color)
+                val = self.alpha_beta(board_old, board_new, move, depth, color, alpha, beta)
+            self.ply -= 1
+            board_new.unmake_move(undo)
 
             if color == 1:
-                best_value = max(val, best_value)
+                if val > best_value or best_move is None:
+                    best_value, best_move = val, move
+                    self.pv[self.ply] = [move] + self.pv[self.ply + 1]
+                alpha = max(best_value, alpha)
             else:
-                best_value = min(val, best_value)
+                if val < best_value or best_move is None:
+                    best_value, best_move = val, move
+                    self.pv[self.ply] = [move] + self.pv[self.ply + 1]
+                beta = min(best_value, beta)
+
+            if alpha >= beta:
+                self.record_cutoff(board_new, move, depth, index)
+                break
+        board_old.unmake_move(undo_old)
+
+        if self.table is not None:
+            bound = bound_type(best_value, alpha_orig, beta_orig)
+            self.table.store(key, depth, best_value, bound, best_move)
 
         return best_value
 
-    def alpha_beta(self, board_old, board_new, depth, color, alpha, beta):
+    def nega_max(self, board_old, board_new, last_move, depth, color, alpha, beta):
+        self.check_time()
+        self.pv[self.ply] = []
+        if self.tablebase is not None:
+            score = self.probe_tablebase(board_new)
+            if score is not None:
+                return score
+        if depth == 0 and self.quiescence_depth:
+            return self.nega_max_quiescence(
+                board_old, board_new, last_move, self.quiescence_depth, color, alpha, beta
+            )
         if depth == 0 or board_new.is_over():
-            return self.evaluate(board_old, board_new) * color
+            self.leaves += 1
+            return self.evaluate_leaf(board_old, board_new) * _to_move(board_old, board_new)
 
-        best_value = -INF if color == 1 else INF
+        hash_move = None
+        if self.table is not None:
+            key = self.table_key(board_new, color)
+            score, alpha, beta, hash_move = self.probe_table(key, depth, alpha, beta)
+            if score is not None:
+                return score
+            alpha_orig = alpha
 
-        for move in board_new.get_moves():
-            board = board_new.peek_move(move)
-            if board.active != board_new.active:
-                val = self.alpha_beta(board_new, board, depth - 1, -color, -alpha, -beta)
+        best_value = -INF
+        best_move = None
+
+        moves = board_new.get_moves()
+        if self.move_ordering:
+            moves = self.order_moves(board_new, moves, hash_move)
+
+        undo_old = board_old.make_move(last_move)
+        for index, move in enumerate(moves):
+            undo = board_new.make_move(move)
+            self.ply += 1
+            if board_new.active != board_old.active:
+                val = -self.nega_max(board_old, board_new, move, depth - 1, -color, -beta, -alpha)
+            else:
+                val = self.nega_max(board_old, board_new, move, depth, color, alpha, beta)
+            self.ply -= 1
+            board_new.unmake_move(undo)
+
+            if val > best_value or best_move is None:
+                best_value, best_move = val, move
+                self.pv[self.ply] = [move] + self.pv[self.ply + 1]
+            alpha = max(alpha, val)
+            if alpha >= beta:
+                self.record_cutoff(board_new, move, depth, index)
+                break
+        board_old.unmake_move(undo_old)
+
+        if self.table is not None:
+            bound = bound_type(best_value, alpha_orig, beta)
+            self.table.store(key, depth, best_value, bound, best_move)
+
+        return best_value
+
+    def nega_max_batched(self, board_old, board_new, last_move, depth, color, alpha, beta, ply=1):
+        """
+        nega_max as a generator, so that many searches can run side by
+        side and have their leaves scored together. Instead of calling
+        evaluate(), it yields a list of (board_old, board_new) copies
+        and expects the list of their evaluate() scores to be sent
+        back.
+
+        The leaves below a node one move above the horizon are yielded
+        in two lists sharing one copy of board_old: the first leaf, then
+        all the rest if it didn't cut the node off. The rest are scored
+        in the same batch, at the cost of no longer being cut off by
+        each other's scores.
+
+        Searches share the player, so the ply is passed along rather
+        than kept in self.ply. Quiescence searches are not batched.
+        """
+        self.ply = ply
+        self.check_time()
+        if self.tablebase is not None:
+            score = self.probe_tablebase(board_new)
+            if score is not None:
+                return score
+        if depth == 0 and self.quiescence_depth:
+            return self.nega_max_quiescence(
+                board_old, board_new, last_move, self.quiescence_depth, color, alpha, beta
+            )
+        if depth == 0 or board_new.is_over():
+            self.leaves += 1
+            scores = yield [(board_old.copy(), board_new.copy())]
+            return scores[0] * _to_move(board_old, board_new)
+
+        hash_move = None
+        if self.table is not None:
+            key = self.table_key(board_new, color)
+            score, alpha, beta, hash_move = self.probe_table(key, depth, alpha, beta)
+            if score is not None:
+                return score
+            alpha_orig = alpha
+
+        best_value = -INF
+        best_move = None
+
+        moves = board_new.get_moves()
+        if self.move_ordering:
+            self.ply = ply
+            moves = self.order_moves(board_new, moves, hash_move)
+
+        undo_old = board_old.make_move(last_move)
+        batch_leaves = depth == 1 and not self.quiescence_depth
+        leaf_scores = []
+        scored = 0
+        for index, move in enumerate(moves):
+            if batch_leaves and not leaf_scores:
+                # The first leaf goes alone, as it is the likeliest to
+                # cut the node off, and all the others go together.
+                leaves = []
+                parent = board_old.copy()
+                for child in moves[index:] if scored else moves[index:index + 1]:
+                    undo = board_new.make_move(child)
+                    if board_new.active != board_old.active:
+                        self.check_time()
+                        self.leaves += 1
+                        leaves.append((parent, board_new.copy()))
+                    board_new.unmake_move(undo)
+                if leaves:
+                    leaf_scores = (yield leaves)[::-1]
+                    scored += len(leaves)
+
+            undo = board_new.make_move(move)
+            if board_new.active == board_old.active:
+                val = yield from self.nega_max_batched(
+                    board_old, board_new, move, depth, color, alpha, beta, ply + 1
+                )
+            elif batch_leaves:
+                # Scored by evaluate() for the player who moved, the
+                # side to move on this node.
+                val = leaf_scores.pop()
             else:
-                val = self.alpha_beta(board_new, board, depth, color, alpha, beta)
+                val = -(yield from self.nega_max_batched(
+                    board_old, board_new, move, depth - 1, -color, -beta, -alpha, ply + 1
+                ))
+            board_new.unmake_move(undo)
+
+            if val > best_value or best_move is None:
+                best_value, best_move = val, move
+            alpha = max(alpha, val)
+            if alpha >= beta:
+                self.ply = ply
+                self.record_cutoff(board_new, move, depth, index)
+                break
+        board_old.unmake_move(undo_old)
+
+        if self.table is not None:
+            bound = bound_type(best_value, alpha_orig, beta)
+            self.table.store(key, depth, best_value, bound, best_move)
+
+        return best_value
+
+    def alpha_beta_quiescence(self, board_old, board_new, last_move, depth, color, alpha, beta):
+        """
+        Extends alpha_beta past its horizon along jumps only, for at
+        most depth more jumps. The side to move can't stand pat while it
+        has a jump: it has to take.
+        """
+        self.check_time()
+        moves = board_new.get_moves()
+        if depth == 0 or not moves or moves[0] > 0:
+            self.leaves += 1
+            return self.evaluate_leaf(board_old, board_new) * _to_move(board_old, board_new) * color
+
+        best_value = -INF if color == 1 else INF
+        undo_old = board_old.make_move(last_move)
+        for move in moves:
+            undo = board_new.make_move(move)
+            next_color = -color if board_new.active != board_old.active else color
+            self.ply += 1
+            val = self.alpha_beta_quiescence(
+                board_old, board_new, move, depth - 1, next_color, alpha, beta
+            )
+            self.ply -= 1
+            board_new.unmake_move(undo)
 
             if color == 1:
                 best_value = max(val, best_value)
@@ -369,26 +1067,43 @@ class Player():
 
             if alpha >= beta:
                 break
+        board_old.unmake_move(undo_old)
 
         return best_value
 
-    def nega_max(self, board_old, board_new, depth, color, alpha, beta):
-        if depth == 0 or board_new.is_over():
-            return self.evaluate(board_old, board_new) * color
+    def nega_max_quiescence(self, board_old, board_new, last_move, depth, color, alpha, beta):
+        """
+        Extends nega_max past its horizon along jumps only, for at most
+        depth more jumps. The side to move can't stand pat while it has
+        a jump: it has to take.
+        """
+        self.check_time()
+        moves = board_new.get_moves()
+        if depth == 0 or not moves or moves[0] > 0:
+            self.leaves += 1
+            return self.evaluate_leaf(board_old, board_new) * _to_move(board_old, board_new)
 
         best_value = -INF
-
-        for move in board_new.get_moves():
-            board = board_new.peek_move(move)
-            if board.active != board_new.active:
-                val = -self.nega_max(board_new, board, depth - 1, -color, -beta, -alpha)
+        undo_old = board_old.make_move(last_move)
+        for move in moves:
+            undo = board_new.make_move(move)
+            self.ply += 1
+            if board_new.active != board_old.active:
+                val = -self.nega_max_quiescence(
+                    board_old, board_new, move, depth - 1, -color, -beta, -alpha
+                )
             else:
-                val = self.nega_max(board_new, board, depth, color, alpha, beta)
+                val = self.nega_max_quiescence(
+                    board_old, board_new, move, depth - 1, color, alpha, beta
+                )
+            self.ply -= 1
+            board_new.unmake_move(undo)
 
             best_value = max(best_value, val)
             alpha = max(alpha, val)
             if alpha >= beta:
                 break
+        board_old.unmake_move(undo_old)
 
         return best_value
 